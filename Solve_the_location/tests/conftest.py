@@ -0,0 +1,31 @@
+"""测试公共部分：在 Solve_the_location 下运行 python -m pytest tests"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uwb_location.geometry import AnchorGeometry  # noqa: E402
+
+# 测试用的固定基站布局（不读取 anchors.json，标定脚本可能修改它）
+ANCHORS_3D = [(0.0, 0.0, 0.0), (3.0, 0.0, 0.5), (3.0, 3.0, 0.0), (0.0, 3.0, 0.8), (1.5, 1.5, 2.5), (0.0, 1.5, 2.0)]
+ANCHORS_2D = [(0.0, 0.0), (4.0, 0.0), (4.0, 3.0), (0.0, 3.0), (2.0, 4.0)]
+
+
+@pytest.fixture
+def geometry3d():
+    return AnchorGeometry(ANCHORS_3D, dim=3)
+
+
+@pytest.fixture
+def geometry2d():
+    return AnchorGeometry(ANCHORS_2D, dim=2)
+
+
+def measure(geometry, point, ids=None):
+    """点到各基站的精确距离 [(基站序号, 距离), ...]"""
+    ids = geometry.ids if ids is None else ids
+    return [(int(i), float(d)) for i, d in zip(ids, geometry.distances_to(np.asarray(point), ids))]
@@ -0,0 +1,104 @@
+"""录制/回放、批量解码和列式帧存储的往返一致性"""
+
+import numpy as np
+import pytest
+
+from uwb_location.acquisition import SerialReader
+from uwb_location.benchmark import synth_frames
+from uwb_location.bulk_decode import decode_capture, decode_frames, frame_columns
+from uwb_location.capture import CaptureReplay, CaptureWriter, read_capture
+from uwb_location.frame_decoder import FrameDecoder
+from uwb_location.frame_store import FrameStore, FrameStoreWriter, store_from_capture
+from uwb_location.protocol import ACK_LAYOUT, FIRMWARE_LAYOUT, FRAME_LAYOUTS, unpack_frame
+
+
+@pytest.fixture
+def frames(geometry3d):
+    points = np.column_stack([np.linspace(0.5, 2.5, 30), np.full(30, 1.5), np.full(30, 0.6)])
+    data = synth_frames(geometry3d, points, len(geometry3d), 0.02)[3]
+    size = FIRMWARE_LAYOUT.size
+    return [data[k:k + size] for k in range(0, len(data), size)]
+
+
+@pytest.fixture
+def capture(tmp_path, frames):
+    path = str(tmp_path / 'session.uwbcap')
+    with CaptureWriter(path) as writer:
+        for k, frame in enumerate(frames):
+            writer.write(frame, 100.0 + 0.01 * k)
+    return path
+
+
+def test_capture_round_trip(capture, frames):
+    records = list(read_capture(capture))
+    assert [frame for _, frame in records] == frames
+    np.testing.assert_allclose([t for t, _ in records], 100.0 + 0.01 * np.arange(len(frames)))
+
+
+def test_replay_through_reader_keeps_frames_and_timestamps(capture, frames):
+    replay = CaptureReplay(capture, realtime=False)
+    reader = SerialReader(replay, FrameDecoder(layouts=FRAME_LAYOUTS),
+                          decode=lambda frame: (replay.frame_timestamp(), bytes(frame)), maxsize=0)
+    reader.start()
+    reader.join(5.0)
+    items = reader.get_all()
+    assert reader.finished and reader.error is None
+    assert [frame for _, frame in items] == frames
+    np.testing.assert_allclose([t for t, _ in items], 100.0 + 0.01 * np.arange(len(frames)))
+
+
+def test_capture_writer_refuses_existing_file_unless_appending(capture, frames):
+    with pytest.raises(FileExistsError):
+        CaptureWriter(capture)
+    with CaptureWriter(capture, append=True) as writer:
+        writer.write(frames[0])
+    timestamps = [t for t, _ in read_capture(capture)]
+    assert len(timestamps) == len(frames) + 1
+    assert np.all(np.diff(timestamps) >= 0)
+
+
+def test_bulk_decode_matches_per_frame_unpack(frames):
+    decoded, valid = decode_frames(b''.join(frames))
+    assert valid.all()
+    columns = frame_columns(decoded)
+    for row, frame in enumerate(frames):
+        expected = unpack_frame(frame)
+        np.testing.assert_array_equal(columns['distances'][row], np.float32(expected.calibrated_distances))
+        np.testing.assert_array_equal(columns['active'][row], np.array(expected.is_active) == 1)
+
+
+def test_bulk_decode_flags_corrupted_frames(frames):
+    data = bytearray(b''.join(frames))
+    data[FIRMWARE_LAYOUT.size * 3 + FIRMWARE_LAYOUT.size - 1] ^= 0xFF  # 第 4 帧帧尾损坏
+    valid = decode_frames(bytes(data))[1]
+    assert valid.tolist() == [k != 3 for k in range(len(frames))]
+
+
+def test_decode_capture(capture, frames):
+    timestamps, decoded, valid = decode_capture(capture)
+    assert len(timestamps) == len(frames) and valid.all()
+    assert decoded.tobytes() == b''.join(frames)
+
+
+def test_frame_store_round_trip_and_time_slice(tmp_path, capture, frames):
+    path = str(tmp_path / 'session.uwbfrm')
+    assert store_from_capture(capture, path) == len(frames)
+    store = FrameStore(path)
+    assert len(store) == len(frames)
+    lo, hi = store.index_range(100.045, 100.095)
+    assert (lo, hi) == (5, 10)
+    chunk = store.time_slice(100.045, 100.095, fields=['calibrated_distances'])
+    expected = [unpack_frame(frame).calibrated_distances for frame in frames[5:10]]
+    np.testing.assert_array_equal(chunk['calibrated_distances'], np.float32(expected))
+
+
+def test_frame_store_writer_skips_non_data_frames(tmp_path, frames):
+    path = str(tmp_path / 'session.uwbfrm')
+    ack = bytes(ACK_LAYOUT.size)
+    with FrameStoreWriter(path) as writer:
+        for frame in frames[:3]:
+            writer.write(frame)
+            writer.write(ack)
+    assert len(FrameStore(path)) == 3
+    with pytest.raises(FileExistsError):
+        FrameStoreWriter(path)
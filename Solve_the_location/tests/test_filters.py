@@ -0,0 +1,62 @@
+"""滑动窗口滤波（环形缓冲区增量更新）和常速度卡尔曼滤波"""
+
+import numpy as np
+import pytest
+
+from uwb_location.kalman import KalmanPositionFilter
+from uwb_location.position_filter import PositionFilter
+
+
+def _reference(window, weight_type):
+    """按定义直接计算窗口的加权平均"""
+    n = len(window)
+    if weight_type == 'uniform':
+        weights = np.ones(n)
+    elif weight_type == 'linear':
+        weights = np.arange(1, n + 1, dtype=np.float64)
+    else:
+        weights = np.exp(np.arange(n) - (n - 1.0))
+    return weights @ window / weights.sum()
+
+
+@pytest.mark.parametrize('weight_type', ['uniform', 'linear', 'exp'])
+def test_window_matches_direct_computation(weight_type):
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(57, 3))
+    position_filter = PositionFilter(window_size=10, weight_type=weight_type, dim=3)
+    for k, point in enumerate(points):
+        result = position_filter.update(point)
+        window = points[max(0, k - 9):k + 1]
+        np.testing.assert_allclose(result, _reference(window, weight_type), atol=1e-9)
+        np.testing.assert_allclose(result.std, window.std(axis=0), atol=1e-9)
+    np.testing.assert_array_equal(position_filter.positions, points[-10:])
+
+
+def test_window_stability_flag():
+    position_filter = PositionFilter(window_size=5, dim=2, stable_std=0.1)
+    for _ in range(5):
+        result = position_filter.update((1.0, 2.0))
+    assert result.is_stable
+    assert not position_filter.update((3.0, 2.0)).is_stable
+
+
+def test_kalman_uses_timestamps_for_velocity():
+    kalman = KalmanPositionFilter(dim=2, measurement_noise=0.01)
+    for k in range(200):
+        t = k * 0.005  # 200 Hz
+        kalman.update((0.5 * t, 1.0), timestamp=t)
+    np.testing.assert_allclose(kalman.velocity, [0.5, 0.0], atol=0.05)
+
+
+def test_kalman_gate_rejects_outlier_and_reinitializes():
+    kalman = KalmanPositionFilter(dim=2, measurement_noise=0.02, max_rejects=3)
+    for k in range(50):
+        kalman.update((1.0, 1.0), timestamp=k * 0.01)
+    result = kalman.update((4.0, 1.0), timestamp=0.5)
+    assert kalman.rejected_count == 1
+    assert kalman.last_mahalanobis > kalman.gate
+    assert result[0] == pytest.approx(1.0, abs=0.01)
+    # 连续超过 max_rejects 次被拒绝说明跟踪丢失，用新测量重新初始化
+    for k in range(4):
+        result = kalman.update((4.0, 1.0), timestamp=0.51 + k * 0.01)
+    assert result[0] == pytest.approx(4.0)
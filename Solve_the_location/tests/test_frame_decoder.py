@@ -0,0 +1,69 @@
+"""FrameDecoder：对齐的数据流、任意切分、垃圾字节和混合帧格式下的重新同步"""
+
+import numpy as np
+
+from uwb_location.benchmark import synth_frames
+from uwb_location.frame_decoder import FrameDecoder
+from uwb_location.protocol import (ACK_COMMAND, ACK_LAYOUT, FIRMWARE_LAYOUT, FRAME_HEADER, FRAME_LAYOUTS,
+                                   FRAME_TAIL, LEGACY_LAYOUT, unpack_frame)
+
+
+def _frames(geometry, count=20):
+    points = np.tile([[1.0, 1.2, 0.7]], (count, 1))
+    return synth_frames(geometry, points, len(geometry), 0.0)[3]
+
+
+def _legacy_frame(distance=1.5):
+    values = [FRAME_HEADER, LEGACY_LAYOUT.command] + [distance] * 16 + [0.0] * 3 + [1] * 8 + [FRAME_TAIL]
+    return LEGACY_LAYOUT.struct.pack(*values)
+
+
+def _ack_frame():
+    return ACK_LAYOUT.struct.pack(FRAME_HEADER, ACK_COMMAND, 1, 2, 0, 1.0, -0.5, 0.0, FRAME_TAIL)
+
+
+def _decode(decoder, data, chunk):
+    frames = []
+    for start in range(0, len(data), chunk):
+        frames.extend(bytes(frame) for frame in decoder.feed(data[start:start + chunk]))
+    return frames
+
+
+def test_aligned_stream(geometry3d):
+    data = _frames(geometry3d)
+    decoder = FrameDecoder(layouts=FRAME_LAYOUTS)
+    frames = _decode(decoder, data, len(data))
+    assert frames == [data[k:k + FIRMWARE_LAYOUT.size] for k in range(0, len(data), FIRMWARE_LAYOUT.size)]
+    assert decoder.discarded_bytes == 0
+
+
+def test_arbitrary_chunks_give_same_frames(geometry3d):
+    data = _frames(geometry3d)
+    expected = _decode(FrameDecoder(layouts=FRAME_LAYOUTS), data, len(data))
+    for chunk in (1, 7, 100, 129):
+        assert _decode(FrameDecoder(layouts=FRAME_LAYOUTS, capacity=4), data, chunk) == expected
+
+
+def test_resync_after_garbage_and_false_header(geometry3d):
+    data = _frames(geometry3d, 5)
+    size = FIRMWARE_LAYOUT.size
+    # 开头半帧、帧之间的垃圾字节和假帧头
+    stream = data[40:size] + b'\x12\x34' + FRAME_HEADER + FIRMWARE_LAYOUT.command + b'\x00' * 10 + data[size:]
+    decoder = FrameDecoder(layouts=FRAME_LAYOUTS)
+    frames = _decode(decoder, stream, 13)
+    assert frames == [data[k:k + size] for k in range(size, len(data), size)]
+    assert decoder.resync_count >= 1
+    assert decoder.discarded_bytes > 0
+
+
+def test_mixed_layouts_and_acks(geometry3d):
+    data = _frames(geometry3d, 2)
+    legacy, ack = _legacy_frame(), _ack_frame()
+    stream = data[:FIRMWARE_LAYOUT.size] + legacy + ack + data[FIRMWARE_LAYOUT.size:]
+    frames = _decode(FrameDecoder(layouts=FRAME_LAYOUTS + (ACK_LAYOUT,)), stream, 11)
+    assert [len(frame) for frame in frames] == [FIRMWARE_LAYOUT.size, LEGACY_LAYOUT.size, ACK_LAYOUT.size,
+                                                FIRMWARE_LAYOUT.size]
+    decoded = unpack_frame(frames[1])
+    assert decoded.rx_power is None
+    assert decoded.calibrated_distances == (1.5,) * 8
+    assert ACK_LAYOUT.unpack(frames[2]).data == (1.0, -0.5, 0.0)
@@ -0,0 +1,26 @@
+"""基站坐标配置文件的读写"""
+
+import json
+
+from uwb_location.geometry import load_geometry, save_geometry
+
+CONFIG = {
+    '3d': {'d0': [0.0, 0.0, 0.0], 'd1': [0.6, 0.6, 0.8], 'd2': [2.4, 0.6, 0.4], 'd3': [3.0, 0.0, 0.0]},
+    '2d': {'d0': [0.0, 0.0], 'd1': [0.0, 0.6]},
+}
+
+
+def test_save_geometry_updates_one_layout(tmp_path):
+    path = str(tmp_path / 'anchors.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(CONFIG, f)
+    geometry = load_geometry('3d', path)
+    version = geometry.version
+    geometry.set_anchor(2, (1.0, 2.0, float(geometry.positions[2, 2])))
+    assert geometry.version == version + 1
+    save_geometry(geometry, path=path)
+
+    assert load_geometry('3d', path).positions[2].tolist() == [1.0, 2.0, 0.4]
+    assert load_geometry('2d', path).to_config() == CONFIG['2d']
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['3d']['d1'] == CONFIG['3d']['d1']
@@ -0,0 +1,29 @@
+"""递推最小二乘在线校准：从带噪声和离群值的样本中恢复 k、b"""
+
+import numpy as np
+
+from uwb_location.online_calibration import OnlineCalibrator
+
+
+def test_recovers_k_and_b_with_outliers():
+    rng = np.random.default_rng(3)
+    k_true = np.array([1.02, 0.98, 1.0, 1.01])
+    b_true = np.array([-1.2, -1.1, -0.9, -1.3])
+    calibrator = OnlineCalibrator(anchor_num=4, noise=0.02)
+    for _ in range(400):
+        actual = rng.uniform(1.0, 6.0)
+        measured = (actual - b_true) / k_true + rng.normal(0.0, 0.02, 4)
+        if rng.random() < 0.05:
+            measured[rng.integers(4)] += 3.0  # 偶发的多径离群值
+        calibrator.update(measured, actual)
+    np.testing.assert_allclose(calibrator.k, k_true, atol=0.01)
+    np.testing.assert_allclose(calibrator.b, b_true, atol=0.03)
+    assert calibrator.converged.all()
+
+
+def test_inactive_and_stale_samples_are_skipped():
+    calibrator = OnlineCalibrator(anchor_num=2)
+    used = calibrator.update([2.0, 3.0], 1.0, active=[True, False])
+    assert used.tolist() == [True, False]
+    # 固件在没有新测距时重复上一次的距离，相同的值视为过期
+    assert not calibrator.update([2.0, 3.5], 1.0)[0]
@@ -0,0 +1,94 @@
+"""线性解算缓存、RANSAC、DOP 子集选择、LM 精化和完整的 Locator 流程"""
+
+import math
+
+import numpy as np
+import pytest
+
+from conftest import measure
+from uwb_location.dop import DopTable
+from uwb_location.locate import Locator
+from uwb_location.ransac import RansacSolver
+from uwb_location.refine import refine_position
+from uwb_location.solver_cache import PinvCache
+
+TRUE_3D = (1.2, 1.7, 0.9)
+
+
+def test_pinv_cache_exact_solution(geometry3d, geometry2d):
+    cache = PinvCache(geometry3d)
+    np.testing.assert_allclose(cache.solve(measure(geometry3d, TRUE_3D)), TRUE_3D, atol=1e-9)
+    cache2d = PinvCache(geometry2d, chained=True)
+    np.testing.assert_allclose(cache2d.solve(measure(geometry2d, (1.5, 2.0))), (1.5, 2.0), atol=1e-9)
+
+
+def test_pinv_cache_follows_geometry_changes(geometry3d):
+    cache = PinvCache(geometry3d)
+    cache.solve(measure(geometry3d, TRUE_3D))
+    geometry3d.set_anchor(5, (0.5, 2.5, 2.2))
+    np.testing.assert_allclose(cache.solve(measure(geometry3d, TRUE_3D)), TRUE_3D, atol=1e-9)
+
+
+def test_ransac_rejects_multipath_outlier(geometry3d):
+    distances = measure(geometry3d, TRUE_3D)
+    distances[2] = (distances[2][0], distances[2][1] + 1.0)  # 多径使测距变长
+    ransac = RansacSolver(PinvCache(geometry3d), threshold=0.2)
+    fix = ransac.solve(distances)
+    assert fix.outliers == [2]
+    np.testing.assert_allclose(fix.position, TRUE_3D, atol=1e-6)
+
+
+def test_ransac_skips_frames_without_minimal_subset(geometry3d):
+    ransac = RansacSolver(PinvCache(geometry3d))
+    assert ransac.solve(measure(geometry3d, TRUE_3D, ids=[0, 1, 2])) is None
+    # 基站陆续加入后正常解算
+    assert ransac.solve(measure(geometry3d, TRUE_3D, ids=[0, 1, 2, 3])) is not None
+
+
+def test_dop_table_solution_and_bound(geometry3d):
+    dop_table = DopTable(PinvCache(geometry3d), noise=0.05)
+    fix = dop_table.solve(measure(geometry3d, TRUE_3D), estimate=TRUE_3D)
+    np.testing.assert_allclose(fix.position, TRUE_3D, atol=1e-9)
+    assert fix.bound == pytest.approx(dop_table.confidence * 0.05 * fix.dop)
+    assert set(fix.ids) <= set(range(6)) and len(fix.ids) >= 4
+
+
+def test_dop_table_ignores_non_finite_estimate(geometry3d):
+    dop_table = DopTable(PinvCache(geometry3d))
+    fix = dop_table.solve(measure(geometry3d, TRUE_3D), estimate=(math.nan,) * 3)
+    np.testing.assert_allclose(fix.position, TRUE_3D, atol=1e-9)
+
+
+def test_refine_converges_from_perturbed_start(geometry3d):
+    anchors = geometry3d.positions[geometry3d.ids]
+    distances = geometry3d.distances_to(TRUE_3D)
+    result = refine_position(anchors, distances, np.add(TRUE_3D, 0.3), tol=1e-6, max_iter=20)
+    assert result.converged
+    np.testing.assert_allclose(result.position, TRUE_3D, atol=1e-5)
+    assert result.residual < 1e-6
+
+
+def test_refine_reports_unconverged_when_out_of_iterations(geometry3d):
+    anchors = geometry3d.positions[geometry3d.ids]
+    distances = geometry3d.distances_to(TRUE_3D)
+    result = refine_position(anchors, distances, (10.0, -8.0, 6.0), tol=1e-9, max_iter=1)
+    assert result.iterations == 1
+    assert not result.converged
+
+
+def test_locator_reports_solved_anchors_only(geometry3d):
+    locator = Locator(geometry3d, rx_weighting=False, filter_mode=None)
+    distances = measure(geometry3d, TRUE_3D) + [(7, 2.0)]  # 7 号基站没有配置坐标
+    fix = locator.locate(distances, timestamp=12.5)
+    np.testing.assert_allclose(fix.position, TRUE_3D, atol=1e-4)
+    assert 7 not in fix.anchors
+    assert fix.timestamp == 12.5
+
+
+def test_locator_recovers_after_non_finite_frame(geometry3d):
+    locator = Locator(geometry3d, rx_weighting=False, ransac=False, filter_mode='kalman')
+    distances = measure(geometry3d, TRUE_3D)
+    assert locator.locate(distances, timestamp=0.0) is not None
+    assert locator.locate([(0, math.nan)] + distances[1:], timestamp=0.01) is None
+    fix = locator.locate(distances, timestamp=0.02)
+    np.testing.assert_allclose(fix.position, TRUE_3D, atol=1e-4)
@@ -0,0 +1,9 @@
+"""UWB定位上位机公共模块：串口帧解码、位置解算等
+
+命令行定位：python -m uwb_location --port COM14 --dim 3（见 __main__.py）
+"""
+
+from .frame_decoder import FrameDecoder
+from .geometry import load_geometry
+from .locate import Locator, run_session
+from .protocol import ANCHOR_NUM, FRAME_HEADER, FRAME_TAIL
@@ -0,0 +1,56 @@
+"""命令行定位（在 Solve_the_location 下运行）：
+
+    python -m uwb_location --port COM14 --dim 3 --output positions.csv
+    python -m uwb_location --port /dev/ttyUSB0 --dim 2 --output - --log-level WARNING   # 结果写到标准输出
+    python -m uwb_location --replay session.uwbcap --fast --output positions.jsonl
+    python -m uwb_location --port COM14 --plot                                          # 显示实时定位图
+
+默认不绘图，只导入 numpy，适合在边缘设备上无界面运行；--plot 时才导入 matplotlib。
+"""
+
+import argparse
+import logging
+import sys
+
+from .locate import run_session
+from .protocol import BAUD_RATE
+
+
+def main(argv=None):
+    """解析命令行参数并运行定位，返回退出状态（见 run_session）"""
+    parser = argparse.ArgumentParser(prog='python -m uwb_location', description='UWB 标签实时定位')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--port', help='串口名，例如 COM14 或 /dev/ttyUSB0')
+    source.add_argument('--replay', help='回放录制文件，不打开串口')
+    parser.add_argument('--baud', type=int, default=BAUD_RATE, help='波特率，与固件 Serial.begin 一致')
+    parser.add_argument('--dim', type=int, choices=(2, 3), default=3, help='解算维数')
+    parser.add_argument('--output', help="定位结果输出文件（.csv 或 .jsonl），'-' 为标准输出")
+    parser.add_argument('--config', help='基站坐标配置文件，默认为 anchors.json')
+    parser.add_argument('--plot', action='store_true', help='显示实时定位图')
+    parser.add_argument('--record', help='把收到的原始帧录制到该文件（文件已存在时报错）')
+    parser.add_argument('--append-record', action='store_true', help='--record 的文件已存在时追加录制')
+    parser.add_argument('--fast', action='store_true', help='回放时不按录制节奏，尽可能快地处理')
+    parser.add_argument('--filter', choices=('window', 'kalman', 'none'),
+                        help='滤波方式，默认三维为 window、二维不滤波')
+    parser.add_argument('--no-refine', action='store_true', help='三维解算不做非线性精化')
+    parser.add_argument('--no-rx-weighting', action='store_true', help='不按接收功率加权')
+    parser.add_argument('--no-ransac', action='store_true', help='不用 RANSAC 剔除野值基站')
+    parser.add_argument('--no-dop', action='store_true', help='不按 DOP 表选择基站子集')
+    parser.add_argument('--ransac-budget', type=float, default=1e-3, help='RANSAC 单帧耗时预算(s)')
+    parser.add_argument('--noise', type=float, default=0.05, help='标称测距噪声(m)，用于误差上界')
+    parser.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    parser.add_argument('--stats-interval', type=float, default=5.0, help='输出采集统计和耗时的间隔(s)')
+    args = parser.parse_args(argv)
+
+    filter_mode = args.filter or ('window' if args.dim == 3 else 'none')
+    return run_session(
+        layout=f'{args.dim}d', port=args.port, baud=args.baud, replay=args.replay, realtime=not args.fast,
+        record=args.record, record_append=args.append_record, output=args.output, plot=args.plot,
+        config=args.config, log_level=getattr(logging, args.log_level), stats_interval=args.stats_interval,
+        rx_weighting=not args.no_rx_weighting, ransac=not args.no_ransac, ransac_budget=args.ransac_budget,
+        dop=not args.no_dop, noise=args.noise, refine=False if args.no_refine else None,
+        filter_mode=None if filter_mode == 'none' else filter_mode)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""后台串口采集：与解算/绘图线程分离，绘图卡顿时不会堵住串口缓冲区"""
+
+import queue
+import threading
+import time
+
+
+class SerialReader(threading.Thread):
+    """后台采集线程：持续读取串口，把解码后的帧放入有界队列
+
+    decode 对每个完整帧（memoryview）调用一次，其返回值放入队列（返回 None 的帧不放入，
+    例如交给 commands.CommandChannel 的命令应答）；默认复制为 bytes。队列满时丢弃最旧的一帧，保证消费者拿到的总是最新数据。
+    给出 recorder（capture.CaptureWriter）时，每个完整帧在解码前连同时间戳写入录制文件。
+    数据源是 capture.CaptureReplay 时，回放结束后线程退出并置位 finished。
+    给出 timing（instrument.Instrumentation）时记录 read（读到数据的 fill）和 decode 阶段的耗时。
+    """
+
+    def __init__(self, ser, decoder, decode=bytes, maxsize=256, recorder=None, timing=None):
+        super().__init__(name='serial-reader', daemon=True)
+        self.ser = ser
+        self.decoder = decoder
+        self.decode = decode
+        self.recorder = recorder
+        self.timing = timing
+        self.queue = queue.Queue(maxsize)
+        self._stop_event = threading.Event()
+
+        # 统计信息
+        self.received = 0     # 已解码的帧数
+        self.dropped = 0      # 队列满时丢弃的帧数
+        self.max_depth = 0    # 出现过的最大队列深度
+        self.error = None     # 采集线程异常退出时的异常
+        self.finished = False  # 回放数据源已读完
+
+    @property
+    def depth(self):
+        """当前队列深度"""
+        return self.queue.qsize()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self.timing is None:
+                    for frame in self.decoder.read_frames(self.ser):
+                        if self.recorder is not None:
+                            self.recorder.write(frame)
+                        item = self.decode(frame)
+                        if item is not None:
+                            self._put(item)
+                else:
+                    self._run_timed()
+                if getattr(self.ser, 'at_eof', False):
+                    self.finished = True
+                    break
+        except Exception as e:
+            self.error = e
+
+    def _run_timed(self):
+        """与 run 中的循环体相同，另外记录各阶段耗时"""
+        start = time.perf_counter()
+        if self.decoder.fill(self.ser):
+            self.timing.record('read', time.perf_counter() - start)
+        for frame in self.decoder.frames():
+            if self.recorder is not None:
+                self.recorder.write(frame)
+            start = time.perf_counter()
+            item = self.decode(frame)
+            self.timing.record('decode', time.perf_counter() - start)
+            if item is not None:
+                self._put(item)
+
+    def _put(self, item):
+        self.received += 1
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                break
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def get_all(self):
+        """取出队列中当前所有的帧（不阻塞）"""
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def get(self, timeout=None):
+        """阻塞等待下一帧，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self, timeout=1.0):
+        """通知采集线程退出并等待其结束"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        """采集统计信息，用于定期打印"""
+        return (f"采集: 已接收 {self.received} 帧, 队列深度 {self.depth}"
+                f"(最大 {self.max_depth}), 丢弃 {self.dropped} 帧")
@@ -0,0 +1,53 @@
+"""批量位置解算：一次性对成千上万帧做向量化的最小二乘三边定位
+
+与脚本中逐帧的 calculate_position_with_valid_anchors 使用相同的线性化方程：
+  - 三维：以第一个有效基站为参考，其余基站与其作差；
+  - 二维：相邻的有效基站两两作差。
+有效基站组合相同的帧共用一个系数矩阵，因此按组合分组后每组只需一次伪逆
+（由 PinvCache 缓存）。
+"""
+
+import numpy as np
+
+from .solver_cache import PinvCache, mask_codes
+
+
+def solve_positions(distances, active, anchor_positions=None, chained=False, cache=None):
+    """批量计算位置
+
+    distances: (N, ANCHOR_NUM) 距离数组
+    active:    (N, ANCHOR_NUM) 基站状态，1 表示有效
+    anchor_positions: 基站坐标，AnchorGeometry、字典或 (基站数, 维数) 数组，维数决定二维/三维解算
+    cache: 可选的 PinvCache，给出时忽略 anchor_positions 和 chained
+    返回 (N, 维数) 的位置数组，有效基站不足的帧为 NaN。
+    没有给出坐标的基站（序号超出 anchor_positions 或坐标为 NaN）会被忽略。
+    """
+    if cache is None:
+        cache = PinvCache(anchor_positions, chained)
+    cache.refresh()
+    anchor_count, dim = cache.anchors.shape
+    distances = np.asarray(distances, dtype=np.float64)[:, :anchor_count]
+
+    codes = mask_codes(active, anchor_count) & int(mask_codes(cache.defined[None], anchor_count)[0])
+    positions = np.full((len(codes), dim), np.nan)
+
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(inverse, minlength=len(unique_codes)))[:-1])
+    for code, rows in zip(unique_codes, groups):
+        entry = cache.entry(int(code))
+        if entry is None:
+            continue  # 有效基站数量不足
+        squared = distances[np.ix_(rows, entry.ids)] ** 2
+        positions[rows] = entry.rhs(squared) @ entry.pinv.T
+    return positions
+
+
+def solve_positions_3d(distances, active, anchor_positions=None, cache=None):
+    """批量三维解算，与 3d解算.py 的方程一致，返回 (N, 3)"""
+    return solve_positions(distances, active, anchor_positions, chained=False, cache=cache)
+
+
+def solve_positions_2d(distances, active, anchor_positions=None, cache=None):
+    """批量二维解算，与 2d解算.py 的方程一致，返回 (N, 2)"""
+    return solve_positions(distances, active, anchor_positions, chained=True, cache=cache)
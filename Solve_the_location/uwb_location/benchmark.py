@@ -0,0 +1,293 @@
+"""解码、解算、滤波的吞吐量基准测试
+
+按已知的标签轨迹和 anchors.json 中的基站布局生成合成帧（距离由 AnchorGeometry.distances_to
+计算，与 计算实际位置到基站距离.py 相同），在不同的测距噪声和有效基站数量下测量
+每个环节的帧率和单帧耗时，结果保存为 JSON，便于比较不同版本：
+
+    python -m uwb_location.benchmark --output bench.json
+    python -m uwb_location.benchmark --baseline bench.json   # 与之前的结果比较，变慢超过容差时返回 1
+"""
+
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+from .batch_solver import solve_positions
+from .bulk_decode import decode_frames, frame_columns
+from .dop import DopTable
+from .frame_decoder import FrameDecoder
+from .frame_store import JUST_FLOAT_DTYPE
+from .geometry import AnchorGeometry, load_geometry
+from .kalman import KalmanPositionFilter
+from .position_filter import PositionFilter
+from .protocol import ANCHOR_NUM, FIRMWARE_LAYOUT, FRAME_LAYOUTS, FRAME_TAIL, unpack_frame
+from .ransac import RansacSolver
+from .refine import PositionRefiner
+from .solver_cache import PinvCache
+from .weighting import rx_power_weights
+
+
+def trajectory(geometry, count, rate=100.0, start=0):
+    """在基站布局范围内的李萨如轨迹，返回第 start 帧起 count 帧的真实位置 (count, dim)"""
+    anchors = geometry.positions[geometry.ids, :geometry.dim]
+    low, high = anchors.min(axis=0), anchors.max(axis=0)
+    center, span = (low + high) / 2, np.maximum(high - low, 0.2) / 2
+    t = np.arange(start, start + count) / rate
+    points = np.empty((count, geometry.dim))
+    points[:, 0] = center[0] + 0.8 * span[0] * np.sin(0.5 * t)
+    points[:, 1] = center[1] + 0.8 * span[1] * np.sin(0.7 * t + 0.5)
+    if geometry.dim == 3:
+        points[:, 2] = low[2] + 0.3 + 0.1 * np.sin(0.3 * t)
+    return points
+
+
+def extend_geometry(geometry, anchor_count):
+    """基站数不足 anchor_count 时在布局外围补充基站（用于测试更多有效基站的情况）"""
+    positions = {int(i): geometry.positions[i, :geometry.dim] for i in geometry.ids}
+    anchors = geometry.positions[geometry.ids]
+    low, high = anchors.min(axis=0), anchors.max(axis=0)
+    rng = np.random.default_rng(1)
+    next_id = 0
+    while len(positions) < anchor_count:
+        while next_id in positions:
+            next_id += 1
+        point = low + rng.uniform(-0.2, 1.2, 3) * np.maximum(high - low, 1.0)
+        positions[next_id] = point[:geometry.dim]
+    return AnchorGeometry({f'd{i}': p for i, p in positions.items()}, dim=geometry.dim)
+
+
+def synth_frames(geometry, points, anchor_count, noise, seed=0):
+    """生成合成数据，返回 (distances, active, rx_power, frames)
+
+    前 anchor_count 个已配置的基站有效，距离加高斯噪声，接收功率按自由空间衰减。
+    frames 为按固件 JustFloatFrame 格式打包、首尾相接的字节串。
+    """
+    rng = np.random.default_rng(seed)
+    ids = geometry.ids[:anchor_count]
+    count = len(points)
+    distances = np.zeros((count, ANCHOR_NUM))
+    active = np.zeros((count, ANCHOR_NUM), dtype=np.uint8)
+    rx_power = np.zeros((count, ANCHOR_NUM))
+    for k, point in enumerate(points):
+        true = geometry.distances_to(point, ids)
+        distances[k, ids] = true + rng.normal(0.0, noise, len(ids))
+        rx_power[k, ids] = -60.0 - 20.0 * np.log10(np.maximum(true, 0.1)) + rng.normal(0.0, 1.0, len(ids))
+    active[:, ids] = 1
+
+    frames = np.zeros(count, dtype=JUST_FLOAT_DTYPE)
+    frames['header'] = (0xFF, 0xAA)
+    frames['command'] = tuple(FIRMWARE_LAYOUT.command)
+    frames['original_distances'] = distances
+    frames['calibrated_distances'] = distances
+    frames['rx_power'] = rx_power
+    frames['position'][:, :points.shape[1]] = points
+    frames['is_activate'] = active
+    frames['tail'] = tuple(FRAME_TAIL)
+    return distances, active, rx_power, frames.tobytes()
+
+
+def _distances_with_ids(distances, active):
+    return [[(int(i), float(row[i])) for i in np.flatnonzero(mask)] for row, mask in zip(distances, active)]
+
+
+def _measure(func, items):
+    """逐项调用 func，返回 (帧率, 单帧耗时 p50(µs), p99(µs), 结果列表)"""
+    results = []
+    latencies = np.empty(len(items))
+    clock = time.perf_counter
+    begin = clock()
+    for k, item in enumerate(items):
+        start = clock()
+        results.append(func(item))
+        latencies[k] = clock() - start
+    total = clock() - begin
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    return len(items) / total, float(p50), float(p99), results
+
+
+def _measure_batch(func, count, repeat=3):
+    """整批调用 func，取 repeat 次中最快的一次，返回 (帧率, 平均单帧耗时(µs), 结果)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best, best / count * 1e6, result
+
+
+def _rmse(positions, points):
+    errors = np.linalg.norm(np.asarray(positions, dtype=np.float64) - points, axis=1)
+    errors = errors[np.isfinite(errors)]
+    return float(np.sqrt(np.mean(errors ** 2))) if len(errors) else None
+
+
+def run_case(geometry, anchor_count, noise, count):
+    """一种布局、有效基站数和噪声下的全部基准，返回结果列表"""
+    dim = geometry.dim
+    chained = dim == 2
+    points = trajectory(geometry, count)
+    distances, active, rx_power, stream = synth_frames(geometry, points, anchor_count, noise)
+    frame_length = FIRMWARE_LAYOUT.size
+    frames = [stream[k * frame_length:(k + 1) * frame_length] for k in range(count)]
+    inputs = _distances_with_ids(distances, active)
+    case = {'dim': dim, 'anchors': anchor_count, 'noise': noise, 'frames': count}
+    results = []
+
+    def add(name, fps, p50=None, p99=None, rmse=None, mean=None):
+        result = dict(case, benchmark=name, fps=round(fps, 1))
+        for key, value in (('p50_us', p50), ('p99_us', p99), ('mean_us', mean), ('rmse_m', rmse)):
+            if value is not None:
+                result[key] = round(value, 4)
+        results.append(result)
+
+    # 解码：流式 FrameDecoder + unpack_frame（脚本中 parse_frame 的主体），以及批量解码
+    def decode_stream():
+        decoder = FrameDecoder(layouts=FRAME_LAYOUTS)
+        return sum(1 for _ in decoder.feed(stream))
+    fps, mean, _ = _measure_batch(decode_stream, count)
+    add('frame_decoder', fps, mean=mean)
+
+    def parse(frame):
+        data = unpack_frame(frame)
+        return [(i, d) for i, (d, a) in enumerate(zip(data.calibrated_distances, data.is_active)) if a == 1]
+    fps, p50, p99, _ = _measure(parse, frames)
+    add('parse_frame', fps, p50, p99)
+
+    fps, mean, _ = _measure_batch(lambda: frame_columns(*decode_frames(stream)), count)
+    add('bulk_decode', fps, mean=mean)
+
+    # 解算
+    cache = PinvCache(geometry, chained)
+    fps, p50, p99, positions = _measure(cache.solve, inputs)
+    add(f'solve_{dim}d', fps, p50, p99, _rmse(positions, points))
+
+    def weighted(k):
+        weighting = rx_power_weights(inputs[k], rx_power[k], min_anchors=dim + 1)
+        return cache.solve(weighting.distances_with_ids, weighting.weights)
+    fps, p50, p99, positions = _measure(weighted, range(count))
+    add(f'solve_{dim}d_weighted', fps, p50, p99, _rmse(positions, points))
+
+    # 按 DOP 表选择基站子集和参考基站，位置估计取上一帧的解（与脚本相同）
+    dop_table = DopTable(cache, noise=max(noise, 0.01))
+    estimate = [None]
+
+    def dop_solve(item):
+        fix = dop_table.solve(item, estimate[0])
+        estimate[0] = None if fix is None else fix.position
+        return estimate[0]
+    fps, p50, p99, positions = _measure(dop_solve, inputs)
+    add(f'solve_{dim}d_dop', fps, p50, p99, _rmse(positions, points))
+
+    # RANSAC：无野值时衡量额外开销，另外给每帧一个基站加 0.5~2m 的多径误差衡量剔除效果
+    ransac = RansacSolver(cache, threshold=max(0.2, 4 * noise))
+    fps, p50, p99, fixes = _measure(ransac.solve, inputs)
+    add(f'ransac_{dim}d', fps, p50, p99, _rmse([fix.position for fix in fixes if fix is not None], points))
+    rng = np.random.default_rng(2)
+    corrupted = distances.copy()
+    ids = np.flatnonzero(active[0])
+    corrupted[np.arange(count), rng.choice(ids, count)] += rng.uniform(0.5, 2.0, count)
+    corrupted_inputs = _distances_with_ids(corrupted, active)
+    fps, p50, p99, positions = _measure(cache.solve, corrupted_inputs)
+    add(f'solve_{dim}d_multipath', fps, p50, p99, _rmse(positions, points))
+    fps, p50, p99, fixes = _measure(ransac.solve, corrupted_inputs)
+    add(f'ransac_{dim}d_multipath', fps, p50, p99, _rmse([fix.position for fix in fixes if fix is not None], points))
+
+    if dim == 3:
+        refiner = PositionRefiner(geometry)
+        linear = [cache.solve(item) for item in inputs]
+        fps, p50, p99, refined = _measure(lambda k: refiner.refine(inputs[k], linear[k]).position, range(count))
+        add('refine_3d', fps, p50, p99, _rmse(refined, points))
+
+    fps, mean, positions = _measure_batch(
+        lambda: solve_positions(distances, active, cache=PinvCache(geometry, chained)), count)
+    add(f'batch_solve_{dim}d', fps, mean=mean, rmse=_rmse(positions, points))
+
+    # 滤波（输入为带噪声的线性解）
+    linear = [position for position in (cache.solve(item) for item in inputs) if position is not None]
+    for name, position_filter in (('position_filter', PositionFilter(dim=dim)),
+                                  ('kalman_filter', KalmanPositionFilter(dim=dim))):
+        fps, p50, p99, _ = _measure(position_filter.update, linear)
+        add(name, fps, p50, p99)
+    return results
+
+
+def run(layouts=('2d', '3d'), noises=(0.0, 0.05, 0.2), anchor_counts=(3, 4, 6, 8), count=2000, config=None):
+    results = []
+    for layout in layouts:
+        geometry = load_geometry(layout, config)
+        for anchor_count in anchor_counts:
+            if anchor_count < geometry.dim + 1 or anchor_count > ANCHOR_NUM:
+                continue
+            extended = extend_geometry(geometry, anchor_count)
+            for noise in noises:
+                results.extend(run_case(extended, anchor_count, noise, count))
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def _key(result):
+    return (result['benchmark'], result['dim'], result['anchors'], result['noise'])
+
+
+def compare(report, baseline, tolerance=0.2):
+    """与之前的结果比较帧率，返回变慢超过 tolerance 的项目"""
+    previous = {_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get(_key(result))
+        if old is not None and result['fps'] < old['fps'] * (1 - tolerance):
+            regressions.append((result, old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='解码、解算、滤波吞吐量基准测试')
+    parser.add_argument('--output', help='结果保存为 JSON 文件')
+    parser.add_argument('--baseline', help='与之前保存的 JSON 结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的帧率下降比例')
+    parser.add_argument('--frames', type=int, default=2000, help='每种情况的帧数')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.05, 0.2], help='测距噪声标准差(m)')
+    parser.add_argument('--anchors', type=int, nargs='+', default=[3, 4, 6, 8], help='有效基站数量')
+    parser.add_argument('--layout', nargs='+', default=['2d', '3d'], choices=['2d', '3d'])
+    parser.add_argument('--config', help='基站坐标配置文件，默认为 Solve_the_location/anchors.json')
+    args = parser.parse_args(argv)
+
+    report = run(args.layout, args.noise, args.anchors, args.frames, args.config)
+    for result in report['results']:
+        latency = (f"p50 {result['p50_us']:.1f}µs p99 {result['p99_us']:.1f}µs" if 'p50_us' in result
+                   else f"平均 {result['mean_us']:.2f}µs")
+        rmse = f", 误差 {result['rmse_m']:.4f}m" if 'rmse_m' in result else ''
+        print(f"{result['dim']}d {result['anchors']}基站 噪声{result['noise']}m  {result['benchmark']:<22}"
+              f"{result['fps']:>12.1f} 帧/s  {latency}{rmse}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for result, old in regressions:
+            print(f"变慢: {result['dim']}d {result['anchors']}基站 噪声{result['noise']}m {result['benchmark']} "
+                  f"{old['fps']:.1f} -> {result['fps']:.1f} 帧/s")
+        if regressions:
+            return 1
+        print("没有超过容差的性能下降")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
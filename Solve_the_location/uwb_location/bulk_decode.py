@@ -0,0 +1,67 @@
+"""批量帧解码：一次调用把大量已对齐的帧解析成列数组
+
+np.frombuffer 直接把缓冲区解释为结构化数组（零拷贝），帧头帧尾的校验也是向量化的，
+适合回放录制文件或处理积压数据；逐帧实时处理仍使用脚本中的 parse_frame。
+解码结果可以直接交给 batch_solver.solve_positions。
+"""
+
+import numpy as np
+
+from .frame_store import JUST_FLOAT_DTYPE, WIRE_DTYPES
+from .protocol import FRAME_HEADER, FRAME_TAIL
+
+_HEADER = np.frombuffer(FRAME_HEADER, dtype=np.uint8)
+_TAIL = np.frombuffer(FRAME_TAIL, dtype=np.uint8)
+
+
+def decode_frames(buffer, dtype=JUST_FLOAT_DTYPE):
+    """把包含若干连续对齐帧的缓冲区解释为结构化数组
+
+    返回 (frames, valid)：frames 是共享 buffer 内存的结构化数组视图，
+    valid 为帧头帧尾都正确的布尔掩码。末尾不足一帧的字节被忽略。
+    dtype 默认为固件的 JustFloatFrame，旧版 96 字节帧使用 LEGACY_FRAME_DTYPE。
+    buffer 被修改或释放前 frames 有效，需要长期保存时请 frames.copy()。
+    """
+    count = len(memoryview(buffer).cast('B')) // dtype.itemsize
+    frames = np.frombuffer(buffer, dtype=dtype, count=count)
+    valid = np.all(frames['header'] == _HEADER, axis=1) & np.all(frames['tail'] == _TAIL, axis=1)
+    return frames, valid
+
+
+def frame_columns(frames, valid=None, distance_field='calibrated_distances'):
+    """从结构化帧数组取出解算用的列
+
+    返回字典：
+      distances (N, ANCHOR_NUM) float64，默认使用校准后的距离（与 parse_frame 一致）
+      active    (N, ANCHOR_NUM) bool，is_activate == 1
+      positions (N, 3) float64，固件给出的位置
+    给出 valid 时只保留有效帧。
+    """
+    if valid is not None:
+        frames = frames[valid]
+    return {
+        'distances': frames[distance_field].astype(np.float64),
+        'active': frames['is_activate'] == 1,
+        'positions': frames['position'].astype(np.float64),
+    }
+
+
+def decode_capture(path, dtype=None):
+    """一次性读取 capture 模块录制的文件，返回 (timestamps, frames, valid)
+
+    所有帧长度相同时录制文件就是定长记录，可以直接按结构化数组读取；
+    dtype 省略时按第一条记录的帧长度选择帧格式。返回的数组是只读的，需要修改时请 copy()。
+    帧长度不一致时抛出 ValueError，此时请用 CaptureReplay 逐帧解码。
+    """
+    from .capture import RECORD_HEADER_FIELDS, read_capture_data
+
+    data, length = read_capture_data(path)
+    if dtype is None:
+        dtype = WIRE_DTYPES.get(length, JUST_FLOAT_DTYPE)
+    record_dtype = np.dtype(RECORD_HEADER_FIELDS + [('frame', dtype)])
+    records = np.frombuffer(data, dtype=record_dtype, count=len(data) // record_dtype.itemsize)
+    if np.any(records['length'] != dtype.itemsize):
+        raise ValueError(f"录制文件中的帧长度与 {dtype.itemsize} 字节不一致: {path}")
+    frames = records['frame']
+    valid = np.all(frames['header'] == _HEADER, axis=1) & np.all(frames['tail'] == _TAIL, axis=1)
+    return records['timestamp'], frames, valid
@@ -0,0 +1,173 @@
+"""原始帧录制与回放
+
+录制文件格式（小端）：
+  文件头   8 字节  b'UWBCAP' + 版本号(uint16)
+  每条记录 <dH>    主机单调时钟时间戳(s, float64) + 帧长度(uint16)，随后是原始帧字节
+时间戳在一个文件内单调不减：每次会话的单调时钟起点不同，追加录制时新记录接在已有记录之后。
+回放时 CaptureReplay 可以像串口一样交给 FrameDecoder / SerialReader，
+按录制时的节奏或尽可能快地输出同样的字节流，无需硬件即可回归测试和性能分析。
+"""
+
+import os
+import struct
+import time
+from collections import deque
+
+CAPTURE_MAGIC = b'UWBCAP'
+CAPTURE_VERSION = 1
+_FILE_HEADER = struct.Struct('<6sH')
+_RECORD_HEADER = struct.Struct('<dH')
+# 记录头的 NumPy 字段描述（与 _RECORD_HEADER 相同），用于把定长记录整体解释为结构化数组
+RECORD_HEADER_FIELDS = [('timestamp', '<f8'), ('length', '<u2')]
+
+
+class CaptureWriter:
+    """把原始帧连同主机单调时钟时间戳写入录制文件
+
+    文件已存在时报错，除非 append=True：此时新帧追加在文件末尾，
+    时间戳整体平移，使本次会话接在已有的最后一条记录之后（间隔为打开文件到第一帧的时间）。
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.count = 0
+        self._offset = 0.0  # 本次会话的单调时钟到文件中时间戳的平移量
+        if os.path.exists(path) and os.path.getsize(path):
+            if not append:
+                raise FileExistsError(f"录制文件已存在: {path}（追加录制需给出 append=True）")
+            last = None
+            for last, _ in read_capture(path):
+                pass
+            if last is not None:
+                self._offset = max(0.0, last - time.monotonic())
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION))
+
+    def write(self, frame, timestamp=None):
+        """写入一帧，timestamp 省略时取当前 time.monotonic()（追加录制时加上平移量）"""
+        if timestamp is None:
+            timestamp = time.monotonic() + self._offset
+        self._file.write(_RECORD_HEADER.pack(timestamp, len(frame)))
+        self._file.write(frame)
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_capture(path):
+    f = open(path, 'rb')
+    magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        f.close()
+        raise ValueError(f"不是有效的录制文件: {path}")
+    return f
+
+
+def read_capture(path):
+    """依次给出录制文件中的 (时间戳, 帧字节)"""
+    with _open_capture(path) as f:
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                return
+            timestamp, length = _RECORD_HEADER.unpack(header)
+            frame = f.read(length)
+            if len(frame) < length:
+                return  # 录制中断导致的不完整记录
+            yield timestamp, frame
+
+
+def read_capture_data(path):
+    """一次性读出录制文件中全部记录的原始字节（不含文件头），返回 (data, 第一条记录的帧长度)
+
+    所有帧长度相同时 data 就是定长记录，bulk_decode.decode_capture 据此整体解码；没有记录时帧长度为 0。
+    """
+    with _open_capture(path) as f:
+        data = f.read()
+    length = _RECORD_HEADER.unpack_from(data)[1] if len(data) >= _RECORD_HEADER.size else 0
+    return data, length
+
+
+class CaptureReplay:
+    """把录制文件当作串口回放，接口与 serial.Serial 中用到的部分一致
+
+    realtime=True 时按录制的时间间隔输出（speed 为倍速），否则尽可能快地输出。
+    每条记录是一个完整帧，解码出的帧与记录一一对应，frame_timestamp 按顺序给出各帧录制时的时间戳。
+    """
+
+    def __init__(self, path, realtime=True, speed=1.0):
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+        self._records = read_capture(path)
+        self._pending = memoryview(b'')
+        self._due = None          # 当前记录应输出的时刻（本机单调时钟）
+        self._offset = None       # 录制时间戳与回放时钟的差
+        self._timestamps = deque()  # 已载入、尚未被 frame_timestamp 取走的记录时间戳
+        self.at_eof = False
+        self.is_open = True
+        self.frames_replayed = 0
+
+    def _next_record(self):
+        """载入下一条记录，返回 False 表示已到文件末尾"""
+        try:
+            timestamp, frame = next(self._records)
+        except StopIteration:
+            self.at_eof = True
+            return False
+        if self._offset is None:
+            self._offset = time.monotonic() - timestamp / self.speed
+        self._due = timestamp / self.speed + self._offset
+        self._pending = memoryview(frame)
+        self._timestamps.append(timestamp)
+        self.frames_replayed += 1
+        return True
+
+    def frame_timestamp(self):
+        """取出下一个已解码帧的录制时间戳（每帧调用一次），没有时返回 None"""
+        return self._timestamps.popleft() if self._timestamps else None
+
+    @property
+    def in_waiting(self):
+        if not len(self._pending) and not self._next_record():
+            return 0
+        if not self.realtime:
+            return 1 << 20  # 快速回放：尽量一次读满缓冲区
+        return len(self._pending)
+
+    def readinto(self, buffer):
+        """与串口一样把数据读入 buffer，返回读入的字节数，文件结束时返回 0"""
+        view = memoryview(buffer)
+        count = 0
+        while count < len(view):
+            if not len(self._pending) and not self._next_record():
+                break
+            if self.realtime:
+                delay = self._due - time.monotonic()
+                if delay > 0:
+                    if count:
+                        break  # 已有数据先交给调用者，下一帧到时再读
+                    time.sleep(delay)
+            n = min(len(view) - count, len(self._pending))
+            view[count:count + n] = self._pending[:n]
+            self._pending = self._pending[n:]
+            count += n
+        return count
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        self._records.close()
+        self.is_open = False
@@ -0,0 +1,191 @@
+"""上位机命令通道：批量发送 CommandFrame，等待固件逐条应答（AckFrame），超时重发
+
+固件 cmd_parse_task 每 10ms 处理一次接收缓冲区中的全部命令帧（最多 10 帧），
+校准参数整批只写一次 EEPROM，然后逐条回复应答，应答中带有执行后的值（k、b 为 EEPROM 中保存的值）。
+CommandChannel 把多条命令拼成一次写入，等待全部应答，超时未应答的命令重发，
+重试用完仍无应答、固件返回错误状态或读回的值与发送的不一致时抛出 CommandError。
+
+应答帧与数据帧在同一串口中交错出现：
+  - 没有其他线程读串口时，CommandChannel 在等待应答期间自己读串口（数据帧丢弃）；
+  - 已有 SerialReader 在读串口时，把 channel.intercept(decode) 作为 SerialReader 的 decode，
+    并在 FrameDecoder 的 layouts 中加上 ACK_LAYOUT，应答帧由采集线程转交给 CommandChannel。
+
+    channel = CommandChannel(ser)
+    channel.set_kb({0: (0.98, -1.19), 1: (1.01, -1.20)})
+    print(channel.get_kb())
+"""
+
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from .frame_decoder import FrameDecoder
+from .protocol import (ACK_COMMAND, ACK_LAYOUT, ACK_OK, ANCHOR_NUM, COMMAND_GET_KB, COMMAND_SET_KB,
+                       COMMAND_SET_POSITION, COMMAND_STRUCT, FRAME_HEADER, FRAME_LAYOUTS, FRAME_TAIL)
+
+# 一条命令：命令字、基站序号和 3 个 float 参数
+Command = namedtuple('Command', ['cmd', 'anchor_num', 'data'])
+
+# 固件接收缓冲区最多容纳的命令帧数
+FIRMWARE_COMMAND_BATCH = 10
+
+_ACK_STATUS = {0x01: '基站序号错误', 0x02: '未知命令'}
+
+
+class CommandError(RuntimeError):
+    """命令重试后仍无应答、固件返回错误状态或读回的值不一致"""
+
+
+def pack_command(cmd, anchor_num, data=(0.0, 0.0, 0.0)):
+    """按固件 CommandFrame 打包一条命令"""
+    return COMMAND_STRUCT.pack(FRAME_HEADER, cmd, anchor_num, *data, FRAME_TAIL)
+
+
+def _float32(value):
+    """按固件中的 float 精度取值，用于校验读回的参数"""
+    return struct.unpack('<f', struct.pack('<f', value))[0]
+
+
+def _windows(commands, size):
+    """把命令分成若干批：每批不超过 size 条，同一批中 (命令字, 基站) 不重复，便于按应答对应"""
+    windows = []
+    for index, command in enumerate(commands):
+        key = (command.cmd, command.anchor_num)
+        for window in windows:
+            if len(window) < size and key not in window:
+                window[key] = index
+                break
+        else:
+            windows.append({key: index})
+    return windows
+
+
+class CommandChannel:
+    """与固件的命令通道
+
+    timeout: 每批命令等待应答的时间(s)
+    retries: 无应答时的重发次数
+    window:  一次写入的最大命令数，不超过固件缓冲区的 FIRMWARE_COMMAND_BATCH
+    """
+
+    def __init__(self, ser, timeout=0.3, retries=3, window=8):
+        self.ser = ser
+        self.timeout = timeout
+        self.retries = retries
+        self.window = min(window, FIRMWARE_COMMAND_BATCH)
+        self._external = False   # 是否由 SerialReader 转交应答
+        self._decoder = None     # 自己读串口时使用的解码器
+        self._acks = {}          # (命令字, 基站序号) -> 最新收到的 Ack
+        self._condition = threading.Condition()
+
+        # 统计信息
+        self.sent = 0      # 已发送的命令帧数（含重发）
+        self.retried = 0   # 重发的命令帧数
+
+    def intercept(self, decode):
+        """包装 SerialReader 的 decode：应答帧交给本通道（返回 None，不进入队列），其余帧照常解码"""
+        self._external = True
+
+        def decode_or_ack(frame):
+            if frame[2:4] == ACK_COMMAND:
+                self._deliver(ACK_LAYOUT.unpack(frame))
+                return None
+            return decode(frame)
+        return decode_or_ack
+
+    def _deliver(self, ack):
+        with self._condition:
+            self._acks[(ack.cmd, ack.anchor_num)] = ack
+            self._condition.notify_all()
+
+    def _wait(self, pending, deadline):
+        """等待 pending 中的任意一条应答或直到 deadline"""
+        if self._external:
+            with self._condition:
+                self._condition.wait_for(lambda: any(key in self._acks for key in pending),
+                                         max(0.0, deadline - time.monotonic()))
+            return
+        if self._decoder is None:
+            self._decoder = FrameDecoder(layouts=FRAME_LAYOUTS + (ACK_LAYOUT,))
+        # 阻塞在串口读取上（最长为串口的 timeout），数据帧直接丢弃
+        for frame in self._decoder.read_frames(self.ser):
+            if frame[2:4] == ACK_COMMAND:
+                self._deliver(ACK_LAYOUT.unpack(frame))
+
+    def _execute_window(self, commands, window, results):
+        pending = dict(window)
+        for attempt in range(self.retries + 1):
+            with self._condition:
+                for key in pending:
+                    self._acks.pop(key, None)
+            self.ser.write(b''.join(pack_command(*commands[index]) for index in pending.values()))
+            self.ser.flush()
+            self.sent += len(pending)
+            if attempt:
+                self.retried += len(pending)
+
+            deadline = time.monotonic() + self.timeout
+            while pending and time.monotonic() < deadline:
+                self._wait(pending, deadline)
+                with self._condition:
+                    for key in [key for key in pending if key in self._acks]:
+                        results[pending.pop(key)] = self._acks.pop(key)
+            if not pending:
+                return
+        missing = ', '.join(f'命令 0x{cmd:02x} 基站 d{anchor}' for cmd, anchor in pending)
+        raise CommandError(f"重发 {self.retries} 次后仍无应答: {missing}")
+
+    def execute(self, commands):
+        """批量执行命令，返回与 commands 一一对应的 Ack；固件返回错误状态时抛出 CommandError"""
+        commands = [Command(*command) for command in commands]
+        results = [None] * len(commands)
+        for window in _windows(commands, self.window):
+            self._execute_window(commands, window, results)
+        errors = [f"命令 0x{ack.cmd:02x} 基站 d{ack.anchor_num}: {_ACK_STATUS.get(ack.status, ack.status)}"
+                  for ack in results if ack.status != ACK_OK]
+        if errors:
+            raise CommandError('; '.join(errors))
+        return results
+
+    def configure(self, kb=None, positions=None):
+        """一次推送校准参数和基站坐标，并校验应答中的值
+
+        kb:        {基站序号: (k, b)}
+        positions: {基站序号: (x, y) 或 (x, y, z)}
+        返回 (固件保存的 {基站序号: (k, b)}, 固件收到的 {基站序号: (x, y, z)})
+        """
+        commands = []
+        for anchor, (k, b) in (kb or {}).items():
+            commands.append(Command(COMMAND_SET_KB, anchor, (k, b, 0.0)))
+        for anchor, coords in (positions or {}).items():
+            commands.append(Command(COMMAND_SET_POSITION, anchor, tuple(coords) + (0.0,) * (3 - len(coords))))
+        acks = self.execute(commands)
+
+        stored_kb, stored_positions = {}, {}
+        for command, ack in zip(commands, acks):
+            expected = command.data[:2] if command.cmd == COMMAND_SET_KB else command.data
+            received = ack.data[:len(expected)]
+            if any(_float32(value) != stored for value, stored in zip(expected, received)):
+                raise CommandError(f"基站 d{command.anchor_num} 读回的值 {received} 与发送的 {expected} 不一致")
+            if command.cmd == COMMAND_SET_KB:
+                stored_kb[command.anchor_num] = received
+            else:
+                stored_positions[command.anchor_num] = received
+        return stored_kb, stored_positions
+
+    def set_kb(self, kb):
+        """写入校准参数 {基站序号: (k, b)}，返回固件 EEPROM 中保存的值"""
+        return self.configure(kb=kb)[0]
+
+    def set_positions(self, positions):
+        """写入基站坐标 {基站序号: 坐标}，返回固件收到的坐标"""
+        return self.configure(positions=positions)[1]
+
+    def get_kb(self, anchors=range(ANCHOR_NUM)):
+        """读取固件 EEPROM 中保存的校准参数，返回 {基站序号: (k, b)}"""
+        acks = self.execute(Command(COMMAND_GET_KB, anchor, (0.0, 0.0, 0.0)) for anchor in anchors)
+        return {ack.anchor_num: ack.data[:2] for ack in acks}
+
+    def stats(self):
+        return f"命令: 已发送 {self.sent} 帧, 重发 {self.retried} 帧"
@@ -0,0 +1,177 @@
+"""几何精度因子（DOP）表：按当前位置选择条件最好的基站子集和线性化参考基站
+
+线性化解算 x = A⁺ b 中，b 的每一行是两个基站距离平方之差（b = S·d² + 常数，S 每行为 +1/-1）。
+测距噪声 δd（标准差 σ）使 δ(d²) = 2d·δd，位置误差的协方差为 4σ² · M diag(d²) Mᵀ，其中 M = A⁺ S，
+所以位置均方根误差 = σ · DOP，DOP = 2·sqrt(Σ dⱼ² cⱼ)，cⱼ 为 M 第 j 列的平方和。
+cⱼ 只取决于基站子集和参考基站，DOP 随位置变化（到各基站的距离），
+参考基站的选择会改变误差（以离标签近的基站为参考时 b 中的噪声小）。
+
+DopTable 在工作区网格上预先计算每种（子集, 参考基站）的 DOP，再对每种有效基站组合
+取其所有子集中 DOP 最小的一种，运行时按位置估计查表（O(1)），
+并用所选子集的 cⱼ 和本帧测距给出位置误差上界 confidence × σ × DOP。
+
+    dop_table = DopTable(solver_cache, noise=0.05)
+    fix = dop_table.solve(distances_with_ids, estimate=last_position)
+    print(fix.position, fix.bound)
+
+加权解算时（weights 不为 None）DOP 仍按等权计算，作为近似。
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .solver_cache import mask_ids
+
+# position: 解算位置；ids: 所用的基站序号；reference: 参考基站（chained 时为 None）；
+# dop: 几何精度因子；bound: 位置误差上界(m)
+DopFix = namedtuple('DopFix', ['position', 'ids', 'reference', 'dop', 'bound'])
+
+# 一种候选：基站组合编码、参考基站和各基站的误差系数 cⱼ（按基站序号索引，不在子集中的为 0）
+_Candidate = namedtuple('_Candidate', ['code', 'reference', 'coefficients'])
+
+
+def _coefficients(entry, anchor_count):
+    """缓存项对应的误差系数 cⱼ：M = A⁺ S 各列的平方和"""
+    S = np.zeros((len(entry.ref_cols), len(entry.ids)))
+    rows = np.arange(len(entry.ref_cols))
+    S[rows, entry.ref_cols] = 1.0
+    S[rows, entry.other_cols] = -1.0
+    coefficients = np.zeros(anchor_count)
+    coefficients[entry.ids] = np.sum((entry.pinv @ S) ** 2, axis=0)
+    return coefficients
+
+
+class DopTable:
+    """工作区网格上按有效基站组合预计算的最优（子集, 参考基站）表
+
+    cache:      solver_cache.PinvCache，解算和系数矩阵都来自它，基站坐标修改后自动重建
+    step:       网格间距(m)
+    margin:     默认工作区为基站包围盒向外扩展 margin(m)
+    bounds:     工作区 (下界, 上界)，每个都是 dim 维坐标，给出时不使用 margin
+    noise:      测距噪声标准差 σ(m)
+    confidence: 误差上界为 confidence × σ × DOP
+    """
+
+    def __init__(self, cache, step=0.25, margin=1.0, bounds=None, noise=0.05, confidence=3.0):
+        self.cache = cache
+        self.step = step
+        self.margin = margin
+        self.bounds = bounds
+        self.noise = noise
+        self.confidence = confidence
+        self.build()
+
+    def build(self):
+        """重新计算网格和全部组合的表（基站坐标修改后由 solve 自动调用）"""
+        cache = self.cache
+        cache.refresh()
+        self._revision = cache.revision
+        dim = cache.dim
+        anchor_count = len(cache.anchors)
+        defined = np.flatnonzero(cache.defined)
+        self._defined_code = int(np.sum(1 << defined)) if len(defined) else 0
+
+        # 工作区网格
+        if self.bounds is not None:
+            low, high = (np.asarray(bound, dtype=np.float64)[:dim] for bound in self.bounds)
+        elif len(defined):
+            low = cache.anchors[defined].min(axis=0) - self.margin
+            high = cache.anchors[defined].max(axis=0) + self.margin
+        else:
+            low = high = np.zeros(dim)
+        self.axes = [np.arange(lo, hi + self.step / 2, self.step) for lo, hi in zip(low, high)]
+        self.low = low
+        self.shape = tuple(len(axis) for axis in self.axes)
+        points = np.stack(np.meshgrid(*self.axes, indexing='ij'), axis=-1).reshape(-1, dim)
+
+        # 候选（子集, 参考基站）：至少 dim+1 个基站且系数矩阵满秩
+        candidates = []
+        for code in range(1, 1 << anchor_count):
+            if code & ~self._defined_code or bin(code).count('1') < dim + 1:
+                continue
+            for reference in [None] if cache.chained else mask_ids(code, anchor_count):
+                entry = cache.entry(code, reference)
+                if np.linalg.matrix_rank(entry.A) < dim:
+                    continue
+                candidates.append(_Candidate(code, entry.reference, _coefficients(entry, anchor_count)))
+        self.candidates = candidates
+
+        # 每个网格点、每种候选的 DOP = 2·sqrt(Σ dⱼ² cⱼ)
+        squared = np.nan_to_num(np.sum((points[:, None, :] - cache.anchors[None, :, :]) ** 2, axis=2))
+        if candidates:
+            coefficients = np.array([candidate.coefficients for candidate in candidates])
+            dop = (2.0 * np.sqrt(squared @ coefficients.T)).astype(np.float32)
+        else:
+            dop = np.empty((len(points), 0), dtype=np.float32)
+
+        # 每种组合取其所有子集中的最优候选：组合去掉一个基站后的最优值已经算过（编码更小）
+        cells = len(points)
+        self.best = np.full((1 << anchor_count, cells), -1, dtype=np.int16)
+        self.best_dop = np.full((1 << anchor_count, cells), np.inf, dtype=np.float32)
+        own = {}
+        for index, candidate in enumerate(candidates):
+            own.setdefault(candidate.code, []).append(index)
+        for code in range(1, 1 << anchor_count):
+            if code & ~self._defined_code:
+                continue
+            best, best_dop = self.best[code], self.best_dop[code]
+            if code in own:
+                indices = np.array(own[code])
+                choice = np.argmin(dop[:, indices], axis=1)
+                best[:] = indices[choice]
+                best_dop[:] = dop[np.arange(cells), best]
+            for anchor_id in mask_ids(code, anchor_count):
+                sub = code ^ (1 << anchor_id)
+                better = self.best_dop[sub] < best_dop
+                best[better] = self.best[sub, better]
+                best_dop[better] = self.best_dop[sub, better]
+
+    def _cell(self, position):
+        """位置所在的网格点（平铺序号），工作区外取最近的边界点"""
+        cell = 0
+        for value, low, size in zip(position, self.low, self.shape):
+            index = int(round((value - low) / self.step))
+            cell = cell * size + min(max(index, 0), size - 1)
+        return cell
+
+    def select(self, code, position):
+        """按位置估计查表，返回组合 code 下最优的 _Candidate，没有可用子集时返回 None"""
+        if self.cache.revision != self._revision:
+            self.build()
+        index = self.best[code & self._defined_code, self._cell(position)]
+        return self.candidates[index] if index >= 0 else None
+
+    def dop_grid(self, code):
+        """组合 code 下各网格点的最优 DOP，形状为 self.shape（坐标见 self.axes）"""
+        return self.best_dop[code & self._defined_code].reshape(self.shape)
+
+    def solve(self, distances_with_ids, estimate=None, weights=None):
+        """选择基站子集和参考基站后求解一帧位置，返回 DopFix，无法解算时返回 None
+
+        estimate 为当前的位置估计（例如上一帧的位置），省略或不是有限值时先用全部基站求解一次作为估计。
+        weights 与 distances_with_ids 一一对应，未被选中的基站连同权重一起去掉。
+        """
+        cache = self.cache
+        if estimate is None or not np.isfinite(estimate).all():
+            estimate = cache.solve(distances_with_ids, weights)
+            if estimate is None or not np.isfinite(estimate).all():
+                return None
+        code = 0
+        for anchor_id, _ in distances_with_ids:
+            code |= 1 << anchor_id
+        candidate = self.select(code, estimate)
+        if candidate is None:
+            return None
+
+        selected = [k for k, (anchor_id, _) in enumerate(distances_with_ids) if candidate.code >> anchor_id & 1]
+        subset = [distances_with_ids[k] for k in selected]
+        position = cache.solve(subset, None if weights is None else [weights[k] for k in selected],
+                               candidate.reference)
+        if position is None:
+            return None
+        coefficients = candidate.coefficients
+        dop = 2.0 * math.sqrt(sum(distance * distance * coefficients[anchor_id] for anchor_id, distance in subset))
+        return DopFix(position, [anchor_id for anchor_id, _ in subset], candidate.reference, dop,
+                      self.confidence * self.noise * dop)
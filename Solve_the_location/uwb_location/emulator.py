@@ -0,0 +1,264 @@
+"""标签固件模拟器：在伪终端(pty)上模拟固件的串口，没有 UWB 模块也能端到端压测
+
+行为与 lib/serial_interface/serial_interface.cpp 一致：
+  data_send_task  按固定频率发送 JustFloatFrame（128 字节，position 全为 0），
+                  calibrated_distances = k * original_distances + b，k、b 为各基站当前的校准参数
+  cmd_parse_task  每 10ms 按帧头帧尾从接收缓冲区（最多 10 帧）中取出所有 CommandFrame，
+                  执行 COMMAND_SET_KB / COMMAND_SET_POSITION / COMMAND_GET_KB，
+                  整批处理完后逐条回复 AckFrame
+标签沿 benchmark.trajectory 的轨迹运动（或固定在给定位置）。可以加入测距噪声、
+基站丢测（本轮没有新测距，和固件一样继续发送上一次的值）和随机插入的干扰字节。
+
+用法（Linux）：
+    python -m uwb_location.emulator --rate 1000 --noise 0.02 --dropout 0.05 --garbage 0.01
+启动后打印从机端设备名（例如 /dev/pts/5），把脚本中的 serial_port 改为该设备名即可。
+"""
+
+import argparse
+import os
+import threading
+import time
+import tty
+
+import numpy as np
+
+from .benchmark import trajectory
+from .commands import FIRMWARE_COMMAND_BATCH
+from .frame_decoder import FrameDecoder
+from .frame_store import JUST_FLOAT_DTYPE
+from .geometry import load_geometry
+from .instrument import get_logger
+from .protocol import (ACK_BAD_ANCHOR, ACK_BAD_COMMAND, ACK_COMMAND, ACK_LAYOUT, ACK_OK, ANCHOR_NUM,
+                       COMMAND_FRAME_SIZE, COMMAND_GET_KB, COMMAND_SET_KB, COMMAND_SET_POSITION, COMMAND_STRUCT,
+                       FIRMWARE_LAYOUT, FRAME_HEADER, FRAME_TAIL)
+
+log = get_logger('emulator')
+
+
+class FirmwareEmulator:
+    """模拟一个标签固件
+
+    geometry: AnchorGeometry，已配置的基站按其坐标测距，其余基站 is_activate 为 0
+    rate:     发送频率(Hz)，10Hz ~ 数 kHz
+    noise:    测距噪声标准差(m)
+    dropout:  每个基站每帧丢测的概率
+    garbage:  每帧之前插入一段随机干扰字节（1~32 字节）的概率
+    position: 固定的标签位置，省略时沿轨迹运动
+    raw_kb:   测距偏差，原始距离 = (真实距离 - b) / k，即理想的校准参数为 (k, b)
+    """
+
+    def __init__(self, geometry, rate=10.0, noise=0.0, dropout=0.0, garbage=0.0, position=None,
+                 raw_kb=(1.0, 0.0), seed=None, command_interval=0.01):
+        self.geometry = geometry
+        self.rate = rate
+        self.noise = noise
+        self.dropout = dropout
+        self.garbage = garbage
+        self.position = None if position is None else np.asarray(position, dtype=np.float64)
+        self.raw_kb = raw_kb
+        self.command_interval = command_interval
+        self.kb = np.tile([1.0, 0.0], (ANCHOR_NUM, 1))  # 固件 EEPROM 中的校准参数 (k, b)
+        self.received_positions = {}                      # COMMAND_SET_POSITION 收到的坐标（固件未使用）
+        self._rng = np.random.default_rng(seed)
+        self._last_original = np.zeros(ANCHOR_NUM)
+        self._last_power = np.zeros(ANCHOR_NUM)
+        self._sequence = 0
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = [threading.Thread(target=self._send_loop, name='emulator-send', daemon=True),
+                         threading.Thread(target=self._command_loop, name='emulator-command', daemon=True)]
+
+        # 统计信息
+        self.frames = 0          # 已生成的数据帧数
+        self.bytes_sent = 0      # 写入 pty 的字节数
+        self.garbage_bytes = 0   # 插入的干扰字节数
+        self.overrun_bytes = 0   # 对端读得太慢、pty 缓冲区满而丢弃的字节数
+        self.commands = 0        # 已处理的命令数
+        self.bad_commands = 0    # 基站序号错误或无法识别的命令数
+        self.kb_saves = 0        # 写 EEPROM 的次数
+
+    def build_frames(self, count):
+        """生成接下来 count 帧，返回 (帧数组, 每帧之前的干扰字节列表)"""
+        ids = self.geometry.ids
+        dim = self.geometry.dim
+        if self.position is None:
+            points = trajectory(self.geometry, count, self.rate, start=self._sequence)
+        else:
+            points = np.tile(self.position[:dim], (count, 1))
+        self._sequence += count
+        true = np.linalg.norm(points[:, None, :] - self.geometry.positions[ids, :dim], axis=2)
+
+        k, b = self.raw_kb
+        original = np.tile(self._last_original, (count, 1))
+        power = np.tile(self._last_power, (count, 1))
+        measured = (true - b) / k + self._rng.normal(0.0, self.noise, true.shape)
+        measured_power = -60.0 - 20.0 * np.log10(np.maximum(true, 0.1)) + self._rng.normal(0.0, 1.0, true.shape)
+        # 丢测的基站沿用上一次测到的值：按列向前填充
+        kept = self._rng.random(true.shape) >= self.dropout
+        index = np.where(kept, np.arange(1, count + 1)[:, None], 0)
+        np.maximum.accumulate(index, axis=0, out=index)
+        columns = np.arange(len(ids))
+        original[:, ids] = np.vstack([self._last_original[ids], measured])[index, columns]
+        power[:, ids] = np.vstack([self._last_power[ids], measured_power])[index, columns]
+        self._last_original = original[-1].copy()
+        self._last_power = power[-1].copy()
+
+        frames = np.zeros(count, dtype=JUST_FLOAT_DTYPE)
+        frames['header'] = (0xFF, 0xAA)
+        frames['command'] = tuple(FIRMWARE_LAYOUT.command)
+        frames['original_distances'] = original
+        frames['calibrated_distances'] = self.kb[:, 0] * original + self.kb[:, 1]
+        frames['rx_power'] = power
+        frames['is_activate'][:, ids] = 1
+        frames['tail'] = tuple(FRAME_TAIL)
+
+        garbage = {}
+        if self.garbage > 0:
+            for row in np.flatnonzero(self._rng.random(count) < self.garbage):
+                garbage[row] = self._rng.integers(0, 256, self._rng.integers(1, 33), dtype=np.uint8).tobytes()
+        return frames, garbage
+
+    def _stream(self, count):
+        frames, garbage = self.build_frames(count)
+        self.frames += count
+        if not garbage:
+            return frames.tobytes()
+        parts = []
+        for row, frame in enumerate(frames):
+            noise = garbage.get(row)
+            if noise is not None:
+                parts.append(noise)
+                self.garbage_bytes += len(noise)
+            parts.append(frame.tobytes())
+        return b''.join(parts)
+
+    def _write(self, data):
+        """写入 pty；对端来不及读时缓冲区满，多出的字节丢弃（相当于串口溢出）"""
+        with self._lock:
+            try:
+                written = os.write(self.master, data)
+            except BlockingIOError:
+                written = 0
+            self.bytes_sent += written
+            self.overrun_bytes += len(data) - written
+
+    def _send_loop(self):
+        """按发送频率输出数据帧；来不及时一次写出所有到期的帧，与 vTaskDelayUntil 一样不累积误差"""
+        start = time.monotonic()
+        sent = 0
+        while not self._stop_event.is_set():
+            due = int((time.monotonic() - start) * self.rate) + 1 - sent
+            if due > 0:
+                self._write(self._stream(due))
+                sent += due
+            self._stop_event.wait(max(0.0, start + sent / self.rate - time.monotonic()))
+
+    def _command_loop(self):
+        # 与固件一样只按帧头帧尾识别命令帧，接收缓冲区最多容纳 FIRMWARE_COMMAND_BATCH 帧
+        decoder = FrameDecoder(COMMAND_FRAME_SIZE, capacity=FIRMWARE_COMMAND_BATCH)
+        while not self._stop_event.is_set():
+            try:
+                data = os.read(self.master, FIRMWARE_COMMAND_BATCH * COMMAND_FRAME_SIZE)
+            except BlockingIOError:
+                data = b''
+            if data:
+                frames = [bytes(frame) for frame in decoder.feed(data)]
+                self.handle_commands(frames)
+            self._stop_event.wait(self.command_interval)
+
+    def handle_commands(self, frames):
+        """执行一批命令帧：校准参数整批处理完后只保存一次，然后逐条应答"""
+        acks = []
+        kb_changed = False
+        for frame in frames:
+            _, command, anchor_num, *data, _ = COMMAND_STRUCT.unpack(frame)
+            self.commands += 1
+            status = ACK_OK
+            if anchor_num >= ANCHOR_NUM:
+                status = ACK_BAD_ANCHOR
+            elif command == COMMAND_SET_KB:
+                self.kb[anchor_num] = data[:2]
+                kb_changed = True
+                log.info("基站 d%d 校准参数 k=%.4f b=%.4f", anchor_num, data[0], data[1])
+            elif command == COMMAND_SET_POSITION:
+                self.received_positions[anchor_num] = tuple(data)
+                log.info("基站 d%d 坐标 (%.3f, %.3f, %.3f)", anchor_num, *data)
+            elif command != COMMAND_GET_KB:
+                status = ACK_BAD_COMMAND
+            if status != ACK_OK:
+                self.bad_commands += 1
+                log.warning("命令错误: %s", frame.hex())
+            elif command in (COMMAND_SET_KB, COMMAND_GET_KB):
+                data = [*self.kb[anchor_num].astype(np.float32), 0.0]
+            acks.append(ACK_LAYOUT.struct.pack(FRAME_HEADER, ACK_COMMAND, command, anchor_num, status, *data,
+                                               FRAME_TAIL))
+        if kb_changed:
+            self.kb_saves += 1
+        if acks:
+            self._write(b''.join(acks))
+
+    def stats(self):
+        return (f"已发送 {self.frames} 帧, {self.bytes_sent} 字节, 干扰 {self.garbage_bytes} 字节, "
+                f"溢出丢弃 {self.overrun_bytes} 字节, 命令 {self.commands} 条（异常 {self.bad_commands} 条）, "
+                f"保存参数 {self.kb_saves} 次")
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=1.0)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    from .instrument import setup_logging
+
+    parser = argparse.ArgumentParser(description='在伪终端上模拟标签固件的串口输出')
+    parser.add_argument('--layout', choices=('2d', '3d'), default='3d', help='基站布局')
+    parser.add_argument('--config', help='基站坐标配置文件，默认为 Solve_the_location/anchors.json')
+    parser.add_argument('--rate', type=float, default=10.0, help='发送频率(Hz)')
+    parser.add_argument('--noise', type=float, default=0.0, help='测距噪声标准差(m)')
+    parser.add_argument('--dropout', type=float, default=0.0, help='每个基站每帧丢测的概率')
+    parser.add_argument('--garbage', type=float, default=0.0, help='每帧之前插入干扰字节的概率')
+    parser.add_argument('--position', type=float, nargs='+', help='固定的标签位置，省略时沿轨迹运动')
+    parser.add_argument('--raw-kb', type=float, nargs=2, default=(1.0, 0.0), metavar=('K', 'B'),
+                        help='测距偏差：原始距离 = (真实距离 - B) / K')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子')
+    parser.add_argument('--duration', type=float, default=None, help='运行时长(s)')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='统计信息打印间隔(s)')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    geometry = load_geometry(args.layout, args.config)
+    with FirmwareEmulator(geometry, args.rate, args.noise, args.dropout, args.garbage, args.position,
+                          tuple(args.raw_kb), args.seed) as emulator:
+        print(f"模拟串口: {emulator.port}（{args.rate:g}Hz, 按 Ctrl+C 退出）")
+        deadline = None if args.duration is None else time.monotonic() + args.duration
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(args.report_interval if deadline is None
+                           else max(0.0, min(args.report_interval, deadline - time.monotonic())))
+                print(emulator.stats())
+        except KeyboardInterrupt:
+            print(emulator.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""流式帧解码器：串口数据不对齐时也能重新同步，不丢帧"""
+
+from .protocol import FRAME_HEADER, FRAME_TAIL
+
+
+class FrameDecoder:
+    """在预分配的接收缓冲区中查找帧头/帧尾，逐个给出完整帧
+
+    数据通过 readinto 直接写入缓冲区，不会为每次读取创建新的 bytes 对象；
+    给出的帧是缓冲区上的 memoryview 切片，只在下一次 fill/feed 之前有效，
+    需要长期保存时请自行 bytes(frame)。
+
+    给出 layouts（protocol.FrameLayout 序列）时按帧头后的 command 字节确定候选帧长度，
+    并以帧尾位置确认帧格式，同一数据流中可以混合多种帧格式；否则所有帧长度均为 frame_length。
+    """
+
+    def __init__(self, frame_length=None, capacity=64, header=FRAME_HEADER, tail=FRAME_TAIL,
+                 layouts=None):
+        self.header = header
+        self.tail = tail
+        self._lengths = None  # command 字节 -> 候选帧长度（从短到长）
+        if layouts is not None:
+            self._lengths = {}
+            for layout in layouts:
+                self._lengths.setdefault(layout.command, []).append(layout.size)
+            for lengths in self._lengths.values():
+                lengths.sort()
+            frame_length = max(layout.size for layout in layouts)
+        elif frame_length is None:
+            raise ValueError("frame_length 和 layouts 至少需要给出一个")
+        self.frame_length = frame_length  # 最大帧长度
+        # 缓冲区至少能容纳两帧，保证残留的半帧之后总有空间继续读入
+        self._buffer = bytearray(max(capacity, 2) * frame_length)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # 未处理数据的起点
+        self._end = 0    # 未处理数据的终点
+
+        # 统计信息
+        self.frame_count = 0      # 已输出的完整帧数
+        self.discarded_bytes = 0  # 同步过程中丢弃的字节数
+        self.resync_count = 0     # 帧头误匹配/帧损坏后重新同步的次数
+
+    def _compact(self):
+        """把残留的半帧移到缓冲区开头，为后续读入腾出空间"""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif len(self._buffer) - self._end < self.frame_length:
+            remaining = self._end - self._start
+            self._buffer[:remaining] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, remaining
+
+    def fill(self, source):
+        """从串口（或任意支持 readinto 的对象）读入数据，返回读入的字节数"""
+        self._compact()
+        want = len(self._buffer) - self._end
+        # 串口只读当前已到达的数据，避免为凑满缓冲区而阻塞到超时
+        waiting = getattr(source, 'in_waiting', None)
+        if waiting is not None:
+            want = min(want, max(waiting, 1))
+        count = source.readinto(self._view[self._end:self._end + want]) or 0
+        self._end += count
+        return count
+
+    def frames(self):
+        """依次给出缓冲区中所有完整帧，不完整的部分留待下次读入"""
+        buffer = self._buffer
+        header_len = len(self.header)
+        tail_len = len(self.tail)
+        while True:
+            start = buffer.find(self.header, self._start, self._end)
+            if start == -1:
+                # 末尾可能是半个帧头，保留下来
+                keep_from = max(self._start, self._end - header_len + 1)
+                self.discarded_bytes += keep_from - self._start
+                self._start = keep_from
+                return
+            self.discarded_bytes += start - self._start
+            self._start = start
+
+            if self._lengths is None:
+                lengths = (self.frame_length,)
+            else:
+                if start + header_len + 2 > self._end:
+                    return  # 等待 command 字节
+                lengths = self._lengths.get(bytes(buffer[start + header_len:start + header_len + 2]), ())
+
+            # 从短到长依次用帧尾位置确认帧长度；较长的候选数据不够时等待更多数据
+            stop = None
+            for length in lengths:
+                if start + length > self._end:
+                    return  # 等待更多数据
+                if buffer.startswith(self.tail, start + length - tail_len, start + length):
+                    stop = start + length
+                    break
+
+            if stop is not None:
+                self._start = stop
+                self.frame_count += 1
+                yield self._view[start:stop]
+            else:
+                # 帧头是数据中的误匹配或帧已损坏，跳过一个字节重新同步
+                self._start = start + 1
+                self.discarded_bytes += 1
+                self.resync_count += 1
+
+    def read_frames(self, source):
+        """读入一次数据并给出其中的所有完整帧"""
+        self.fill(source)
+        yield from self.frames()
+
+    def feed(self, data):
+        """写入一段已读取的字节（回放、测试时使用）并给出其中的所有完整帧"""
+        data = memoryview(data)
+        while len(data):
+            self._compact()
+            count = min(len(data), len(self._buffer) - self._end)
+            self._view[self._end:self._end + count] = data[:count]
+            self._end += count
+            data = data[count:]
+            yield from self.frames()
+
+    def reset(self):
+        """清空缓冲区（例如串口重新打开后）"""
+        self._start = self._end = 0
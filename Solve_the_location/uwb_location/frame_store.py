@@ -0,0 +1,205 @@
+"""长时间采集的列式帧存储：NumPy 结构化数组追加写入文件，用 np.memmap 打开
+
+文件格式（小端）：
+  文件头 16 字节  b'UWBFRM' + 版本号(uint16) + 单条记录字节数(uint32) + 保留
+  之后是连续的 RECORD_DTYPE 记录，按到达顺序追加，时间戳单调不减
+分析时按时间范围切片只会读取涉及的页，不需要把整个文件读入内存。
+"""
+
+import os
+import struct
+import time
+
+import numpy as np
+
+from .protocol import ANCHOR_NUM
+
+# 与固件 JustFloatFrame 一致的线上帧格式（128 字节，紧凑排列）
+JUST_FLOAT_DTYPE = np.dtype([
+    ('header', 'u1', 2),
+    ('command', 'u1', 2),
+    ('original_distances', '<f4', ANCHOR_NUM),
+    ('calibrated_distances', '<f4', ANCHOR_NUM),
+    ('rx_power', '<f4', ANCHOR_NUM),
+    ('position', '<f4', 3),
+    ('is_activate', 'u1', 8),
+    ('tail', 'u1', 8),
+])
+
+# 旧版上位机脚本使用的帧格式（96 字节，没有 rx_power）
+LEGACY_FRAME_DTYPE = np.dtype([
+    ('header', 'u1', 2),
+    ('command', 'u1', 2),
+    ('original_distances', '<f4', ANCHOR_NUM),
+    ('calibrated_distances', '<f4', ANCHOR_NUM),
+    ('position', '<f4', 3),
+    ('is_activate', 'u1', 8),
+    ('tail', 'u1', 8),
+])
+
+# 存储记录：主机时间戳 + JustFloatFrame 中除帧头帧尾外的字段
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('command', 'u1', 2),
+    ('original_distances', '<f4', ANCHOR_NUM),
+    ('calibrated_distances', '<f4', ANCHOR_NUM),
+    ('rx_power', '<f4', ANCHOR_NUM),
+    ('position', '<f4', 3),
+    ('is_activate', 'u1', 8),
+])
+
+# 帧长度 -> 线上帧格式，长度与 protocol.FRAME_LAYOUTS 中的各格式一一对应
+WIRE_DTYPES = {dtype.itemsize: dtype for dtype in (JUST_FLOAT_DTYPE, LEGACY_FRAME_DTYPE)}
+_RECORD_FIELDS = RECORD_DTYPE.names[1:]
+
+STORE_MAGIC = b'UWBFRM'
+STORE_VERSION = 1
+_FILE_HEADER = struct.Struct('<6sHI4x')
+
+
+class FrameStoreWriter:
+    """按块追加写入帧记录
+
+    帧先放入预分配的 chunk_size 条记录的缓冲区，缓冲区满或 flush 时整块写入文件，
+    每帧不产生 Python 对象，也不需要频繁的小块写入。
+    文件已存在时报错，除非 append=True：此时省略 timestamp 的记录整体平移，
+    接在已有的最后一条记录之后，保证 FrameStore.time_slice 的二分查找仍然有效。
+    """
+
+    def __init__(self, path, chunk_size=4096, append=False):
+        self.path = path
+        self.count = 0
+        self._chunk = np.zeros(chunk_size, dtype=RECORD_DTYPE)
+        self._filled = 0
+        self._offset = 0.0  # 本次会话的单调时钟到文件中时间戳的平移量
+        if os.path.exists(path) and os.path.getsize(path):
+            if not append:
+                raise FileExistsError(f"帧存储文件已存在: {path}（追加写入需给出 append=True）")
+            timestamps = FrameStore(path).timestamps
+            if len(timestamps):
+                self._offset = max(0.0, float(timestamps[-1]) - time.monotonic())
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_FILE_HEADER.pack(STORE_MAGIC, STORE_VERSION, RECORD_DTYPE.itemsize))
+
+    def append(self, frame, timestamp=None):
+        """追加一个原始帧（JustFloatFrame 或旧版 96 字节帧），timestamp 省略时取 time.monotonic()（加上平移量）"""
+        wire_dtype = WIRE_DTYPES.get(len(frame))
+        if wire_dtype is None:
+            raise ValueError(f"无法识别的帧长度: {len(frame)}")
+        wire = np.frombuffer(frame, dtype=wire_dtype)[0]
+        record = self._chunk[self._filled]
+        record['timestamp'] = time.monotonic() + self._offset if timestamp is None else timestamp
+        for name in _RECORD_FIELDS:
+            if name in wire_dtype.names:
+                record[name] = wire[name]
+            else:
+                record[name] = np.nan  # 旧版帧中没有的字段
+        self._filled += 1
+        self.count += 1
+        if self._filled == len(self._chunk):
+            self.flush()
+
+    def write(self, frame, timestamp=None):
+        """与 capture.CaptureWriter 接口一致，可直接作为 SerialReader 的 recorder
+
+        与数据帧交错出现的非数据帧（例如命令应答 AckFrame）不存储，直接跳过，
+        不会因 append 抛出异常而使采集线程退出。
+        """
+        if len(frame) in WIRE_DTYPES:
+            self.append(frame, timestamp)
+
+    def append_records(self, records):
+        """直接追加 RECORD_DTYPE 结构化数组"""
+        self.flush()
+        np.asarray(records, dtype=RECORD_DTYPE).tofile(self._file)
+        self.count += len(records)
+
+    def flush(self):
+        if self._filled:
+            self._chunk[:self._filled].tofile(self._file)
+            self._filled = 0
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameStore:
+    """只读打开帧存储文件，记录数据通过 np.memmap 按需读取
+
+    store['rx_power'] 返回整列的 memmap 视图；time_slice 按时间戳范围切片。
+    记录按到达顺序写入，时间戳单调不减，因此可以用二分查找定位时间范围。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise ValueError(f"不是有效的帧存储文件: {path}")
+        magic, version, record_size = _FILE_HEADER.unpack(header)
+        if magic != STORE_MAGIC or version != STORE_VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"不是有效的帧存储文件: {path}")
+        self.records = self._map()
+
+    def _map(self):
+        # 写入端可能正在追加，只映射已完整写入的记录
+        with open(self.path, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+        count = (size - _FILE_HEADER.size) // RECORD_DTYPE.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode='r',
+                         offset=_FILE_HEADER.size, shape=(count,))
+
+    def refresh(self):
+        """重新映射文件，读取打开之后追加的记录"""
+        self.records = self._map()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    @property
+    def timestamps(self):
+        return self.records['timestamp']
+
+    def index_range(self, start=None, stop=None):
+        """时间范围 [start, stop) 对应的记录下标范围"""
+        timestamps = self.timestamps
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(timestamps) if stop is None else int(np.searchsorted(timestamps, stop, side='left'))
+        return lo, hi
+
+    def time_slice(self, start=None, stop=None, fields=None):
+        """取出时间范围 [start, stop) 内的记录
+
+        fields 给出字段名列表时返回 {字段名: 数组} 的字典，只读取这些列；
+        否则返回结构化数组视图。
+        """
+        lo, hi = self.index_range(start, stop)
+        chunk = self.records[lo:hi]
+        if fields is None:
+            return chunk
+        return {name: np.asarray(chunk[name]) for name in fields}
+
+
+def store_from_capture(capture_path, store_path, chunk_size=4096):
+    """把 capture 模块录制的原始帧文件转换为帧存储文件，返回转换的帧数"""
+    from .capture import read_capture
+
+    with FrameStoreWriter(store_path, chunk_size) as writer:
+        for timestamp, frame in read_capture(capture_path):
+            writer.append(frame, timestamp)
+        return writer.count
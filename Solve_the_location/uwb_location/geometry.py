@@ -0,0 +1,118 @@
+"""基站几何：所有脚本共用的基站坐标，从配置文件 anchors.json 读取
+
+坐标保存在连续的 (ANCHOR_NUM, 3) float64 数组中，按基站序号直接索引，
+未配置的基站为 NaN，二维布局的 z 为 0。修改基站坐标只需编辑配置文件（或用 save_geometry 写回）。
+每次修改坐标 version 加 1，PinvCache、PositionRefiner 据此自动使缓存失效。
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .protocol import ANCHOR_NUM
+
+# 默认配置文件：Solve_the_location/anchors.json
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'anchors.json')
+
+
+class AnchorGeometry:
+    """一种基站布局
+
+    positions: (ANCHOR_NUM, 3) 坐标数组，未配置的基站为 NaN
+    dim:       解算维数（2 或 3）
+    """
+
+    def __init__(self, anchors, dim=3):
+        self.dim = dim
+        self.positions = np.full((ANCHOR_NUM, 3), np.nan)
+        self.version = 0
+        if isinstance(anchors, dict):
+            anchors = {int(name.lstrip('d')): coords for name, coords in anchors.items()}
+        else:
+            anchors = dict(enumerate(anchors))
+        for anchor_id, coords in anchors.items():
+            self._assign(anchor_id, coords)
+
+    def _assign(self, anchor_id, coords):
+        coords = np.asarray(coords, dtype=np.float64)
+        self.positions[anchor_id] = 0.0
+        self.positions[anchor_id, :len(coords)] = coords
+
+    @property
+    def defined(self):
+        """各基站是否已配置坐标"""
+        return ~np.isnan(self.positions[:, 0])
+
+    @property
+    def ids(self):
+        """已配置坐标的基站序号"""
+        return np.flatnonzero(self.defined)
+
+    @property
+    def names(self):
+        return [f'd{i}' for i in self.ids]
+
+    @property
+    def array(self):
+        """解算用的 (基站数, dim) 坐标数组，行号即基站序号，到最后一个已配置的基站为止"""
+        count = int(self.ids[-1]) + 1 if len(self.ids) else 0
+        return self.positions[:count, :self.dim]
+
+    def __getitem__(self, anchor_id):
+        """基站坐标（dim 维），anchor_id 为整数序号"""
+        return self.positions[anchor_id, :self.dim]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def items(self):
+        """依次给出 (名称, 坐标元组)，用于打印"""
+        for anchor_id in self.ids:
+            yield f'd{anchor_id}', tuple(self.positions[anchor_id, :self.dim].tolist())
+
+    def set_anchor(self, anchor_id, coords):
+        """修改单个基站坐标（例如标定时收到的新位置）"""
+        self._assign(anchor_id, coords)
+        self.version += 1
+
+    def to_config(self):
+        """配置文件中的写法 {'d0': [x, y(, z)], ...}，只含已配置的基站"""
+        return {name: list(coords) for name, coords in self.items()}
+
+    def distances_to(self, point, ids=None):
+        """点到各基站的距离，ids 省略时为全部已配置的基站"""
+        if ids is None:
+            ids = self.ids
+        point = np.asarray(point, dtype=np.float64)
+        return np.linalg.norm(self.positions[ids, :len(point)] - point, axis=1)
+
+
+def load_geometry(layout='3d', path=None):
+    """从配置文件读取一种基站布局（'2d' 或 '3d'）"""
+    if path is None:
+        path = DEFAULT_CONFIG
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if layout not in config:
+        raise KeyError(f"配置文件 {path} 中没有基站布局 {layout!r}")
+    return AnchorGeometry(config[layout], dim=int(layout[0]))
+
+
+def save_geometry(geometry, layout=None, path=None):
+    """把一种基站布局写回配置文件，文件中的其他布局保持不变；layout 省略时按 geometry.dim 取 '2d'/'3d'"""
+    if path is None:
+        path = DEFAULT_CONFIG
+    if layout is None:
+        layout = f'{geometry.dim}d'
+    with open(path, encoding='utf-8', newline='') as f:
+        text = f.read()
+    config = json.loads(text)
+    config[layout] = geometry.to_config()
+    # 与手写的配置文件格式一致：每个基站的坐标占一行
+    layouts = []
+    for name, anchors in config.items():
+        lines = ',\n'.join(f'        {json.dumps(anchor)}: {json.dumps(coords)}' for anchor, coords in anchors.items())
+        layouts.append(f'    {json.dumps(name)}: {{\n{lines}\n    }}')
+    with open(path, 'w', encoding='utf-8', newline='\r\n' if '\r\n' in text else '\n') as f:
+        f.write('{\n' + ',\n'.join(layouts) + '\n}\n')
@@ -0,0 +1,181 @@
+"""轻量的性能统计和限流日志
+
+Instrumentation 按处理阶段（read/decode/solve/filter/render 等）记录耗时直方图，
+直方图使用对数分桶的固定数组，每次记录 O(1)，定期输出 p50/p99。
+热路径上的诊断输出改用 logging：级别未开启时只有一次 isEnabledFor 判断，
+RateLimitFilter 限制同一条消息的输出频率，避免控制台 I/O 拖慢处理。
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+
+LOGGER_NAME = 'uwb_location'
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图，范围 1µs ~ 100s，每 10 倍分 bins_per_decade 个桶"""
+
+    MIN_SECONDS = 1e-6
+    DECADES = 8
+
+    def __init__(self, bins_per_decade=20):
+        self.bins_per_decade = bins_per_decade
+        self.counts = np.zeros(self.DECADES * bins_per_decade + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= self.MIN_SECONDS:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / self.MIN_SECONDS) * self.bins_per_decade) + 1,
+                        len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """第 q 百分位的耗时(s)，取所在桶的上边界"""
+        if self.count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), math.ceil(self.count * q / 100)))
+        return min(self.MIN_SECONDS * 10 ** (index / self.bins_per_decade), self.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self):
+        self.counts.fill(0)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class _Stage:
+    """stage() 返回的计时上下文"""
+
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+
+
+class Instrumentation:
+    """各处理阶段的耗时统计
+
+        timing = Instrumentation()
+        with timing.stage('solve'):
+            ...
+        print(timing.report())
+
+    enabled=False 时 stage() 返回空上下文、record() 直接返回，几乎没有开销。
+    采集线程和主线程可以记录不同的阶段。
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self._stages = {}
+        self._null = _NullStage()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+            self._stages[name] = _Stage(histogram)
+        return histogram
+
+    def stage(self, name):
+        """计时上下文，同一阶段不可嵌套或跨线程同时使用"""
+        if not self.enabled:
+            return self._null
+        stage = self._stages.get(name)
+        if stage is None:
+            self.histogram(name)
+            stage = self._stages[name]
+        return stage
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def report(self, reset=True):
+        """各阶段的次数、p50、p99 和最大耗时(ms)"""
+        parts = []
+        for name, histogram in self.histograms.items():
+            if histogram.count:
+                parts.append(f"{name}: {histogram.count} 次 p50 {histogram.percentile(50) * 1e3:.3f}ms "
+                             f"p99 {histogram.percentile(99) * 1e3:.3f}ms 最大 {histogram.max * 1e3:.3f}ms")
+            if reset:
+                histogram.reset()
+        return '耗时统计: ' + ('; '.join(parts) if parts else '无数据')
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class RateLimitFilter(logging.Filter):
+    """同一条消息（按日志名和格式字符串区分）每 interval 秒最多输出一次
+
+    ERROR 及以上级别不限流。被省略的条数附在下一次输出的消息后面。
+    """
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.interval <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+        self._last[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.msg = f"{record.msg}（期间省略 {suppressed} 条）"
+        return True
+
+
+def get_logger(name=None):
+    """uwb_location 下的子日志，例如 get_logger('3d') -> 'uwb_location.3d'"""
+    return logging.getLogger(LOGGER_NAME if name is None else f'{LOGGER_NAME}.{name}')
+
+
+def setup_logging(level=logging.INFO, interval=1.0):
+    """配置 uwb_location 日志：输出到控制台，同一消息每 interval 秒最多一条（0 为不限流）"""
+    logger = get_logger()
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S'))
+        handler.addFilter(RateLimitFilter(interval))
+        logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
@@ -0,0 +1,127 @@
+"""常速度模型卡尔曼滤波，可替代滑动窗口加权平均的 PositionFilter
+
+状态为 [位置, 速度]（二维或三维），所有矩阵在构造时分配、原地更新，每次更新只涉及固定大小的矩阵，
+耗时与历史长度无关，也没有滑动窗口带来的滞后。
+新测量与预测的马氏距离超过门限时视为野值丢弃。
+"""
+
+import numpy as np
+
+from .position_filter import FilteredPosition
+
+
+class KalmanPositionFilter:
+    """常速度卡尔曼滤波器，update 的调用方式与 PositionFilter 相同"""
+
+    def __init__(self, dim=3, process_noise=0.5, measurement_noise=0.05,
+                 gate=3.5, max_rejects=5, dt=0.1, stable_std=0.1):
+        """
+        process_noise:     加速度噪声谱密度 (m^2/s^3)，越大越信任新测量
+        measurement_noise: 位置测量标准差 (m)
+        gate:   马氏距离门限，超过则丢弃该测量
+        max_rejects: 连续丢弃超过该次数时认为跟踪丢失，用新测量重新初始化
+        dt:     未给出时间戳时使用的默认更新间隔 (s)，固件每 100ms 发送一帧
+        stable_std: 各轴位置标准差都小于该值时认为定位稳定
+        """
+        self.dim = dim
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.gate = gate
+        self.max_rejects = max_rejects
+        self.dt = dt
+        self.stable_std = stable_std
+
+        n = 2 * dim
+        self.state = np.zeros(n)
+        self.P = np.eye(n)
+        self._F = np.eye(n)
+        self._Q = np.zeros((n, n))
+        self._H = np.hstack([np.eye(dim), np.zeros((dim, dim))])
+        self._R = np.eye(dim) * measurement_noise ** 2
+        self._I = np.eye(n)
+        self._last_time = None
+        self._initialized = False
+
+        self.rejected_count = 0      # 累计丢弃的测量数
+        self.consecutive_rejects = 0
+        self.last_mahalanobis = 0.0  # 最近一次测量的马氏距离
+
+    @property
+    def position(self):
+        return self.state[:self.dim]
+
+    @property
+    def velocity(self):
+        return self.state[self.dim:]
+
+    @property
+    def covariance(self):
+        """位置的协方差矩阵"""
+        return self.P[:self.dim, :self.dim]
+
+    def _initialize(self, z):
+        self.state[:self.dim] = z
+        self.state[self.dim:] = 0.0
+        self.P[:] = 0.0
+        self.P[:self.dim, :self.dim] = self._R
+        self.P[self.dim:, self.dim:] = np.eye(self.dim)  # 初始速度未知，给 1 m/s 的标准差
+        self._initialized = True
+        self.consecutive_rejects = 0
+
+    def _predict(self, dt):
+        d = self.dim
+        self._F[:d, d:] = np.eye(d) * dt
+        # 白噪声加速度模型的离散化过程噪声
+        q = self.process_noise
+        self._Q[:d, :d] = np.eye(d) * (q * dt ** 3 / 3)
+        self._Q[:d, d:] = self._Q[d:, :d] = np.eye(d) * (q * dt ** 2 / 2)
+        self._Q[d:, d:] = np.eye(d) * (q * dt)
+        self.state[:] = self._F @ self.state
+        self.P[:] = self._F @ self.P @ self._F.T + self._Q
+
+    def update(self, new_position, timestamp=None):
+        """输入一次测量位置，返回 FilteredPosition；timestamp 为测量时刻(s)，省略时按默认间隔 dt 预测"""
+        if new_position is None:
+            return None
+        z = np.asarray(new_position, dtype=np.float64)[:self.dim]
+
+        dt = self.dt
+        if timestamp is not None:
+            if self._last_time is not None:
+                dt = max(timestamp - self._last_time, 1e-6)
+            self._last_time = timestamp
+
+        if not self._initialized:
+            self._initialize(z)
+            return self._result()
+
+        self._predict(dt)
+
+        # 新息及其协方差
+        y = z - self._H @ self.state
+        S = self._H @ self.P @ self._H.T + self._R
+        S_inv = np.linalg.inv(S)
+        self.last_mahalanobis = float(np.sqrt(y @ S_inv @ y))
+        if self.last_mahalanobis > self.gate:
+            self.rejected_count += 1
+            self.consecutive_rejects += 1
+            if self.consecutive_rejects > self.max_rejects:
+                self._initialize(z)  # 跟踪丢失，重新初始化
+            return self._result()
+        self.consecutive_rejects = 0
+
+        K = self.P @ self._H.T @ S_inv
+        self.state += K @ y
+        self.P[:] = (self._I - K @ self._H) @ self.P
+        return self._result()
+
+    def _result(self):
+        std = np.sqrt(np.diag(self.covariance))
+        return FilteredPosition(self.position.tolist(), tuple(std.tolist()),
+                                bool(np.all(std < self.stable_std)))
+
+    def reset(self):
+        """重置滤波器"""
+        self._initialized = False
+        self._last_time = None
+        self.consecutive_rejects = 0
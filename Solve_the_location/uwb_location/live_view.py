@@ -0,0 +1,215 @@
+"""实时定位显示：静态场景只绘制一次，每帧只更新标签位置、标签文字和基站颜色
+
+后端支持 blit 时只重绘变化的图元，否则退化为 draw_idle。
+导入本模块会导入 matplotlib，无界面运行的代码（uwb_location.locate）只在需要绘图时导入。
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+ACTIVE_COLOR = 'blue'
+INACTIVE_COLOR = 'gray'
+
+
+def _anchor_layout(anchors):
+    """基站序号、名称和坐标，anchors 为 AnchorGeometry 或 {'d0': 坐标, ...}"""
+    if hasattr(anchors, 'names'):
+        return list(anchors.ids), anchors.names, anchors.positions[anchors.ids]
+    names = list(anchors.keys())
+    ids = [int(name.lstrip('d')) for name in names]
+    return ids, names, np.array([anchors[name] for name in names], dtype=np.float64)
+
+
+class _LiveView:
+    """blit 的公共部分：缓存静态背景，每帧恢复背景后只绘制动态图元
+
+    子类创建图元并提供 _set_tag(position)（更新动态图元）和 _set_anchor_colors(active_anchors)。
+    """
+
+    def __init__(self, fig):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.use_blit = getattr(self.canvas, 'supports_blit', False)
+        self._background = None
+        self._animated = []
+        self._active = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _add_animated(self, *artists):
+        for artist in artists:
+            artist.set_animated(self.use_blit)
+            self._animated.append(artist)
+
+    def _on_draw(self, event):
+        """窗口缩放、旋转等导致整体重绘后重新缓存背景"""
+        if self.use_blit:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+            self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated:
+            self.fig.draw_artist(artist)
+
+    def update(self, position, active_anchors):
+        """更新标签位置和基站状态并刷新显示"""
+        active = tuple(int(a) for a in active_anchors)
+        self._set_tag(position)
+        if active != self._active:
+            # 基站颜色属于静态背景，变化时整体重绘一次（很少发生）
+            self._active = active
+            self._set_anchor_colors(active)
+            self.canvas.draw()
+        elif self.use_blit and self._background is not None:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+        else:
+            self.canvas.draw_idle()
+        self.canvas.flush_events()
+
+    def poll(self, timeout=0.01):
+        """处理界面事件最多 timeout 秒，窗口已关闭或按下按键时返回 False"""
+        if not plt.fignum_exists(self.fig.number):
+            return False
+        return not plt.waitforbuttonpress(timeout=timeout)
+
+    def close(self):
+        plt.ioff()
+        plt.close(self.fig)
+
+
+class LiveView2D(_LiveView):
+    """二维实时显示，与原 plot_position 的样式一致"""
+
+    def __init__(self, anchors, figsize=(12, 8)):
+        fig, ax = plt.subplots(figsize=figsize)
+        super().__init__(fig)
+        self.ax = ax
+        self.anchor_ids, self.anchor_names, coords = _anchor_layout(anchors)
+        coords = coords[:, :2]
+
+        # 设置网格
+        ax.grid(True, which='major', linestyle='-', linewidth='0.5')
+        ax.minorticks_on()
+        ax.grid(True, which='minor', linestyle=':', linewidth='0.5', alpha=0.5)
+
+        # 设置刻度
+        ax.set_xticks(np.arange(0, 4.8, 0.6))
+        ax.set_yticks(np.arange(0, 1.8, 0.6))
+
+        # 基站位置
+        self.anchor_markers = ax.scatter(coords[:, 0], coords[:, 1], marker='s', s=100,
+                                         c=[INACTIVE_COLOR] * len(coords))
+        self.anchor_labels = [
+            ax.annotate(name, tuple(pos), xytext=(5, 5), textcoords='offset points',
+                        fontsize=12, color=INACTIVE_COLOR)
+            for name, pos in zip(self.anchor_names, coords)
+        ]
+
+        # 标签位置
+        self.tag_marker, = ax.plot([], [], 'ro', markersize=12)
+        self.tag_label = ax.annotate('', (0, 0), xytext=(10, 10), textcoords='offset points',
+                                     bbox=dict(boxstyle="round,pad=0.3", fc="yellow", ec="b", alpha=0.3))
+        self.tag_label.set_visible(False)
+        self._add_animated(self.tag_marker, self.tag_label)
+
+        ax.set_xlabel('X (meters)')
+        ax.set_ylabel('Y (meters)')
+        ax.set_title('Current Tag Position (Grid: 0.6m)')
+        ax.set_xlim(-0.3, 4.5)
+        ax.set_ylim(-0.3, 1.5)
+        ax.axis('equal')
+
+    def _set_anchor_colors(self, active_anchors):
+        colors = [ACTIVE_COLOR if active_anchors[i] == 1 else INACTIVE_COLOR
+                  for i in self.anchor_ids]
+        self.anchor_markers.set_color(colors)
+        for label, color in zip(self.anchor_labels, colors):
+            label.set_color(color)
+
+    def _set_tag(self, position):
+        if position is None:
+            self.tag_marker.set_data([], [])
+            self.tag_label.set_visible(False)
+            return
+        x, y = position[:2]
+        self.tag_marker.set_data([x], [y])
+        self.tag_label.xy = (x, y)
+        self.tag_label.set_text(f'({x:.2f}, {y:.2f})')
+        self.tag_label.set_visible(True)
+
+
+class LiveView3D(_LiveView):
+    """三维实时显示，与原 plot_position_3d 的样式一致"""
+
+    def __init__(self, anchors, figsize=(12, 8)):
+        fig = plt.figure(figsize=figsize)
+        super().__init__(fig)
+        ax = fig.add_subplot(111, projection='3d')
+        self.ax = ax
+        self.anchor_ids, self.anchor_names, coords = _anchor_layout(anchors)
+
+        # 基站位置、标注和到地面的投影线
+        self.anchor_markers = ax.scatter(coords[:, 0], coords[:, 1], coords[:, 2], marker='s', s=100,
+                                         c=[INACTIVE_COLOR] * len(coords), depthshade=False)
+        self.anchor_labels = []
+        self.anchor_drops = []
+        for name, pos in zip(self.anchor_names, coords):
+            self.anchor_labels.append(
+                ax.text(pos[0], pos[1], pos[2], f'{name}\n({pos[0]:.1f}, {pos[1]:.1f}, {pos[2]:.1f})',
+                        color=INACTIVE_COLOR, fontsize=8))
+            drop, = ax.plot([pos[0], pos[0]], [pos[1], pos[1]], [0, pos[2]],
+                            '--', color='lightgray', alpha=0.5)
+            drop.set_visible(False)
+            self.anchor_drops.append(drop)
+
+        # 标签位置、标注和投影线
+        self.tag_marker, = ax.plot([], [], [], 'o', color='red', markersize=10)
+        self.tag_label = ax.text(0, 0, 0, '', color='red', fontsize=8,
+                                 bbox=dict(facecolor='yellow', alpha=0.3))
+        self.tag_drop, = ax.plot([], [], [], '--', color='red', alpha=0.5)
+        self.tag_label.set_visible(False)
+        self._add_animated(self.tag_marker, self.tag_label, self.tag_drop)
+
+        # 地面网格
+        xx, yy = np.meshgrid(np.linspace(0, 4.2, 5), np.linspace(0, 1.2, 3))
+        ax.plot_surface(xx, yy, np.zeros_like(xx), alpha=0.1, color='gray')
+
+        ax.set_xlabel('X (meters)')
+        ax.set_ylabel('Y (meters)')
+        ax.set_zlabel('Z (meters)')
+        ax.set_title(f'3D Tag Position with {len(coords)} Anchors')
+        ax.set_xlim(-0.3, 4.5)
+        ax.set_ylim(-0.3, 1.5)
+        ax.set_zlim(0, 2.0)
+        ax.grid(True)
+        ax.view_init(elev=20, azim=45)
+        ax.set_box_aspect([4.8, 1.8, 2.0])
+
+    def _set_anchor_colors(self, active_anchors):
+        colors = [ACTIVE_COLOR if active_anchors[i] == 1 else INACTIVE_COLOR
+                  for i in self.anchor_ids]
+        self.anchor_markers.set_color(colors)
+        for label, drop, color in zip(self.anchor_labels, self.anchor_drops, colors):
+            label.set_color(color)
+            drop.set_visible(color == ACTIVE_COLOR)
+
+    def _set_tag(self, position):
+        if position is None:
+            self.tag_marker.set_data_3d([], [], [])
+            self.tag_drop.set_data_3d([], [], [])
+            self.tag_label.set_visible(False)
+            return
+        x, y, z = position
+        self.tag_marker.set_data_3d([x], [y], [z])
+        self.tag_drop.set_data_3d([x, x], [y, y], [0, z])
+        self.tag_label.set_position_3d((x, y, z))
+        self.tag_label.set_text(f'Tag\n({x:.2f}, {y:.2f}, {z:.2f})')
+        self.tag_label.set_visible(True)
+
+
+def open_live_view(anchors):
+    """打开交互模式的实时显示，按基站布局的维数选择二维或三维视图"""
+    plt.ion()
+    dim = anchors.dim if hasattr(anchors, 'dim') else len(next(iter(anchors.values())))
+    return LiveView2D(anchors) if dim == 2 else LiveView3D(anchors)
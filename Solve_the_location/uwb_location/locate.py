@@ -0,0 +1,377 @@
+"""逐帧定位流程：解析帧、解算、精化、滤波，以及串口（或回放）主循环
+
+2d解算.py、3d解算.py 和命令行 python -m uwb_location 共用这里的代码。
+本模块及其依赖只需要 numpy：pyserial 在打开串口时、matplotlib 在需要绘图时才导入，
+无界面的定位进程启动时不加载它们。
+
+    locator = Locator(load_geometry('3d'))
+    fix = locator.locate(distances_with_ids, rx_powers)
+"""
+
+import json
+import logging
+import math
+import sys
+import time
+from collections import namedtuple
+
+from .acquisition import SerialReader
+from .capture import CaptureReplay, CaptureWriter
+from .dop import DopTable
+from .frame_decoder import FrameDecoder
+from .geometry import load_geometry
+from .instrument import Instrumentation, get_logger, setup_logging
+from .kalman import KalmanPositionFilter
+from .position_filter import PositionFilter
+from .protocol import ANCHOR_NUM, BAUD_RATE, FRAME_LAYOUTS, unpack_frame
+from .ransac import RansacSolver
+from .refine import PositionRefiner
+from .solver_cache import PinvCache
+from .weighting import rx_power_weights
+
+# position: 解算（及精化）后的位置；filtered: 滤波结果（未启用滤波或滤波器尚无输出时为 None）；
+# bound: DOP 给出的误差上界(m)，未使用 DOP 表时为 None；anchors: 实际参与解算的基站序号；
+# rejected: 被剔除的基站序号（疑似 NLOS 和 RANSAC 野值）；timestamp: 帧的时间戳(s)
+LocationFix = namedtuple('LocationFix', ['position', 'filtered', 'bound', 'anchors', 'rejected', 'timestamp'])
+
+
+class Locator:
+    """一种基站布局下的逐帧定位
+
+    按接收功率加权并剔除疑似 NLOS 基站 -> RANSAC 剔除野值 -> 按 DOP 表选择基站子集的线性解算
+    -> 非线性精化 -> 滤波，每一步都可以关闭。
+
+    geometry:        geometry.AnchorGeometry，dim 决定二维/三维解算
+    rx_weighting:    是否按接收功率加权（需要含 rx_power 的固件帧）
+    ransac:          是否用 RANSAC 剔除野值，ransac_threshold/ransac_budget 见 ransac.RansacSolver
+    dop:             是否按 DOP 表选择基站子集和参考基站，并给出误差上界
+    noise:           标称测距噪声(m)，用于误差上界
+    refine:          是否做非线性精化，None 时三维精化、二维不精化
+    filter_mode:     'window' 滑动窗口加权平均；'kalman' 常速度卡尔曼滤波；None 不滤波
+    timing:          instrument.Instrumentation，记录 solve、filter 阶段的耗时
+    """
+
+    def __init__(self, geometry, rx_weighting=True, ransac=True, ransac_threshold=0.2, ransac_budget=1e-3,
+                 dop=True, noise=0.05, refine=None, filter_mode='window', timing=None):
+        self.geometry = geometry
+        self.dim = geometry.dim
+        self.log = get_logger(f'{self.dim}d')
+        self.timing = timing if timing is not None else Instrumentation(enabled=False)
+        self.rx_weighting = rx_weighting
+        # 按有效基站组合缓存的伪逆（二维为相邻基站作差），基站坐标修改后自动失效
+        self.solver_cache = PinvCache(geometry, chained=self.dim == 2)
+        self.dop_table = DopTable(self.solver_cache, noise=noise) if dop else None
+        self.ransac = RansacSolver(self.solver_cache, ransac_threshold, ransac_budget) if ransac else None
+        if refine is None:
+            refine = self.dim == 3
+        self.refiner = PositionRefiner(geometry, tol=1e-4, max_iter=10) if refine else None
+        self.filter_mode = filter_mode
+        if filter_mode == 'kalman':
+            self.position_filter = KalmanPositionFilter(dim=self.dim, process_noise=0.5, measurement_noise=0.05)
+        elif filter_mode == 'window':
+            self.position_filter = PositionFilter(dim=self.dim)
+        else:
+            self.position_filter = None
+        self.estimate = None  # 上一帧的位置，用于查 DOP 表
+
+    def parse_frame(self, frame):
+        """解析一帧已对齐的数据（由FrameDecoder给出），提取距离、接收功率和基站状态
+
+        返回 (distances_with_ids, rx_powers)，旧版帧没有接收功率时 rx_powers 为 None
+        """
+        frame = unpack_frame(frame)  # 按 command 字节和帧长度选用对应的帧格式解码
+
+        # 使用有效的基站状态
+        distances_with_ids = [
+            (i, dist) for i, (dist, active) in enumerate(
+                zip(frame.calibrated_distances, frame.is_active)
+            ) if active == 1
+        ]
+
+        if self.log.isEnabledFor(logging.DEBUG):
+            lines = []
+            for anchor_id, distance in distances_with_ids:
+                power = f", 接收功率 {frame.rx_power[anchor_id]:.1f}dBm" if frame.rx_power is not None else ""
+                lines.append(f"d{anchor_id}距离: {distance:.3f}m{power} (基站坐标: {self.geometry[anchor_id].tolist()})")
+            self.log.debug("活动基站和距离值: %s", "; ".join(lines))
+
+        return distances_with_ids, frame.rx_power
+
+    def calculate_position(self, distances_with_ids, weights=None):
+        """线性解算一帧位置，返回 (位置, 误差上界, 参与解算的基站序号)
+
+        无法解算时位置为 None，不使用 DOP 表时误差上界为 None。
+        """
+        log = self.log
+        if len(distances_with_ids) < self.dim + 1:
+            log.warning("有效基站数量不足，无法计算%s维位置", '二' if self.dim == 2 else '三')
+            return None, None, []
+
+        try:
+            bound = None
+            if self.dop_table is not None:
+                # 按上一帧的位置查 DOP 表，选择几何条件最好的基站子集和参考基站
+                fix = self.dop_table.solve(distances_with_ids, self.estimate, weights)
+                solution = None if fix is None else fix.position
+                if fix is not None:
+                    bound, ids = fix.bound, fix.ids
+                    log.debug("DOP 选择基站: %s, 参考基站 %s, DOP = %.2f", ', '.join(f'd{i}' for i in fix.ids),
+                              '-' if fix.reference is None else f'd{fix.reference}', fix.dop)
+            else:
+                # 系数矩阵的伪逆按有效基站组合缓存，每帧只需一次矩阵乘向量
+                # 给出权重时改用加权最小二乘（系数矩阵同样来自缓存）
+                solution = self.solver_cache.solve(distances_with_ids, weights)
+                # 坐标未标定的基站不参与解算
+                defined = self.solver_cache.defined
+                ids = [anchor_id for anchor_id, _ in distances_with_ids
+                       if anchor_id < len(defined) and defined[anchor_id]]
+            if solution is None:
+                log.warning("有效基站坐标不足，无法计算位置")
+                return None, None, []
+            return tuple(float(value) for value in solution), bound, ids
+        except Exception as e:
+            log.error("位置计算错误: %s", e)
+            return None, None, []
+
+    def locate(self, distances_with_ids, rx_powers=None, timestamp=None):
+        """完整处理一帧，返回 LocationFix，无法解算时返回 None
+
+        timestamp 为帧的时间戳（回放时为录制的时间戳），省略时取当前时间 time.time()。
+        """
+        log = self.log
+        rejected = []
+        with self.timing.stage('solve'):
+            weights = None
+            if self.rx_weighting:
+                # 按接收功率加权，功率明显偏低（疑似NLOS）的基站降权或剔除
+                weighting = rx_power_weights(distances_with_ids, rx_powers, min_anchors=self.dim + 1)
+                distances_with_ids, weights = weighting.distances_with_ids, weighting.weights
+                if weighting.dropped:
+                    log.info("疑似NLOS已剔除基站: %s", ', '.join(f'd{i}' for i in weighting.dropped))
+                    rejected.extend(weighting.dropped)
+            if self.ransac is not None:
+                # 按最小子集的测距残差一致性剔除野值基站，只用内点解算
+                fix = self.ransac.solve(distances_with_ids, weights)
+                if fix is not None and fix.outliers:
+                    log.info("RANSAC 已剔除基站: %s", ', '.join(f'd{i}' for i in fix.outliers))
+                    rejected.extend(fix.outliers)
+                    keep = [k for k, (anchor_id, _) in enumerate(distances_with_ids) if anchor_id in fix.inliers]
+                    distances_with_ids = [distances_with_ids[k] for k in keep]
+                    weights = None if weights is None else [weights[k] for k in keep]
+            position, bound, anchors = self.calculate_position(distances_with_ids, weights)
+            if position is not None and self.refiner is not None:
+                # 非线性精化：最小化真实测距残差，迭代次数有上限
+                result = self.refiner.refine(distances_with_ids, position, weights)
+                position = tuple(float(v) for v in result.position)
+                log.debug("非线性精化: 残差 = %.4fm, 迭代 %d 次%s", result.residual, result.iterations,
+                          '' if result.converged else '（未收敛）')
+        if position is None:
+            return None
+        if not all(math.isfinite(value) for value in position):
+            # 测距异常（例如 NaN）时解算结果不是有限值，不能作为下一帧查 DOP 表的位置估计
+            log.warning("解算结果不是有限值，丢弃该帧")
+            return None
+        if timestamp is None:
+            timestamp = time.time()
+        self.estimate = position
+
+        filtered = None
+        if self.position_filter is not None:
+            with self.timing.stage('filter'):
+                # 卡尔曼滤波按帧的时间间隔预测（帧率可达数百 Hz，不能用默认的 0.1s）
+                filtered = self.position_filter.update(position, timestamp)
+        return LocationFix(position, filtered, bound, anchors, rejected, timestamp)
+
+    def report(self, fix):
+        """输出一次定位结果（日志）"""
+        log = self.log
+        if not log.isEnabledFor(logging.INFO):
+            return  # 逐帧调用，日志级别更高时不格式化坐标
+        position = fix.position if fix.filtered is None else fix.filtered
+        coords = ', '.join(f'{axis} = {value:.4f}m' for axis, value in zip('XYZ', position))
+        if fix.bound is not None:
+            log.info("计算得到的位置: %s, 误差上界 %.3fm", coords, fix.bound)
+        else:
+            log.info("计算得到的位置: %s", coords)
+        if fix.filtered is not None and not fix.filtered.is_stable:
+            log.info("位置不稳定: 标准差 %s", ', '.join(f'{axis} = {value:.3f}m'
+                                                  for axis, value in zip('XYZ', fix.filtered.std)))
+        if self.filter_mode == 'kalman' and log.isEnabledFor(logging.DEBUG):
+            log.debug("估计速度: %s", ', '.join(f'V{axis.lower()} = {value:.3f}m/s'
+                                              for axis, value in zip('XYZ', self.position_filter.velocity)))
+
+    def stats(self):
+        return self.ransac.stats() if self.ransac is not None else None
+
+
+class PositionWriter:
+    """把定位结果逐行写出：扩展名为 .jsonl 时为 JSON Lines，否则为 CSV；path 为 '-' 时写到标准输出
+
+    每行包含帧的时间戳（LocationFix.timestamp，回放时为录制文件中的主机单调时钟时间戳）、
+    位置（有滤波结果时为滤波后的位置）、误差上界和参与解算的基站。
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.axes = 'xyz'[:dim]
+        self.json = path.endswith('.jsonl')
+        self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        self.count = 0
+        if not self.json:
+            self.file.write(','.join(['time', *self.axes, 'bound', 'anchors']) + '\n')
+
+    def write(self, fix):
+        timestamp = fix.timestamp
+        position = fix.position if fix.filtered is None else fix.filtered
+        if self.json:
+            record = {'time': round(timestamp, 6), **{axis: round(v, 4) for axis, v in zip(self.axes, position)},
+                      'bound': None if fix.bound is None else round(fix.bound, 4), 'anchors': fix.anchors}
+            self.file.write(json.dumps(record) + '\n')
+        else:
+            bound = '' if fix.bound is None else f'{fix.bound:.4f}'
+            self.file.write(f"{timestamp:.6f},{','.join(f'{v:.4f}' for v in position)},{bound},"
+                            f"{' '.join(str(i) for i in fix.anchors)}\n")
+        self.count += 1
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+def run(locator, ser, view=None, writer=None, timing=None, recorder=None, maxsize=256,
+        update_interval=1 / 30, stats_interval=5.0):
+    """主循环：后台线程读取并解码，逐帧定位，按间隔刷新显示和输出统计
+
+    view 为 live_view.LiveView2D/3D，None 时不绘图（无界面运行）；writer 为 PositionWriter。
+    窗口关闭或按键、回放结束、KeyboardInterrupt 时返回。
+    """
+    log = locator.log
+    timing = timing if timing is not None else locator.timing
+    # 定位结果写到标准输出时，提示信息改为输出到标准错误
+    out = sys.stderr if writer is not None and writer.file is sys.stdout else sys.stdout
+    decoder = FrameDecoder(layouts=FRAME_LAYOUTS)  # 同时识别含 rx_power 的固件帧和旧版帧
+    # 后台线程持续读取串口并解码，绘图不再阻塞采集
+    # 每帧在解码时打上时间戳：回放时取录制的时间戳，串口取当前时间
+    stamp = ser.frame_timestamp if isinstance(ser, CaptureReplay) else time.time
+
+    def decode(frame):
+        return stamp(), locator.parse_frame(frame)
+
+    reader = SerialReader(ser, decoder, decode=decode, maxsize=maxsize, recorder=recorder, timing=timing)
+    reader.start()
+    latest = None  # 最近一次待绘制的 (位置, 活动基站)
+    last_update_time = last_stats_time = time.time()
+    try:
+        while True:
+            if view is None:
+                # 无界面时阻塞等待下一帧，不空转
+                first = reader.get(timeout=0.1)
+                items = [] if first is None else [first] + reader.get_all()
+            else:
+                items = reader.get_all()
+            # 处理采集队列中已解码的每一帧
+            for timestamp, (distances_with_ids, rx_powers) in items:
+                fix = locator.locate(distances_with_ids, rx_powers, timestamp)
+                if fix is None:
+                    continue
+                locator.report(fix)
+                if writer is not None:
+                    writer.write(fix)
+                position = fix.position if fix.filtered is None else fix.filtered
+                active_anchors = [1 if i in fix.anchors else 0 for i in range(ANCHOR_NUM)]
+                latest = (tuple(position), active_anchors)
+
+            if reader.error is not None:
+                raise reader.error
+            if reader.finished and reader.depth == 0:
+                print(f"回放结束，共 {ser.frames_replayed} 帧", file=out)
+                print(reader.stats(), file=out)
+                print(timing.report(), file=out)
+                if locator.stats() is not None:
+                    print(locator.stats(), file=out)
+                break
+
+            # 绘图只使用最新的位置，按固定间隔刷新
+            current_time = time.time()
+            if view is not None and latest is not None and current_time - last_update_time >= update_interval:
+                with timing.stage('render'):
+                    view.update(latest[0], latest[1])
+                last_update_time = current_time
+                latest = None
+            if current_time - last_stats_time >= stats_interval:
+                log.info("%s", reader.stats())
+                log.info("%s", timing.report())
+                if locator.stats() is not None:
+                    log.info("%s", locator.stats())
+                last_stats_time = current_time
+
+            if view is not None and not view.poll(0.01):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.stop()
+
+
+def run_session(layout='3d', port=None, baud=BAUD_RATE, replay=None, realtime=True, record=None, output=None,
+                plot=False, config=None, log_level=logging.INFO, timing=True, stats_interval=5.0,
+                update_interval=1 / 30, record_append=False, **options):
+    """打开串口（或回放录制文件）、定位直到结束，并关闭所有资源
+
+    返回退出状态：正常结束为 0，打开串口/录制文件失败或定位过程出错为 1。
+
+    layout:   '2d' 或 '3d'，基站坐标从 config（默认 anchors.json）读取
+    port:     串口名，replay 为录制文件时不打开串口
+    realtime: 回放时按录制节奏输出；False 为尽可能快地回放，用于回归测试和性能分析
+    record:   把收到的原始帧录制到该文件，文件已存在时报错，record_append=True 时追加
+    output:   定位结果输出文件（见 PositionWriter），None 为不输出
+    plot:     是否显示实时定位图（此时才导入 matplotlib）
+    options:  传给 Locator 的参数（rx_weighting、ransac、dop、refine、filter_mode 等）
+    """
+    setup_logging(log_level, interval=1.0)  # 同一条消息每秒最多输出一次
+    timing = Instrumentation(enabled=timing)  # 各阶段耗时统计
+    geometry = load_geometry(layout, config)  # 从 anchors.json 读取，按基站序号索引
+    locator = Locator(geometry, timing=timing, **options)
+    ser = recorder = writer = view = None
+    out = sys.stderr if output == '-' else sys.stdout  # 定位结果写到标准输出时，提示信息输出到标准错误
+    status = 0
+    try:
+        if replay:
+            ser = CaptureReplay(replay, realtime=realtime)
+            print(f"回放录制文件: {replay}", file=out)
+        else:
+            import serial  # 只有打开串口时才需要 pyserial
+            ser = serial.Serial(port, baud, timeout=0.1)
+            print("串口连接成功", file=out)
+        recorder = CaptureWriter(record, append=record_append) if record else None
+        writer = PositionWriter(output, geometry.dim) if output else None
+        print("基站布局：", file=out)
+        for anchor_name, pos in geometry.items():
+            print(f"{anchor_name}: ({', '.join(f'{v:.1f}' for v in pos)})", file=out)
+        if plot:
+            from .live_view import open_live_view  # 导入 matplotlib 较慢，只在需要绘图时导入
+            view = open_live_view(geometry)
+        ser.reset_input_buffer()
+        # 快速回放时不限制队列长度，保证每一帧都被处理
+        maxsize = 0 if replay and not realtime else 256
+        run(locator, ser, view, writer, timing, recorder, maxsize, update_interval, stats_interval)
+
+    except Exception as e:
+        print(f"发生错误: {e}", file=out)
+        status = 1
+
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(f"已录制 {recorder.count} 帧到 {record}", file=out)
+        if writer is not None:
+            writer.close()
+        if ser is not None and ser.is_open:
+            ser.close()
+            if not replay:
+                print("\n串口已关闭", file=out)
+        if view is not None:
+            view.close()
+    return status
@@ -0,0 +1,170 @@
+"""在线校准：用递推最小二乘（RLS）逐帧更新每个基站的校准参数 k、b
+
+实际距离 = k × 测量距离 + b。每来一个样本只做一次 2×2 的更新（所有基站向量化一起算），
+不需要保存历史样本，可以一边正常采集一边校准。
+
+鲁棒处理：
+  - 固件在基站没有新测距时重复发送上一次的距离，与上一个值完全相同的样本视为过期，直接跳过；
+  - 先验残差按预测标准差 σ·sqrt(1 + φᵀPφ) 归一化，超过 huber 倍时按 Huber 权重降权，
+    超过 reject 倍时丢弃（前 warmup 个样本只降权不丢弃）；
+  - k 带有物理先验（测距尺度误差很小），只在一个距离上采样时个别离群值也定不出错误的斜率；
+  - 连续 reset_after 个样本被丢弃说明是模型错了而不是数据错了（例如早期的离群值把参数带偏），
+    此时该基站从先验重新开始，按新数据重新收敛。
+残差尺度 σ 从标称噪声 noise 开始，用截断后的 |先验残差| 的滑动平均更新。
+参数的标准误差为 sqrt(diag(P))·σ，k 和 b 的标准误差都低于 tolerance 时视为收敛。
+"""
+
+import numpy as np
+
+from .protocol import ANCHOR_NUM
+
+# 高斯分布下 E|e| = σ·sqrt(2/π)
+_ABS_TO_SIGMA = np.sqrt(np.pi / 2)
+
+
+class OnlineCalibrator:
+    """所有基站的在线校准状态
+
+    noise:       标称测距噪声(m)，残差尺度的初值
+    prior:       k、b 的先验标准差（先验均值为 k=1、b=0）
+    forgetting:  遗忘因子，1 为不遗忘；略小于 1 时可以跟踪缓慢的漂移
+    huber:       Huber 降权阈值（预测标准差的倍数）
+    reject:      丢弃阈值（预测标准差的倍数）
+    warmup:      开始丢弃离群样本前需要的样本数
+    reset_after: 连续丢弃多少个样本后重置协方差
+    tolerance:   收敛判据，k 和 b 的标准误差都小于 tolerance 且样本数不少于 min_samples 时视为收敛
+    """
+
+    def __init__(self, anchor_num=ANCHOR_NUM, noise=0.05, prior=(0.1, 2.0), forgetting=1.0, huber=2.0,
+                 reject=6.0, warmup=10, reset_after=5, tolerance=(0.005, 0.01), min_samples=20):
+        self.noise = noise
+        self.forgetting = forgetting
+        self.huber = huber
+        self.reject = reject
+        self.warmup = warmup
+        self.reset_after = reset_after
+        self.tolerance = np.asarray(tolerance, dtype=np.float64)
+        self.min_samples = min_samples
+        self._P0 = np.diag(np.square(prior)) / noise ** 2  # P 不含残差方差，先验协方差除以 σ²
+
+        self.theta = np.empty((anchor_num, 2))                  # 每个基站的 (k, b)
+        self.P = np.empty((anchor_num, 2, 2))                   # RLS 协方差（未乘残差方差）
+        self.scale = np.empty(anchor_num)                       # 残差尺度（标准差）
+        self.samples = np.zeros(anchor_num, dtype=np.int64)     # 已使用的样本数
+        self.stale = np.zeros(anchor_num, dtype=np.int64)       # 跳过的重复样本数
+        self.rejected = np.zeros(anchor_num, dtype=np.int64)    # 丢弃的离群样本数
+        self.downweighted = np.zeros(anchor_num, dtype=np.int64)  # Huber 降权的样本数
+        self.resets = np.zeros(anchor_num, dtype=np.int64)      # 协方差重置次数
+        self._run = np.zeros(anchor_num, dtype=np.int64)        # 连续丢弃的样本数
+        self._last = np.empty(anchor_num)                       # 每个基站上一次的测量值
+        self._abs_residual = np.empty(anchor_num)               # |先验残差| 的滑动平均
+        self.reset()
+
+    def update(self, measured, actual, active=None):
+        """加入一帧样本
+
+        measured: 各基站的测量距离（原始距离）
+        actual:   实际距离，标量（所有基站相同）或各基站一个值
+        active:   各基站是否有效，省略时为全部有效
+        返回本帧实际用于更新的基站掩码
+        """
+        measured = np.asarray(measured, dtype=np.float64)
+        actual = np.broadcast_to(np.asarray(actual, dtype=np.float64), measured.shape)
+        use = ~np.isnan(measured) & ~np.isnan(actual)
+        if active is not None:
+            use &= np.asarray(active, dtype=bool)
+
+        stale = use & (measured == self._last)
+        self.stale += stale
+        self._last = np.where(use, measured, self._last)
+        use &= ~stale
+        if not use.any():
+            return use
+
+        ids = np.flatnonzero(use)
+        x, y = measured[ids], actual[ids]
+        # 连续丢弃过多：从先验重新开始，本样本按新模型计算
+        restart = ids[self._run[ids] >= self.reset_after]
+        if len(restart):
+            self.theta[restart] = (1.0, 0.0)
+            self.P[restart] = self._P0
+            self.scale[restart] = self.noise
+            self._abs_residual[restart] = self.noise / _ABS_TO_SIGMA
+            self._run[restart] = 0
+            self.resets[restart] += 1
+
+        theta, P = self.theta[ids], self.P[ids]
+        phi = np.stack([x, np.ones_like(x)], axis=1)
+        residual = y - np.einsum('ni,ni->n', phi, theta)
+        P_phi = np.einsum('nij,nj->ni', P, phi)
+        phi_P_phi = np.einsum('ni,ni->n', phi, P_phi)
+        predicted = self.scale[ids] * np.sqrt(1.0 + phi_P_phi)
+        ratio = np.abs(residual) / predicted
+        rejected = (ratio > self.reject) & (self.samples[ids] >= self.warmup)
+        downweighted = (ratio > self.huber) & ~rejected
+        weight = self.huber / np.maximum(ratio, self.huber)
+        self.rejected[ids[rejected]] += 1
+        self.downweighted[ids[downweighted]] += 1
+        self._run[ids] = np.where(rejected, self._run[ids] + 1, 0)
+
+        # 加权 RLS：K = w P φ / (λ + w φᵀ P φ)，P = (P - K φᵀ P) / λ
+        kept = ~rejected
+        gain = weight[:, None] * P_phi / (self.forgetting + weight * phi_P_phi)[:, None]
+        theta[kept] += gain[kept] * residual[kept, None]
+        P[kept] = (P[kept] - gain[kept, :, None] * P_phi[kept, None, :]) / self.forgetting
+
+        # 残差尺度：|先验残差| 截断到 huber 倍预测标准差、去掉参数不确定性后做滑动平均，标称噪声算作一个样本
+        kept_ids = ids[kept]
+        clipped = np.minimum(np.abs(residual[kept]), self.huber * predicted[kept]) / np.sqrt(1.0 + phi_P_phi[kept])
+        count = self.samples[kept_ids] + 1
+        alpha = np.maximum(1.0 / (count + 1), 0.05)
+        self._abs_residual[kept_ids] += alpha * (clipped - self._abs_residual[kept_ids])
+        self.scale[kept_ids] = self._abs_residual[kept_ids] * _ABS_TO_SIGMA
+        self.samples[kept_ids] = count
+
+        self.theta[ids] = theta
+        self.P[ids] = P
+        return use
+
+    @property
+    def k(self):
+        return self.theta[:, 0]
+
+    @property
+    def b(self):
+        return self.theta[:, 1]
+
+    @property
+    def stderr(self):
+        """k、b 的标准误差 (基站数, 2)"""
+        return np.sqrt(np.maximum(np.diagonal(self.P, axis1=1, axis2=2), 0.0)) * self.scale[:, None]
+
+    @property
+    def converged(self):
+        """各基站是否已收敛：样本数足够且 k、b 的标准误差都小于 tolerance"""
+        return (self.samples >= self.min_samples) & np.all(self.stderr < self.tolerance, axis=1)
+
+    def reset(self, anchor=None):
+        """重新开始校准（全部或单个基站）"""
+        index = slice(None) if anchor is None else anchor
+        self.theta[index] = (1.0, 0.0)
+        self.P[index] = self._P0
+        self.scale[index] = self.noise
+        self._last[index] = np.nan
+        self._abs_residual[index] = self.noise / _ABS_TO_SIGMA
+        for counter in (self.samples, self.stale, self.rejected, self.downweighted, self.resets, self._run):
+            counter[index] = 0
+
+    def report(self, anchors=None):
+        """各基站当前的 k、b、标准误差和收敛情况"""
+        if anchors is None:
+            anchors = np.flatnonzero(self.samples)
+        stderr = self.stderr
+        converged = self.converged
+        lines = []
+        for anchor in anchors:
+            lines.append(f"D{anchor}: k = {self.k[anchor]:.4f} ± {stderr[anchor, 0]:.4f}, "
+                         f"b = {self.b[anchor]:.4f} ± {stderr[anchor, 1]:.4f}, 样本 {self.samples[anchor]}, "
+                         f"重复 {self.stale[anchor]}, 降权 {self.downweighted[anchor]}, "
+                         f"丢弃 {self.rejected[anchor]}, {'已收敛' if converged[anchor] else '未收敛'}")
+        return '\n'.join(lines)
@@ -0,0 +1,131 @@
+"""滑动窗口加权平均滤波，基于环形缓冲区和增量累加，每次更新耗时与窗口大小无关"""
+
+import numpy as np
+
+
+class FilteredPosition(tuple):
+    """滤波结果：可以像 (x, y, z) 一样解包，同时携带各轴标准差和稳定标志"""
+
+    def __new__(cls, position, std, is_stable):
+        result = super().__new__(cls, position)
+        result.std = std              # 各轴标准差
+        result.is_stable = is_stable  # 各轴标准差是否都小于阈值
+        return result
+
+
+class PositionFilter:
+    """滑动窗口加权平均滤波器
+
+    weight_type: 'uniform' 均匀权重；'linear' 线性递增权重；'exp' 指数递增权重，
+    越新的位置权重越大。窗口数据保存在固定大小的 (window_size, dim) 数组中，
+    加权和、平方和等随每个新位置增量更新，不再每帧重新计算整个窗口。
+    """
+
+    def __init__(self, window_size=10, weight_type='linear', dim=3, stable_std=0.1):
+        if weight_type not in ('uniform', 'linear', 'exp'):
+            raise ValueError(f"未知的权重类型: {weight_type}")
+        self.window_size = window_size
+        self.weight_type = weight_type
+        self.dim = dim
+        self.stable_std = stable_std
+
+        self._buffer = np.zeros((window_size, dim))  # 环形缓冲区
+        self._oldest = np.zeros(dim)
+        self._sum = np.zeros(dim)           # Σp
+        self._sum_sq = np.zeros(dim)        # Σp²，用于标准差
+        self._weighted_sum = np.zeros(dim)  # Σw·p（linear/exp）
+        self._mean = np.zeros(dim)
+        self._std = np.zeros(dim)
+        self._tmp = np.zeros(dim)           # 中间结果，避免每帧分配
+        self._decay = np.exp(-1.0)
+        self._oldest_decay = np.exp(-float(window_size))
+        self.reset()
+
+    @property
+    def positions(self):
+        """窗口内的位置，按从旧到新排列（副本）"""
+        if self._count < self.window_size:
+            return self._buffer[:self._count].copy()
+        return np.roll(self._buffer, -self._head, axis=0)
+
+    def reset(self):
+        """重置滤波器"""
+        self._head = 0           # 下一个写入位置
+        self._count = 0
+        self._weight_total = 0.0
+        self._updates = 0
+        for array in (self._sum, self._sum_sq, self._weighted_sum):
+            array.fill(0.0)
+
+    def _recompute(self):
+        """从缓冲区重新计算累加量，消除长时间增量更新的舍入误差"""
+        positions = self.positions
+        n = len(positions)
+        self._sum[:] = positions.sum(axis=0)
+        self._sum_sq[:] = (positions ** 2).sum(axis=0)
+        if self.weight_type == 'uniform':
+            return
+        if self.weight_type == 'linear':
+            weights = np.arange(1, n + 1, dtype=np.float64)
+        else:
+            weights = np.exp(np.arange(n) - (n - 1.0))
+        self._weighted_sum[:] = weights @ positions
+        self._weight_total = float(weights.sum())
+
+    def update(self, new_position, timestamp=None):
+        """更新位置估计，返回 FilteredPosition；timestamp 与 KalmanPositionFilter 接口一致，不使用"""
+        if new_position is None:
+            return None
+
+        full = self._count == self.window_size
+        slot = self._buffer[self._head]
+        if full:
+            self._oldest[:] = slot
+        slot[:] = new_position[:self.dim]
+        self._head = (self._head + 1) % self.window_size
+
+        if self.weight_type == 'linear':
+            # 权重 1..n，新位置权重为 n；窗口满时所有旧位置的权重各减 1
+            if full:
+                self._weighted_sum -= self._sum
+                np.multiply(slot, self.window_size, out=self._tmp)
+            else:
+                np.multiply(slot, self._count + 1, out=self._tmp)
+                self._weight_total += self._count + 1
+            self._weighted_sum += self._tmp
+        elif self.weight_type == 'exp':
+            # 新位置权重为 1，其余位置每帧衰减 e 倍
+            self._weighted_sum *= self._decay
+            self._weighted_sum += slot
+            self._weight_total = self._weight_total * self._decay + 1.0
+            if full:
+                np.multiply(self._oldest, self._oldest_decay, out=self._tmp)
+                self._weighted_sum -= self._tmp
+                self._weight_total -= self._oldest_decay
+
+        if full:
+            self._sum -= self._oldest
+            self._sum_sq -= np.square(self._oldest, out=self._tmp)
+        else:
+            self._count += 1
+        self._sum += slot
+        self._sum_sq += np.square(slot, out=self._tmp)
+
+        self._updates += 1
+        if self._updates % self.window_size == 0:
+            self._recompute()
+
+        n = self._count
+        if self.weight_type == 'uniform':
+            np.divide(self._sum, n, out=self._mean)
+        else:
+            np.divide(self._weighted_sum, self._weight_total, out=self._mean)
+
+        # 标准差（与 np.std 一致，不加权），可用于质量评估
+        np.divide(self._sum_sq, n, out=self._std)
+        np.divide(self._sum, n, out=self._tmp)
+        self._std -= np.square(self._tmp, out=self._tmp)
+        np.sqrt(np.maximum(self._std, 0.0, out=self._std), out=self._std)
+
+        is_stable = bool(np.all(self._std < self.stable_std))
+        return FilteredPosition(self._mean.tolist(), tuple(self._std.tolist()), is_stable)
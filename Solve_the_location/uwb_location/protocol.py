@@ -0,0 +1,120 @@
+"""标签串口协议常量和帧格式，与固件 lib/serial_interface/just_float.h 保持一致
+
+固件曾经发送过不同长度的数据帧（早期没有 rx_power 字段），上位机按 command 字节
+和帧尾位置识别帧格式，选用对应的预编译 struct 解码，不会因为长度不符而错位或丢帧。
+今后修改 JustFloatFrame 时应同时修改 command[1]（帧格式版本号），并在 FRAME_LAYOUTS 中登记。
+"""
+
+import struct
+from collections import namedtuple
+
+# 串口波特率，与固件 src/main.cpp 中的 Serial.begin(2000000) 一致
+BAUD_RATE = 2000000
+
+# 帧头帧尾的定义
+FRAME_HEADER = b'\xff\xaa'
+FRAME_TAIL = b'\x00\x00\x80\x7F\x00\x00\x00\x0A'
+
+# 一帧数据中的基站数量（固件中的 MAX_ANCHOR_NUM）
+ANCHOR_NUM = 8
+
+# 数据帧的 command 字节：command[0] 为帧类型，command[1] 为帧格式版本
+DATA_COMMAND = b'\x01\x01'
+
+# 上位机发给固件的命令帧 CommandFrame：帧头(2) + command(1) + anchor_num(1) + data[3]（float）+ 帧尾(8)
+COMMAND_SET_KB = 0x01        # data[0]、data[1] 为校准参数 k、b
+COMMAND_SET_POSITION = 0x02  # data 为基站坐标 x、y、z
+COMMAND_GET_KB = 0x03        # 读取 EEPROM 中的 k、b（由应答的 data 返回）
+COMMAND_STRUCT = struct.Struct('<2sBB3f8s')
+COMMAND_FRAME_SIZE = COMMAND_STRUCT.size
+
+# 固件对每条命令的应答帧 AckFrame，与数据帧在同一串口中交错出现
+ACK_COMMAND = b'\x02\x01'
+ACK_OK = 0x00
+ACK_BAD_ANCHOR = 0x01
+ACK_BAD_COMMAND = 0x02
+
+# 解码后的应答：cmd 为所应答的命令，data 为执行后的值
+Ack = namedtuple('Ack', ['cmd', 'anchor_num', 'status', 'data'])
+
+# 解码后的数据帧，rx_power 在没有该字段的帧格式中为 None
+FrameData = namedtuple('FrameData', [
+    'command', 'original_distances', 'calibrated_distances', 'rx_power', 'position', 'is_active'])
+
+
+class FrameLayout:
+    """一种数据帧格式：command 字节、预编译的 struct 以及各字段在解包结果中的位置"""
+
+    def __init__(self, name, command, has_rx_power):
+        self.name = name
+        self.command = command
+        self.has_rx_power = has_rx_power
+        float_blocks = 3 if has_rx_power else 2
+        self.struct = struct.Struct(f"<2s2s{float_blocks * ANCHOR_NUM}f3f{ANCHOR_NUM}B8s")
+        self.size = self.struct.size
+
+    def unpack(self, frame):
+        """解码一个已对齐的完整帧，返回 FrameData"""
+        values = self.struct.unpack(frame)
+        n = ANCHOR_NUM
+        i = 2 + (3 if self.has_rx_power else 2) * n
+        return FrameData(
+            command=values[1],
+            original_distances=values[2:2 + n],
+            calibrated_distances=values[2 + n:2 + 2 * n],
+            rx_power=values[2 + 2 * n:2 + 3 * n] if self.has_rx_power else None,
+            position=values[i:i + 3],
+            is_active=values[i + 3:i + 3 + n],
+        )
+
+    def __repr__(self):
+        return f"FrameLayout({self.name!r}, {self.size} 字节)"
+
+
+# 当前固件的 JustFloatFrame（128 字节，含 rx_power）
+FIRMWARE_LAYOUT = FrameLayout('just_float', DATA_COMMAND, has_rx_power=True)
+# 旧版脚本使用的格式（96 字节，没有 rx_power）
+LEGACY_LAYOUT = FrameLayout('legacy', DATA_COMMAND, has_rx_power=False)
+
+FRAME_LAYOUTS = (FIRMWARE_LAYOUT, LEGACY_LAYOUT)
+
+
+class AckLayout:
+    """命令应答帧的格式：帧头(2) + command(2) + cmd + anchor_num + status + 保留 + data[3] + 帧尾(8)
+
+    与 FrameLayout 一样有 command 和 size，可以一起交给 FrameDecoder。
+    """
+
+    def __init__(self):
+        self.name = 'ack'
+        self.command = ACK_COMMAND
+        self.struct = struct.Struct('<2s2sBBBx3f8s')
+        self.size = self.struct.size
+
+    def unpack(self, frame):
+        """解码一个已对齐的应答帧，返回 Ack"""
+        _, _, cmd, anchor_num, status, *data, _ = self.struct.unpack(frame)
+        return Ack(cmd, anchor_num, status, tuple(data))
+
+    def __repr__(self):
+        return f"AckLayout({self.size} 字节)"
+
+
+ACK_LAYOUT = AckLayout()
+
+
+def find_layout(frame, layouts=FRAME_LAYOUTS):
+    """按 command 字节和帧长度找到帧格式，找不到时返回 None"""
+    command = bytes(frame[2:4])
+    for layout in layouts:
+        if layout.command == command and layout.size == len(frame):
+            return layout
+    return None
+
+
+def unpack_frame(frame, layouts=FRAME_LAYOUTS):
+    """解码一个已对齐的完整帧（FrameDecoder 给出），返回 FrameData"""
+    layout = find_layout(frame, layouts)
+    if layout is None:
+        raise ValueError(f"无法识别的帧格式: command={bytes(frame[2:4]).hex()}, 长度={len(frame)}")
+    return layout.unpack(frame)
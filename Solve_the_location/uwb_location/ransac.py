@@ -0,0 +1,169 @@
+"""逐帧 RANSAC：枚举有效基站的全部最小子集，剔除被多径污染的测距
+
+一个测距被多径拉长时，最小二乘解会被整体带偏。最小子集（三维 4 个基站、二维 3 个基站）
+的线性化方程是方阵，直接求逆即得位置；8 个有效基站时三维只有 C(8,4)=70 个子集，
+全部子集在一次批量 NumPy 计算中求解，不需要随机采样：
+
+  1. 每种有效基站组合的全部子集的系数矩阵之逆预先算好并缓存（与测距无关），几何退化的子集去掉；
+  2. 每帧批量构造常数向量、求出各子集的位置，计算每个位置对所有基站的测距残差；
+  3. 按截断残差平方和（MSAC）评分，取最优子集，残差小于 threshold 的基站为内点；
+  4. 用 PinvCache 对内点重新求解（与普通解算相同的方程和权重）。
+
+budget 为单帧耗时预算(s)：分别统计每帧的固定开销和批量计算中单个子集的耗时，
+估算预算内能评估的子集数，子集过多时只评估前一部分（不少于有效基站数）。
+子集在缓存时按固定的随机顺序排列，截取前一部分时每个基站被排除在外的机会相同。
+每帧耗时记入 latency 直方图，超出预算的帧数记入 overruns。
+"""
+
+import itertools
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .instrument import LatencyHistogram
+from .solver_cache import mask_ids
+
+# position: 内点重新求解的位置；inliers / outliers: 基站序号；
+# residuals: {基站序号: 测距残差(m)}；subsets: 本帧评估的子集数
+RansacFix = namedtuple('RansacFix', ['position', 'inliers', 'outliers', 'residuals', 'subsets'])
+
+
+class _SubsetTable:
+    """一种有效基站组合的全部最小子集（固定的随机顺序）：以子集第一个基站为参考的系数矩阵之逆"""
+
+    def __init__(self, anchors, ids, size):
+        points = anchors[ids]
+        combos = np.array(list(itertools.combinations(range(len(ids)), size)), dtype=np.intp)
+        combos = combos[np.random.default_rng(0).permutation(len(combos))]
+        ref, other = combos[:, 0], combos[:, 1:]
+        A = 2 * (points[other] - points[ref][:, None, :])
+        # 行列式相对基站间距过小的子集几何退化（例如三维中共面的 4 个基站），不参与评估
+        scale = np.max(np.abs(A), axis=(1, 2)) ** A.shape[1]
+        valid = np.abs(np.linalg.det(A)) > 1e-6 * np.maximum(scale, 1e-12)
+        squared_norms = np.sum(points ** 2, axis=1)
+        self.ids = ids
+        self.points = points
+        self.ref = ref[valid]
+        self.other = other[valid]
+        self.inverse = np.linalg.inv(A[valid]) if valid.any() else np.empty((0,) + A.shape[1:])
+        self.offset = squared_norms[self.other] - squared_norms[self.ref][:, None]
+
+    def __len__(self):
+        return len(self.ref)
+
+
+class RansacSolver:
+    """基于最小子集一致性的鲁棒解算
+
+    cache:     solver_cache.PinvCache，内点的最终解算和基站坐标都来自它
+    threshold: 内点的测距残差阈值(m)
+    budget:    单帧耗时预算(s)，None 为不限制（总是评估全部子集）
+    """
+
+    def __init__(self, cache, threshold=0.2, budget=None):
+        self.cache = cache
+        self.threshold = threshold
+        self.budget = budget
+        self._tables = {}
+        self._revision = None
+        self._subset_cost = None   # 批量计算中单个子集耗时的滑动平均(s)
+        self._overhead = 0.0       # 每帧除批量计算外的固定耗时的滑动平均(s)
+
+        # 统计信息
+        self.latency = LatencyHistogram()
+        self.frames = 0
+        self.overruns = 0          # 耗时超出预算的帧数
+        self.truncated = 0         # 因预算只评估了部分子集的帧数
+        self.rejected = 0          # 剔除的基站总数
+
+    def _table(self, code):
+        cache = self.cache
+        cache.refresh()
+        if cache.revision != self._revision:
+            self._tables.clear()
+            self._revision = cache.revision
+        table = self._tables.get(code)
+        if table is None:
+            table = self._tables[code] = _SubsetTable(cache.anchors, mask_ids(code, len(cache.anchors)),
+                                                      cache.dim + 1)
+        return table
+
+    def _limit(self, count, anchor_count):
+        """预算内可以评估的子集数"""
+        if self.budget is None or self._subset_cost is None:
+            return count
+        return max(min(count, anchor_count), min(count, int((self.budget - self._overhead) / self._subset_cost)))
+
+    def solve(self, distances_with_ids, weights=None):
+        """鲁棒求解一帧位置，返回 RansacFix，有效基站不足或没有可用子集时返回 None
+
+        有效基站只有最小子集大小时无法判断野值，直接对全部基站求解。
+        weights 与 distances_with_ids 一一对应，内点重新求解时使用。
+        """
+        start = time.perf_counter()
+        cache = self.cache
+        cache.refresh()
+        defined = cache.defined
+        code = 0
+        distance_of = {}
+        for anchor_id, distance in distances_with_ids:
+            if anchor_id < len(defined) and defined[anchor_id]:
+                code |= 1 << anchor_id
+                distance_of[anchor_id] = distance
+        # 固件启动时基站陆续加入，有效基站不足最小子集时没有子集可枚举，不建表直接跳过
+        if len(distance_of) < cache.dim + 1:
+            return None
+        table = self._table(code)
+
+        measured = np.array([distance_of[i] for i in table.ids])
+        evaluated = 0
+        if len(table.ids) == cache.dim + 1 or not len(table):
+            inliers = np.ones(len(table.ids), dtype=bool)
+        else:
+            # 全部子集批量求解：x = A⁻¹ b，b = d_ref² - d_other² + 偏移
+            batch_start = time.perf_counter()
+            evaluated = self._limit(len(table), len(table.ids))
+            select = slice(evaluated)
+            if evaluated < len(table):
+                self.truncated += 1
+            squared = measured ** 2
+            ref, other = table.ref[select], table.other[select]
+            b = squared[ref][:, None] - squared[other] + table.offset[select]
+            positions = np.einsum('kij,kj->ki', table.inverse[select], b)
+            residuals = np.abs(np.linalg.norm(positions[:, None, :] - table.points[None], axis=2) - measured)
+            cost = np.sum(np.minimum(residuals, self.threshold) ** 2, axis=1)
+            inliers = residuals[np.argmin(cost)] < self.threshold
+            if np.count_nonzero(inliers) < cache.dim + 1:
+                inliers[:] = True
+            batch = time.perf_counter() - batch_start
+
+        inlier_ids = [int(i) for i in np.asarray(table.ids)[inliers]]
+        selected = [k for k, (anchor_id, _) in enumerate(distances_with_ids) if anchor_id in inlier_ids]
+        position = cache.solve([distances_with_ids[k] for k in selected],
+                               None if weights is None else [weights[k] for k in selected])
+        if position is None:
+            return None
+        final = np.abs(np.linalg.norm(table.points - position, axis=1) - measured)
+        outliers = [int(i) for i in np.asarray(table.ids)[~inliers]]
+
+        elapsed = time.perf_counter() - start
+        if evaluated:
+            cost = batch / evaluated
+            if self._subset_cost is None:
+                self._subset_cost, self._overhead = cost, elapsed - batch
+            else:
+                self._subset_cost += 0.1 * (cost - self._subset_cost)
+                self._overhead += 0.1 * (elapsed - batch - self._overhead)
+        self.latency.record(elapsed)
+        self.frames += 1
+        self.rejected += len(outliers)
+        if self.budget is not None and elapsed > self.budget:
+            self.overruns += 1
+        return RansacFix(position, inlier_ids, outliers, dict(zip((int(i) for i in table.ids), final.tolist())),
+                         evaluated)
+
+    def stats(self):
+        return (f"RANSAC: {self.frames} 帧, 剔除基站 {self.rejected} 次, p50 {self.latency.percentile(50) * 1e6:.0f}µs "
+                f"p99 {self.latency.percentile(99) * 1e6:.0f}µs, 超出预算 {self.overruns} 帧, "
+                f"只评估部分子集 {self.truncated} 帧")
@@ -0,0 +1,116 @@
+"""非线性最小二乘位置精化（Levenberg-Marquardt）
+
+线性化的平方差方程会放大测距噪声，基站高度接近时尤其明显。
+这里直接最小化真实的测距残差 r_i = |p - a_i| - d_i，
+从上一次的定位结果或线性解出发，用收敛阈值和迭代上限限制每帧的耗时。
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .solver_cache import anchor_array
+
+# position: 精化后的位置；residual: 测距残差的均方根(m)；
+# iterations: 实际迭代次数；converged: 是否在迭代上限内收敛
+RefineResult = namedtuple('RefineResult', ['position', 'residual', 'iterations', 'converged'])
+
+
+def _residuals(position, anchor_coords, distances):
+    offsets = position - anchor_coords
+    ranges = np.sqrt(np.sum(offsets ** 2, axis=1))
+    return ranges - distances, offsets, ranges
+
+
+def refine_position(anchor_coords, distances, initial, tol=1e-4, max_iter=10, damping=1e-3,
+                    weights=None):
+    """从 initial 出发做 Levenberg-Marquardt 迭代
+
+    anchor_coords: (基站数, 维数) 有效基站坐标
+    distances:     (基站数,) 对应的测量距离
+    tol:      位置更新量小于该值(m)时认为收敛
+    max_iter: 迭代上限，保证每帧耗时有界
+    weights:  各基站的权重（例如 weighting.rx_power_weights 给出），省略时等权；
+              此时 residual 为加权均方根
+    """
+    anchor_coords = np.asarray(anchor_coords, dtype=np.float64)
+    distances = np.asarray(distances, dtype=np.float64)
+    position = np.array(initial, dtype=np.float64)
+    w = np.ones(len(distances)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    r, offsets, ranges = _residuals(position, anchor_coords, distances)
+    cost = r @ (w * r)
+    converged = False
+    iterations = 0
+    while iterations < max_iter:
+        iterations += 1
+        J = offsets / np.maximum(ranges, 1e-9)[:, None]
+        JtW = J.T * w
+        JtJ = JtW @ J
+        step = np.linalg.solve(JtJ + damping * np.diag(np.diag(JtJ) + 1e-12), -JtW @ r)
+
+        candidate = position + step
+        new_r, new_offsets, new_ranges = _residuals(candidate, anchor_coords, distances)
+        new_cost = new_r @ (w * new_r)
+        if new_cost <= cost:
+            # 下降成功，接受这一步并减小阻尼（更接近高斯-牛顿）
+            position, r, offsets, ranges, cost = candidate, new_r, new_offsets, new_ranges, new_cost
+            damping = max(damping / 10, 1e-9)
+            # 只有实际走过的一步才用于判断收敛
+            if np.linalg.norm(step) < tol:
+                converged = True
+                break
+        else:
+            # 代价上升，增大阻尼（更接近梯度下降）后重试
+            damping *= 10
+
+    return RefineResult(position, float(np.sqrt(cost / np.sum(w))), iterations, converged)
+
+
+class PositionRefiner:
+    """带热启动的位置精化：记住上一次的结果作为下一帧的初值"""
+
+    def __init__(self, anchor_positions, tol=1e-4, max_iter=10):
+        # 给出 AnchorGeometry 时每次精化都使用其最新坐标
+        self.geometry = anchor_positions if hasattr(anchor_positions, 'version') else None
+        self.anchors = anchor_array(anchor_positions)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.last_position = None
+        self.last_result = None
+
+    def refine(self, distances_with_ids, linear_position, weights=None):
+        """对 [(基站序号, 距离), ...] 精化位置，linear_position 为线性解算结果
+
+        weights 为与 distances_with_ids 一一对应的基站权重，省略时等权
+        """
+        if self.geometry is not None:
+            self.anchors = self.geometry.array
+        ids = [anchor_id for anchor_id, _ in distances_with_ids
+               if anchor_id < len(self.anchors) and not np.isnan(self.anchors[anchor_id, 0])]
+        if weights is not None:
+            weight_of = {anchor_id: weight for (anchor_id, _), weight in zip(distances_with_ids, weights)}
+            weights = np.array([weight_of[i] for i in ids])
+        distance_of = dict(distances_with_ids)
+        anchor_coords = self.anchors[ids]
+        distances = np.array([distance_of[i] for i in ids])
+
+        # 上一次的结果和线性解中取残差较小的一个作为初值
+        initial = np.asarray(linear_position, dtype=np.float64)
+        if self.last_position is not None:
+            w = 1.0 if weights is None else weights
+            linear_r = _residuals(initial, anchor_coords, distances)[0]
+            last_r = _residuals(self.last_position, anchor_coords, distances)[0]
+            if last_r @ (w * last_r) < linear_r @ (w * linear_r):
+                initial = self.last_position
+
+        result = refine_position(anchor_coords, distances, initial, self.tol, self.max_iter,
+                                 weights=weights)
+        self.last_position = result.position
+        self.last_result = result
+        return result
+
+    def reset(self):
+        """清除热启动状态"""
+        self.last_position = None
+        self.last_result = None
@@ -0,0 +1,265 @@
+"""多标签定位服务：同时打开多个串口（或录制文件），每个标签独立解码、解算和滤波
+
+每个数据源一个 SerialReader 后台线程和独立的 FrameDecoder；收到的帧按标签成批交给
+进程池，在子进程中批量解码（bulk_decode）后解算，子进程中每个标签有自己的解算器：
+  pipeline='locator'（默认）逐帧执行与单标签 Locator 相同的流程：接收功率加权、RANSAC、
+                      DOP 子集选择和非线性精化，位置与 python -m uwb_location 一致；
+  pipeline='linear'   只做批量线性解算（batch_solver），没有上述各步，精度较低但吞吐量最高。
+滤波依赖帧的先后顺序，在主进程中按批次顺序进行。
+定期打印每个标签和总体的吞吐量。
+
+用法：
+    python -m uwb_location.service COM14 COM15 --dim 3
+    python -m uwb_location.service session1.uwbcap session2.uwbcap --fast --pipeline linear
+"""
+
+import argparse
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .acquisition import SerialReader
+from .batch_solver import solve_positions
+from .bulk_decode import decode_frames, frame_columns
+from .frame_decoder import FrameDecoder
+from .frame_store import WIRE_DTYPES
+from .geometry import AnchorGeometry, load_geometry
+from .instrument import setup_logging
+from .locate import Locator
+from .position_filter import PositionFilter
+from .protocol import ANCHOR_NUM, BAUD_RATE, FRAME_LAYOUTS
+from .solver_cache import PinvCache, anchor_array
+
+# 子进程中按标签缓存的解算器：(标签名, pipeline) -> (基站坐标, PinvCache 或 Locator)
+_worker_solvers = {}
+
+
+def _decode_batch(frames):
+    """批量解码一批帧，返回 (distances, active, rx_power)，旧版帧没有接收功率，该行为 NaN"""
+    distances = np.zeros((len(frames), ANCHOR_NUM))
+    active = np.zeros((len(frames), ANCHOR_NUM), dtype=bool)
+    rx_power = np.full((len(frames), ANCHOR_NUM), np.nan)
+    lengths = np.array([len(frame) for frame in frames])
+    for length, dtype in WIRE_DTYPES.items():
+        rows = np.flatnonzero(lengths == length)
+        if len(rows) == 0:
+            continue
+        decoded, valid = decode_frames(b''.join(frames[i] for i in rows), dtype)
+        columns = frame_columns(decoded)
+        distances[rows] = columns['distances']
+        active[rows] = columns['active'] & valid[:, None]
+        if 'rx_power' in dtype.names:
+            rx_power[rows] = decoded['rx_power']
+    return distances, active, rx_power
+
+
+def _locate_rows(locator, distances, active, rx_power):
+    """逐帧执行 Locator 的解算流程（不滤波），返回 (N, 维数) 位置数组"""
+    positions = np.full((len(distances), locator.dim), np.nan)
+    for row in range(len(distances)):
+        distances_with_ids = [(int(i), float(distances[row, i])) for i in np.flatnonzero(active[row])]
+        rx_powers = None if np.isnan(rx_power[row]).all() else rx_power[row].tolist()
+        fix = locator.locate(distances_with_ids, rx_powers)
+        if fix is not None:
+            positions[row] = fix.position
+    return positions
+
+
+def solve_batch(tag, anchors, dim, frames, pipeline='locator', options=None):
+    """在子进程中解码并解算一批帧，返回 (positions, active)
+
+    frames 为同一标签按到达顺序排列的原始帧（bytes），可以混合多种帧格式；
+    positions 为 (N, 维数) 数组，有效基站不足或帧损坏的行为 NaN。
+    pipeline 见模块说明，options 为 pipeline='locator' 时传给 Locator 的参数（滤波总是在主进程中进行）。
+    """
+    anchors = np.asarray(anchors, dtype=np.float64)
+    cached = _worker_solvers.get((tag, pipeline))
+    if cached is None or not np.array_equal(cached[0], anchors, equal_nan=True):
+        if pipeline == 'linear':
+            solver = PinvCache(anchors, chained=dim == 2)  # 与 2d解算.py 一样对相邻基站作差
+        else:
+            solver = Locator(AnchorGeometry(anchors, dim), **{**(options or {}), 'filter_mode': None})
+        cached = _worker_solvers[(tag, pipeline)] = (anchors, solver)
+    solver = cached[1]
+
+    distances, active, rx_power = _decode_batch(frames)
+    if pipeline == 'linear':
+        return solve_positions(distances, active, cache=solver), active
+    return _locate_rows(solver, distances, active, rx_power), active
+
+
+def open_source(spec, baud_rate=BAUD_RATE, realtime=True):
+    """按名称打开数据源：.uwbcap 结尾的录制文件用 CaptureReplay 回放，其余作为串口打开"""
+    if spec.endswith('.uwbcap'):
+        from .capture import CaptureReplay
+        return CaptureReplay(spec, realtime=realtime)
+    import serial
+    return serial.Serial(spec, baud_rate, timeout=0.1)
+
+
+class TagChannel:
+    """一个标签的全部状态：数据源、采集线程、滤波器、待处理批次和统计"""
+
+    def __init__(self, name, source, dim, maxsize=256):
+        self.name = name
+        self.source = source
+        self.reader = SerialReader(source, FrameDecoder(layouts=FRAME_LAYOUTS), maxsize=maxsize)
+        self.filter = PositionFilter(dim=dim)
+        self.pending = deque()   # 已提交、尚未取回结果的批次（按提交顺序）
+        self.last_position = None
+
+        # 统计信息
+        self.frames = 0          # 已解算的帧数
+        self.positions = 0       # 得到有效位置的帧数
+        self._reported_frames = 0
+
+    @property
+    def done(self):
+        """回放数据源已读完且所有批次都已处理"""
+        return self.reader.finished and self.reader.depth == 0 and not self.pending
+
+    def handle(self, positions):
+        """按顺序处理一批解算结果"""
+        self.frames += len(positions)
+        for position in positions:
+            if np.isnan(position[0]):
+                continue
+            self.positions += 1
+            self.last_position = self.filter.update(position)
+
+    def rate(self, elapsed):
+        """距上次调用以来的解算帧率"""
+        frames = self.frames - self._reported_frames
+        self._reported_frames = self.frames
+        return frames / elapsed if elapsed > 0 else 0.0
+
+
+class PositioningService:
+    """同时为多个标签定位
+
+    sources:   {标签名: 数据源}，数据源为 serial.Serial、CaptureReplay 等支持 readinto 的对象
+    workers:   进程池大小，0 表示在主进程中解算（调试用）
+    pipeline:  'locator' 与单标签 Locator 相同的解算流程；'linear' 只做批量线性解算（见模块说明）
+    options:   pipeline='locator' 时传给 Locator 的参数（rx_weighting、ransac、dop、refine 等）
+    log_level: 子进程中解算日志的级别（同一消息每秒最多一条）
+    """
+
+    def __init__(self, sources, anchor_positions, dim=3, workers=None, maxsize=256, pipeline='locator',
+                 options=None, log_level=logging.WARNING):
+        self.anchors = anchor_array(anchor_positions)[:, :dim]
+        self.dim = dim
+        self.pipeline = pipeline
+        self.options = options
+        self.log_level = log_level
+        self.tags = [TagChannel(name, source, dim, maxsize) for name, source in sources.items()]
+        self.workers = workers
+        self._pool = None
+
+    def _submit(self, tag, frames):
+        args = (tag.name, self.anchors, self.dim, frames, self.pipeline, self.options)
+        if self._pool is None:
+            tag.pending.append(solve_batch(*args))
+        else:
+            tag.pending.append(self._pool.submit(solve_batch, *args))
+
+    def _collect(self, tag):
+        """按提交顺序取回已完成的批次"""
+        while tag.pending:
+            batch = tag.pending[0]
+            if self._pool is not None:
+                if not batch.done():
+                    return
+                batch = batch.result()
+            tag.pending.popleft()
+            tag.handle(batch[0])
+
+    def report(self, elapsed):
+        """每个标签和总体的吞吐量"""
+        lines = []
+        total = 0.0
+        for tag in self.tags:
+            rate = tag.rate(elapsed)
+            total += rate
+            position = ('-' if tag.last_position is None
+                        else '(' + ', '.join(f'{v:.3f}' for v in tag.last_position) + ')')
+            lines.append(f"[{tag.name}] {rate:.1f} 帧/s, 已解算 {tag.frames} 帧, 有效 {tag.positions} 帧, "
+                         f"位置 {position}; {tag.reader.stats()}")
+        lines.append(f"总计: {len(self.tags)} 个标签, {total:.1f} 帧/s")
+        return '\n'.join(lines)
+
+    def run(self, duration=None, report_interval=5.0, poll_interval=0.005):
+        """运行直到所有回放数据源结束、超过 duration 秒或 Ctrl+C，返回总耗时"""
+        if self.workers != 0:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=setup_logging, initargs=(self.log_level,))
+        start = last_report = time.monotonic()
+        for tag in self.tags:
+            tag.reader.start()
+        try:
+            while True:
+                for tag in self.tags:
+                    frames = tag.reader.get_all()
+                    if frames:
+                        self._submit(tag, frames)
+                    self._collect(tag)
+                    if tag.reader.error is not None:
+                        raise tag.reader.error
+
+                now = time.monotonic()
+                if now - last_report >= report_interval:
+                    print(self.report(now - last_report))
+                    last_report = now
+                if all(tag.done for tag in self.tags):
+                    break
+                if duration is not None and now - start >= duration:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for tag in self.tags:
+                tag.reader.stop()
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        now = time.monotonic()
+        print(self.report(now - last_report))
+        return now - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多标签并发定位服务')
+    parser.add_argument('sources', nargs='+', help='串口名或 .uwbcap 录制文件，每个对应一个标签')
+    parser.add_argument('--baud', type=int, default=BAUD_RATE, help='串口波特率')
+    parser.add_argument('--dim', type=int, choices=(2, 3), default=3, help='二维或三维解算')
+    parser.add_argument('--config', help='基站坐标配置文件，默认为 Solve_the_location/anchors.json')
+    parser.add_argument('--workers', type=int, default=None, help='解算进程数，0 为在主进程中解算')
+    parser.add_argument('--fast', action='store_true', help='录制文件尽可能快地回放')
+    parser.add_argument('--pipeline', choices=('locator', 'linear'), default='locator',
+                        help="解算流程：locator 与单标签定位相同；linear 只做批量线性解算，吞吐量最高")
+    parser.add_argument('--duration', type=float, default=None, help='运行时长(s)')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='吞吐量打印间隔(s)')
+    args = parser.parse_args(argv)
+
+    setup_logging(logging.WARNING)
+    anchors = load_geometry(f'{args.dim}d', args.config)
+
+    sources = {}
+    try:
+        for index, spec in enumerate(args.sources):
+            sources[f'tag{index}:{spec}'] = open_source(spec, args.baud, realtime=not args.fast)
+        service = PositioningService(sources, anchors, args.dim, args.workers,
+                                     maxsize=0 if args.fast else 256, pipeline=args.pipeline)
+        elapsed = service.run(args.duration, args.report_interval)
+        total = sum(tag.frames for tag in service.tags)
+        print(f"运行 {elapsed:.1f}s, 共解算 {total} 帧, 平均 {total / elapsed:.1f} 帧/s")
+    finally:
+        for source in sources.values():
+            if source.is_open:
+                source.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""按有效基站组合缓存线性化解算的伪逆
+
+线性化方程的系数矩阵 A 只取决于基站坐标和哪些基站有效，与测量距离无关。
+8 个基站最多 256 种组合，每种组合的伪逆算一次后缓存，
+之后每帧只需一次小矩阵乘向量，不再调用 lstsq。
+基站坐标变化时必须调用 update_anchor / set_anchor_positions 使相应缓存失效；
+由 geometry.AnchorGeometry 构造时，几何的 version 变化后缓存自动重建。
+calibration.py 的 send_position 把新坐标写入 anchors.json，解算脚本下次启动时读取。
+"""
+
+import numpy as np
+
+
+def anchor_array(anchor_positions):
+    """把 AnchorGeometry 或 {'d0': (x, y, ...), ...} 形式的基站坐标转换为 (基站数, 维数) 的数组
+
+    行号为基站序号，未配置坐标的基站为 NaN。
+    """
+    if hasattr(anchor_positions, 'array'):
+        return anchor_positions.array
+    if isinstance(anchor_positions, dict):
+        anchor_positions = [anchor_positions[f'd{i}'] for i in range(len(anchor_positions))]
+    return np.asarray(anchor_positions, dtype=np.float64)
+
+
+def mask_codes(active, anchor_count):
+    """把 (N, ANCHOR_NUM) 的基站状态转换为每帧一个整数编码（第 i 位表示基站 i 有效）"""
+    active = np.asarray(active)[:, :anchor_count] == 1
+    return active @ (1 << np.arange(anchor_count))
+
+
+def mask_ids(code, anchor_count):
+    """整数编码对应的有效基站序号"""
+    return [i for i in range(anchor_count) if code >> i & 1]
+
+
+class _MaskEntry:
+    """一种有效基站组合对应的预计算结果"""
+
+    def __init__(self, anchors, ids, chained, reference=None):
+        if chained:  # 相邻的有效基站两两作差（2d解算.py）
+            ref, other = ids[:-1], ids[1:]
+        else:        # 以 reference（省略时为第一个有效基站）为参考（3d解算.py）
+            reference = ids[0] if reference is None else reference
+            ref, other = [reference] * (len(ids) - 1), [i for i in ids if i != reference]
+        column = {anchor_id: i for i, anchor_id in enumerate(ids)}
+        self.ids = ids
+        self.reference = None if chained else reference
+        self.ref_cols = [column[i] for i in ref]
+        self.other_cols = [column[i] for i in other]
+        self.A = 2 * (anchors[other] - anchors[ref])
+        self.pinv = np.linalg.pinv(self.A)
+        squared_norms = np.sum(anchors ** 2, axis=1)
+        self.offset = squared_norms[other] - squared_norms[ref]
+
+    def rhs(self, squared):
+        """由有效基站距离的平方（最后一维按 ids 排列）构造常数向量 b"""
+        return squared[..., self.ref_cols] - squared[..., self.other_cols] + self.offset
+
+
+class PinvCache:
+    """线性化解算的伪逆缓存，chained=True 对应二维脚本的相邻作差方程"""
+
+    def __init__(self, anchor_positions, chained=False):
+        self.chained = chained
+        self._entries = {}  # (组合编码, 参考基站) -> _MaskEntry
+        self.revision = 0   # 每次修改基站坐标加 1，dop.DopTable 据此重建
+        self.set_anchor_positions(anchor_positions)
+
+    def refresh(self):
+        """由 AnchorGeometry 构造且几何的坐标被修改过时，重新读取坐标并清空缓存"""
+        if self.geometry is not None and self.geometry.version != self._version:
+            self.set_anchor_positions(self.geometry)
+
+    @property
+    def dim(self):
+        return self.anchors.shape[1]
+
+    def set_anchor_positions(self, anchor_positions):
+        """整体替换基站坐标，清空全部缓存"""
+        self.geometry = anchor_positions if hasattr(anchor_positions, 'version') else None
+        self._version = getattr(anchor_positions, 'version', None)
+        self.anchors = anchor_array(anchor_positions).copy()
+        self.defined = ~np.isnan(self.anchors).any(axis=1)
+        self._entries.clear()
+        self.revision += 1
+
+    def update_anchor(self, anchor_id, position):
+        """更新单个基站坐标，只清除包含该基站的组合"""
+        position = np.asarray(position, dtype=np.float64)[:self.dim]
+        self.anchors[anchor_id, :len(position)] = position
+        self.defined[anchor_id] = True
+        for key in [key for key in self._entries if key[0] >> anchor_id & 1]:
+            del self._entries[key]
+        self.revision += 1
+
+    def entry(self, code, reference=None):
+        """取得组合编码对应的缓存项，有效基站不足时返回 None
+
+        reference 为线性化的参考基站（须在组合中，chained=True 时忽略），省略时为第一个有效基站。
+        """
+        self.refresh()
+        key = (code, None if self.chained else reference)
+        entry = self._entries.get(key)
+        if entry is None:
+            ids = mask_ids(code, len(self.anchors))
+            if len(ids) < self.dim + 1:
+                return None
+            entry = self._entries[key] = _MaskEntry(self.anchors, ids, self.chained, key[1])
+        return entry
+
+    def solve(self, distances_with_ids, weights=None, reference=None):
+        """对 [(基站序号, 距离), ...] 求解一帧位置，有效基站不足时返回 None
+
+        weights 为与 distances_with_ids 一一对应的基站权重（例如 weighting.rx_power_weights 给出），
+        省略时各基站等权，直接使用缓存的伪逆。没有给出坐标的基站会被忽略。
+        reference 为参考基站序号（见 entry），由 dop.DopTable 按几何精度因子选择。
+        """
+        self.refresh()
+        code = 0
+        distance_of = {}
+        weight_of = {}
+        defined = self.defined
+        for k, (anchor_id, distance) in enumerate(distances_with_ids):
+            if anchor_id < len(defined) and defined[anchor_id]:
+                code |= 1 << anchor_id
+                distance_of[anchor_id] = distance
+                if weights is not None:
+                    weight_of[anchor_id] = weights[k]
+        if reference is not None and not code >> reference & 1:
+            reference = None
+        entry = self.entry(code, reference)
+        if entry is None:
+            return None
+        squared = np.array([distance_of[i] for i in entry.ids]) ** 2
+        b = entry.rhs(squared)
+        if weights is None:
+            return entry.pinv @ b
+
+        # 加权最小二乘：每行是两个基站的距离平方之差，行方差取两者方差之和
+        w = np.maximum(np.array([weight_of[i] for i in entry.ids], dtype=np.float64), 1e-12)
+        row_weights = 1.0 / (1.0 / w[entry.ref_cols] + 1.0 / w[entry.other_cols])
+        A_w = entry.A * row_weights[:, None]
+        try:
+            return np.linalg.solve(A_w.T @ entry.A, A_w.T @ b)
+        except np.linalg.LinAlgError:
+            return entry.pinv @ b  # 基站几何退化，退回等权解
@@ -0,0 +1,64 @@
+"""按接收功率给基站加权，并剔除疑似非视距（NLOS）基站
+
+固件在 new_range 中用 getRXPower() 测量每个基站的接收功率并随帧发送（rx_power，dBm）。
+视距条件下接收功率随距离按自由空间规律衰减：P + 20·lg(d) 对所有基站近似为同一常数
+（标签发射功率相同）。以本帧各基站该值的中位数为参考，某个基站的功率比参考低得越多，
+越可能被遮挡（遮挡使信号衰减，同时使测距偏长），权重按功率亏损指数下降，
+亏损过大的基站直接剔除。整个过程是一次性的闭式计算，不需要多轮迭代的野值搜索。
+"""
+
+import math
+from collections import namedtuple
+from statistics import median
+
+# distances_with_ids: 剔除后的 [(基站序号, 距离), ...]；weights: 与之对应的权重；
+# deficits: {基站序号: 功率亏损(dB)}；dropped: 被剔除的基站序号
+AnchorWeights = namedtuple('AnchorWeights', ['distances_with_ids', 'weights', 'deficits', 'dropped'])
+
+
+def _has_power(power):
+    # 固件启动后尚未测距的基站接收功率为 0，旧版帧没有功率
+    return power is not None and math.isfinite(power) and power != 0.0
+
+
+def rx_power_weights(distances_with_ids, rx_powers, margin_db=3.0, scale_db=6.0,
+                     drop_db=10.0, min_anchors=4):
+    """根据接收功率计算各基站权重
+
+    rx_powers: 各基站的接收功率（按基站序号索引的序列，例如 FrameData.rx_power），可以为 None
+    margin_db: 功率亏损不超过该值时视为正常，权重为 1
+    scale_db:  超过 margin_db 的部分每增加 scale_db，权重下降为 1/e
+    drop_db:   功率亏损超过该值的基站被剔除，但保留的基站数不少于 min_anchors（解算所需的最少基站数）
+    功率数据不足以估计参考值（少于 3 个基站有功率）时全部等权。
+    """
+    distances_with_ids = list(distances_with_ids)
+    weights = [1.0] * len(distances_with_ids)
+    if rx_powers is None:
+        return AnchorWeights(distances_with_ids, weights, {}, [])
+
+    normalized = {}
+    for anchor_id, distance in distances_with_ids:
+        power = rx_powers[anchor_id]
+        if _has_power(power):
+            normalized[anchor_id] = power + 20.0 * math.log10(max(distance, 0.1))
+    if len(normalized) < 3:
+        return AnchorWeights(distances_with_ids, weights, {}, [])
+
+    reference = median(normalized.values())
+    deficits = {anchor_id: reference - value for anchor_id, value in normalized.items()}
+    for k, (anchor_id, _) in enumerate(distances_with_ids):
+        excess = deficits.get(anchor_id, 0.0) - margin_db
+        if excess > 0:
+            weights[k] = math.exp(-excess / scale_db)
+
+    # 从亏损最大的基站开始剔除
+    dropped = []
+    for anchor_id in sorted(deficits, key=deficits.get, reverse=True):
+        if deficits[anchor_id] <= drop_db or len(distances_with_ids) - len(dropped) <= min_anchors:
+            break
+        dropped.append(anchor_id)
+    if dropped:
+        kept = [k for k, (anchor_id, _) in enumerate(distances_with_ids) if anchor_id not in dropped]
+        distances_with_ids = [distances_with_ids[k] for k in kept]
+        weights = [weights[k] for k in kept]
+    return AnchorWeights(distances_with_ids, weights, deficits, dropped)
@@ -1,4 +1,4 @@
-import numpy as np
+from uwb_location.geometry import load_geometry
 
 true_position = (1.8, 0.6, 0.0)
 manual_distances = [
@@ -7,25 +7,13 @@ manual_distances = [
     (2, 3.28633534503099668),
     (3, 4.219004621945797299)
 ]
-ANCHOR_POSITIONS = {
-    # 'd0': (0.0, 0.0, 1.0),
-    # 'd1': (0.0, 0.6, 2.0),
-    # 'd2': (4.2, 1.2, 3.0),
-    # 'd3': (4.2, 0.0, 4.0)
-    'd0': (0.0, 0.0 ,0.0),  # 基站0的坐标 (x0, y0,z0)
-    'd1': (0.6, 0.6,0.8),  # 基站1的坐标 (x1, y1,z1)
-    'd2': (2.4, 0.6,0.4),  # 基站2的坐标 (x2, y2,z2)
-    'd3': (3.0, 0.0,0.0)   # 基站3的坐标 (x3, y3,z3)
-}
+ANCHOR_POSITIONS = load_geometry('3d')  # 从 anchors.json 读取，按基站序号索引
 
 print("基站距离验证:")
-for anchor_id, manual_distance in manual_distances:
-    anchor_position = ANCHOR_POSITIONS[f'd{anchor_id}']
-    calculated_distance = np.sqrt(
-        (true_position[0] - anchor_position[0])**2 +
-        (true_position[1] - anchor_position[1])**2 +
-        (true_position[2] - anchor_position[2])**2
-    )
+# 与 uwb_location.benchmark 生成合成帧使用同一个距离计算
+anchor_ids = [anchor_id for anchor_id, _ in manual_distances]
+calculated_distances = ANCHOR_POSITIONS.distances_to(true_position, anchor_ids)
+for (anchor_id, manual_distance), calculated_distance in zip(manual_distances, calculated_distances):
     print(f"基站 d{anchor_id}:")
     print(f"  手动写入距离 = {manual_distance:.6f}")
     print(f"  计算得到的距离 = {calculated_distance:.6f}")
@@ -3,123 +3,177 @@ import struct
 import numpy as np
 from scipy.optimize import curve_fit
 import time
+import os
+import sys
 import matplotlib.pyplot as plt
-from matplotlib import font_manager
+
+# 共用 Solve_the_location/uwb_location 中的模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Solve_the_location'))
+from uwb_location.acquisition import SerialReader
+from uwb_location.commands import CommandChannel, CommandError
+from uwb_location.frame_decoder import FrameDecoder
+from uwb_location.geometry import load_geometry, save_geometry
+from uwb_location.online_calibration import OnlineCalibrator
+from uwb_location.protocol import ACK_LAYOUT, ANCHOR_NUM, BAUD_RATE, FRAME_LAYOUTS, unpack_frame
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
 plt.rcParams['axes.unicode_minus'] = False    # 用来正常显示负号
-# 帧头帧尾的定义（全局常量）
-FRAME_HEADER = b'\xff\xaa'
-FRAME_TAIL = b'\x00\x00\x80\x7F\x00\x00\x00\x0A'
 global flag
-def send_position(ser,x,y,flag):
-        x_bytes = struct.pack('<f',x)
-        y_bytes = struct.pack('<f',y)
-        if(int(flag)==1):
-            frame = b'\xff\xaa\x02' +b'\x00'+ x_bytes + y_bytes + b'\x00\x00\x00\x00' + FRAME_TAIL
-        elif(int(flag)==2):
-            frame = b'\xff\xaa\x02' +b'\x01'+ x_bytes + y_bytes + b'\x00\x00\x00\x00' + FRAME_TAIL
-        elif(int(flag)==3):
-            frame = b'\xff\xaa\x02' +b'\x02'+ x_bytes + y_bytes + b'\x00\x00\x00\x00' + FRAME_TAIL
-        else:
-            frame = b'\xff\xaa\x02' +b'\x03'+ x_bytes + y_bytes + b'\x00\x00\x00\x00' + FRAME_TAIL
-        
-        ser.write(frame)
-        ser.flush()  # 确保数据发送完成
+def anchor_from_flag(flag):
+    """用户输入的 1~4 对应基站 D0~D3（其他输入按 D3 处理）"""
+    if(int(flag)==1):
+        return 0
+    elif(int(flag)==2):
+        return 1
+    elif(int(flag)==3):
+        return 2
+    else:
+        return 3
+
+def send_position(channel,x,y,flag,layout='3d'):
+        """发送基站坐标并等待固件应答，成功后写入 anchors.json 中的 layout 布局
+
+        只修改 x、y，z 沿用配置文件中的值（二维布局或未配置的基站为 0）。
+        解算脚本从 anchors.json 读取坐标，AnchorGeometry.version 变化后 PinvCache 自动重建。
+        """
+        anchor = anchor_from_flag(flag)
+        geometry = load_geometry(layout)
+        z = float(geometry.positions[anchor, 2]) if geometry.defined[anchor] else 0.0
+        try:
+            channel.set_positions({anchor: (x, y, z)})
+        except (CommandError, serial.SerialException) as e:
+            print(f"发送基站坐标失败: {e}")
+            return False
+        geometry.set_anchor(anchor, (x, y, z)[:geometry.dim])
+        save_geometry(geometry, layout)
+        print(f"已写入 anchors.json（{layout} 布局）: d{anchor} = {geometry[anchor].tolist()}")
         return True
-def send_calibration_params(ser, k, b ,flag):
+def send_calibration_params(channel, k, b ,flag):
     """
-    发送校准参数k和b到串口
-    格式：帧头(2字节) + k(4字节) + b(4字节) + 帧尾(8字节)
+    发送校准参数k和b，等待固件应答并核对EEPROM中保存的值
     """
+    anchor = anchor_from_flag(flag)
     try:
-        # 发送帧头帧尾定义
-        FRAME_HEADER_command = b'\xff\xaa\x01'
-        # 将k和b打包成单精度浮点数（每个4字节）
-        k_bytes = struct.pack('<f', k)
-        b_bytes = struct.pack('<f', b)
-        # 组合完整的数据帧
-        # print(flag)
-        # frame = FRAME_HEADER_command +b'\x00'+ k_bytes + b_bytes + FRAME_TAIL
-        # ser.write(frame)
-        # frame = FRAME_HEADER_command +b'\x01'+ k_bytes + b_bytes + FRAME_TAIL
-        # ser.write(frame)
-        # frame = FRAME_HEADER_command +b'\x02'+ k_bytes + b_bytes + FRAME_TAIL
-        # ser.write(frame)
-        # frame = FRAME_HEADER_command +b'\x03'+ k_bytes + b_bytes + FRAME_TAIL
-        # ser.write(frame)
-        if(int(flag)==1):
-            frame = FRAME_HEADER_command +b'\x00'+ k_bytes + b_bytes + FRAME_TAIL
-        elif(int(flag)==2):
-            frame = FRAME_HEADER_command +b'\x01'+ k_bytes + b_bytes + FRAME_TAIL
-        elif(int(flag)==3):
-            frame = FRAME_HEADER_command +b'\x02'+ k_bytes + b_bytes + FRAME_TAIL
-        else:
-            frame = FRAME_HEADER_command +b'\x03'+ k_bytes + b_bytes + FRAME_TAIL
-        
-        # 发送数据
-        ser.write(frame)
-        ser.flush()  # 确保数据发送完成
-        
+        stored = channel.set_kb({anchor: (k, b)})[anchor]
         # 打印调试信息
         print(f"发送校准参数:")
-        print(f"k = {k:.4f} ({k_bytes.hex()})")
-        print(f"b = {b:.4f} ({b_bytes.hex()})")
-        print(f"完整帧: {frame.hex()}")
-        
+        print(f"k = {k:.4f} ({struct.pack('<f', k).hex()})")
+        print(f"b = {b:.4f} ({struct.pack('<f', b).hex()})")
+        print(f"固件已保存: k = {stored[0]:.4f}, b = {stored[1]:.4f}")
         return True
         
-    except Exception as e:
+    except (CommandError, serial.SerialException) as e:
         print(f"发送校准参数失败: {e}")
         return False
     
+def send_all_calibration_params(channel, ks, bs, anchors):
+    """把多个基站的校准参数一次发出，固件整批保存后逐条应答，读回的值与发送的一致才算成功"""
+    try:
+        stored = channel.set_kb({anchor: (ks[anchor], bs[anchor]) for anchor in anchors})
+        for anchor in anchors:
+            print(f"发送校准参数: D{anchor} k = {stored[anchor][0]:.4f}, b = {stored[anchor][1]:.4f}（已确认）")
+        return True
+    except (CommandError, serial.SerialException) as e:
+        print(f"发送校准参数失败: {e}")
+        return False
+
+def read_calibration_params(channel):
+    """读回固件EEPROM中保存的所有基站的校准参数"""
+    try:
+        stored = channel.get_kb()
+    except (CommandError, serial.SerialException) as e:
+        print(f"读取校准参数失败: {e}")
+        return None
+    print("\n=== 固件中保存的校准参数 ===")
+    for anchor, (k, b) in stored.items():
+        print(f"D{anchor}: k = {k:.4f}, b = {b:.4f}")
+    return stored
+
+def fit_all_anchors(measurements, actual_distances):
+    """对每个基站分别做线性最小二乘 实际距离 = k × 测量距离 + b（闭式解，所有基站一次算完）
+
+    measurements:     (样本数, 基站数) 测量距离，没有数据的位置为 NaN
+    actual_distances: (样本数,) 或 (样本数, 基站数) 实际距离
+    返回 (k, b, r_squared, counts)，样本不足或测量值没有变化的基站 k、b 为 NaN
+    """
+    measurements = np.asarray(measurements, dtype=np.float64)
+    actual = np.broadcast_to(np.asarray(actual_distances, dtype=np.float64).reshape(len(measurements), -1),
+                             measurements.shape)
+    mask = ~np.isnan(measurements)
+    x = np.where(mask, measurements, 0.0)
+    y = np.where(mask, actual, 0.0)
+    n = mask.sum(axis=0)
+    sx, sy = x.sum(axis=0), y.sum(axis=0)
+    sxx, sxy = (x * x).sum(axis=0), (x * y).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = n * sxx - sx * sx
+        valid = (n >= 2) & (np.abs(denominator) > 1e-12 * np.maximum(n * sxx, 1.0))
+        k = np.where(valid, (n * sxy - sx * sy) / denominator, np.nan)
+        b = np.where(valid, (sy - k * sx) / n, np.nan)
+        residual = np.where(mask, y - (k * x + b), 0.0)
+        total = np.where(mask, y - sy / n, 0.0)
+        r_squared = 1 - (residual ** 2).sum(axis=0) / (total ** 2).sum(axis=0)
+    return k, b, r_squared, n
+
 def linear_func(x, k, b):
     """线性方程：y = kx + b"""
     return k * x + b
 
-def parse_frame(data,flag):
-    """从接收到的数据中解析有效帧，并提取浮点数值"""
-    global FRAME_HEADER, FRAME_TAIL
-    start_index = data.find(FRAME_HEADER)
-    end_index = data.find(FRAME_TAIL, start_index)
-    
-    if start_index != -1 and end_index != -1:
-        frame = data[start_index:end_index + len(FRAME_TAIL)]
-        # print(flag)
-        # print(f"完整帧内容: {frame.hex()}")  # 打印完整帧的十六进制
-        if(int(flag)==1):#解析d0浮点数
-            float_bytes = frame[4:8]
-        elif(int(flag)==2):#解析d1浮点数
-            float_bytes = frame[8:12]
-        elif(int(flag)==3):#解析d2浮点数
-            float_bytes = frame[12:16]
-        else:#解析d3 浮点数
-            float_bytes = frame[16:20]
-        try:
-            return struct.unpack('<f', float_bytes)[0]
-        except struct.error as e:
-            print(f"解析浮点数失败: {e}")
-            return None
-    return None
-
-def read_frame_from_serial(ser,flag, timeout=2):
-    """从串口读取数据并提取有效帧"""
-    buffer = b''
-    start_time = time.time()
-    # print(flag)
-    while time.time() - start_time < timeout:
-        if ser.in_waiting:
-            data = ser.read(ser.in_waiting)
-            buffer += data
-            measured = parse_frame(buffer,flag)
-            if measured is not None:
-                frame_end = buffer.find(FRAME_TAIL) + len(FRAME_TAIL)
-                buffer = buffer[frame_end:]
-                return measured
-    return None
+def parse_frame(frame,flag):
+    """从解码后的帧（FrameData）中取出所选基站的原始距离"""
+    if(int(flag)==1):#d0
+        return frame.original_distances[0]
+    elif(int(flag)==2):#d1
+        return frame.original_distances[1]
+    elif(int(flag)==3):#d2
+        return frame.original_distances[2]
+    else:#d3
+        return frame.original_distances[3]
+
+def parse_all_distances(frame):
+    """从解码后的帧（FrameData）中取出全部基站的原始距离和是否有效 (distances, active)"""
+    return np.array(frame.original_distances), np.array(frame.is_active) == 1
+
+def open_frame_reader(ser, channel=None, maxsize=256):
+    """启动与解算脚本相同的后台采集线程：FrameDecoder 在预分配缓冲区中流式解帧，
+    串口没有数据时阻塞在读取上（不空转）。队列最多 maxsize 帧，满时丢弃最旧的帧，
+    等待用户输入期间不会无限增长（这些旧帧在采样前由 discard_pending 丢弃）。
+    给出 channel（CommandChannel）时命令应答帧转交给它"""
+    if channel is None:
+        reader = SerialReader(ser, FrameDecoder(layouts=FRAME_LAYOUTS), decode=unpack_frame, maxsize=maxsize)
+    else:
+        reader = SerialReader(ser, FrameDecoder(layouts=FRAME_LAYOUTS + (ACK_LAYOUT,)),
+                              decode=channel.intercept(unpack_frame), maxsize=maxsize)
+    reader.start()
+    return reader
+
+def next_frame(reader, timeout=2):
+    """阻塞等待下一帧 FrameData，超时返回 None；采集线程出错时抛出其异常"""
+    frame = reader.get(timeout)
+    if frame is None and reader.error is not None:
+        raise reader.error
+    return frame
+
+def discard_pending(reader):
+    """丢弃等待用户操作期间收到的旧帧"""
+    reader.get_all()
+
+def read_all_from_serial(reader, timeout=2):
+    """取下一帧，返回全部基站的 (distances, active)"""
+    frame = next_frame(reader, timeout)
+    if frame is None:
+        return None
+    return parse_all_distances(frame)
+
+def read_frame_from_serial(reader,flag, timeout=2):
+    """取下一帧，返回所选基站的原始距离"""
+    frame = next_frame(reader, timeout)
+    if frame is None:
+        return None
+    return parse_frame(frame,flag)
 
-def verification_mode(ser, k=0.7135, b=-0.3434):
+def verification_mode(reader, flag, k=0.7135, b=-0.3434):
     """验证模式函数"""
     print("\n=== 实时验证模式 ===")
     print(f"使用校准参数: k={k:.4f}, b={b:.4f}")
@@ -128,14 +182,14 @@ def verification_mode(ser, k=0.7135, b=-0.3434):
     
     try:
         while True:
-            measured = read_frame_from_serial(ser,flag)
+            measured = read_frame_from_serial(reader,flag)
             if measured is not None:
                 calibrated = k * measured + b
                 print(f"原始距离: {measured:.3f}m → 校准后距离: {calibrated:.3f}m")
     except KeyboardInterrupt:
         print("\n已退出验证模式")
 
-def calibration_mode(ser,flag):
+def calibration_mode(channel,reader,flag):
     """校准模式函数"""
     # 获取用户输入的数据个数
     n = int(input("请输入测试组数: "))
@@ -152,13 +206,13 @@ def calibration_mode(ser,flag):
         print(f"\n=== 准备采集距离 {actual_dist}m 的数据 ===")
         input(f"请将传感器放置在距离 {actual_dist}m 处，按回车开始采集...")
         
-        # 清空串口缓冲区
-        ser.reset_input_buffer()
+        # 丢弃等待期间收到的旧帧
+        discard_pending(reader)
         
         # 采集指定数量的样本
         measurements = []
         while len(measurements) < samples_per_distance:
-            measured = read_frame_from_serial(ser,flag)
+            measured = read_frame_from_serial(reader,flag)
             if measured is not None:
                 measurements.append(measured)
                 print(f"采集进度: {len(measurements)}/{samples_per_distance}, "
@@ -205,7 +259,7 @@ def calibration_mode(ser,flag):
     plt.plot(x_fit, y_fit, 'r-', label=f'拟合线: y = {k:.4f}x + {b:.4f}')
 
     print("\n正在发送校准参数...")
-    if send_calibration_params(ser, k, b,flag) :
+    if send_calibration_params(channel, k, b,flag) :
         print("校准参数发送成功")
     else:
         print("校准参数发送失败")
@@ -232,16 +286,140 @@ def calibration_mode(ser,flag):
     print("原始数据已保存为 calibration_data.csv")
     return k, b
 
+def calibration_all_mode(channel, reader):
+    """全部基站同时校准：每帧同时记录所有有效基站的距离，一次采集后拟合并发送全部基站的参数"""
+    n = int(input("请输入测试组数: "))
+    actual_distances = [1.2 + (i * 0.6) for i in range(n)]
+    samples_per_distance = 20  # 每个距离采集的帧数
+
+    all_measurements = []      # 每帧所有基站的测量值，无效基站为 NaN
+    all_actual_distances = []
+
+    for actual_dist in actual_distances:
+        print(f"\n=== 准备采集距离 {actual_dist}m 的数据 ===")
+        input(f"请将所有待校准基站放置在距离标签 {actual_dist}m 处，按回车开始采集...")
+
+        discard_pending(reader)
+        measurements = []
+        while len(measurements) < samples_per_distance:
+            result = read_all_from_serial(reader)
+            if result is not None:
+                distances, active = result
+                measurements.append(np.where(active, distances, np.nan))
+                print(f"采集进度: {len(measurements)}/{samples_per_distance}, "
+                      f"有效基站: {', '.join(f'D{i}' for i in np.flatnonzero(active)) or '无'}")
+
+        measurements = np.array(measurements)
+        print(f"\n距离 {actual_dist}m 的统计信息:")
+        for anchor in np.flatnonzero((~np.isnan(measurements)).any(axis=0)):
+            column = measurements[:, anchor]
+            print(f"D{anchor}: 平均值 {np.nanmean(column):.3f}m, 标准差 {np.nanstd(column):.3f}m, "
+                  f"样本数 {np.count_nonzero(~np.isnan(column))}")
+
+        all_measurements.append(measurements)
+        all_actual_distances.extend([actual_dist] * len(measurements))
+
+    all_measurements = np.vstack(all_measurements)
+    all_actual_distances = np.array(all_actual_distances)
+    ks, bs, r_squared, counts = fit_all_anchors(all_measurements, all_actual_distances)
+    anchors = [int(i) for i in np.flatnonzero(~np.isnan(ks))]
+
+    print("\n=== 拟合结果 ===")
+    for anchor in np.flatnonzero(counts):
+        if np.isnan(ks[anchor]):
+            print(f"D{anchor}: 样本不足或测量值没有变化，无法拟合")
+        else:
+            print(f"D{anchor}: 实际距离 = {ks[anchor]:.4f} × 测量距离 + {bs[anchor]:.4f}, "
+                  f"R² = {r_squared[anchor]:.4f}, 样本数 {counts[anchor]}")
+    if not anchors:
+        print("没有可以校准的基站")
+        return ks, bs
+
+    plt.figure(figsize=(10, 6), dpi=100)
+    for anchor in anchors:
+        x = all_measurements[:, anchor]
+        x = x[~np.isnan(x)]
+        points = plt.scatter(all_measurements[:, anchor], all_actual_distances, alpha=0.5, label=f'D{anchor} 测量数据')
+        x_fit = np.linspace(x.min(), x.max(), 100)
+        plt.plot(x_fit, linear_func(x_fit, ks[anchor], bs[anchor]), color=points.get_facecolor()[0][:3],
+                 label=f'D{anchor}: y = {ks[anchor]:.4f}x + {bs[anchor]:.4f}')
+
+    print("\n正在发送校准参数...")
+    if send_all_calibration_params(channel, ks, bs, anchors):
+        print("校准参数发送成功")
+    else:
+        print("校准参数发送失败")
+
+    plt.xlabel('测量距离 (m)')
+    plt.ylabel('实际距离 (m)')
+    plt.title('距离传感器校准曲线（全部基站）')
+    plt.grid(True)
+    plt.legend(loc='best')
+    plt.tight_layout()
+    plt.savefig('calibration_plot_all.png', dpi=300, bbox_inches='tight')
+    print("\n校准曲线已保存为 calibration_plot_all.png")
+
+    with open('calibration_data_all.csv', 'w') as f:
+        f.write('实际距离(m),' + ','.join(f'D{i}测量距离(m)' for i in range(ANCHOR_NUM)) + '\n')
+        for actual, row in zip(all_actual_distances, all_measurements):
+            f.write(f'{actual:.3f},' + ','.join('' if np.isnan(v) else f'{v:.3f}' for v in row) + '\n')
+    print("原始数据已保存为 calibration_data_all.csv")
+    return ks, bs
+
+def online_calibration_mode(channel, reader):
+    """在线校准：逐帧用递推最小二乘更新所有有效基站的 k、b，不保存样本，结束后发送已收敛的基站参数"""
+    calibrator = OnlineCalibrator()
+    actual_dist = 1.2
+    while True:
+        entry = input(f"\n请输入标签到各基站的实际距离(m)，直接回车为 {actual_dist}m，输入 q 结束: ").strip()
+        if entry.lower() == 'q':
+            break
+        if entry:
+            actual_dist = float(entry)
+        print(f"正在以实际距离 {actual_dist}m 校准，按 Ctrl+C 结束本距离的采集")
+        discard_pending(reader)
+        last_report = time.time()
+        try:
+            while True:
+                result = read_all_from_serial(reader)
+                if result is None:
+                    continue
+                distances, active = result
+                calibrator.update(distances, actual_dist, active)
+                if time.time() - last_report >= 1.0:
+                    print(calibrator.report())
+                    last_report = time.time()
+        except KeyboardInterrupt:
+            pass
+        print(calibrator.report())
+        actual_dist = round(actual_dist + 0.6, 3)
+
+    print("\n=== 在线校准结果 ===")
+    print(calibrator.report())
+    anchors = [int(i) for i in np.flatnonzero(calibrator.converged)]
+    for anchor in np.flatnonzero((calibrator.samples > 0) & ~calibrator.converged):
+        print(f"D{anchor} 未收敛，不发送（可以在更多不同的距离上继续采集）")
+    if anchors:
+        print("\n正在发送校准参数...")
+        if send_all_calibration_params(channel, calibrator.k, calibrator.b, anchors):
+            print("校准参数发送成功")
+        else:
+            print("校准参数发送失败")
+    return calibrator
+
 def main():
     """主函数：选择模式并执行相应功能"""
     # 串口配置
     serial_port = "COM14"  # 请根据实际情况修改串口号
-    baud_rate = 115200
+    baud_rate = BAUD_RATE  # 与固件 Serial.begin(2000000) 及解算脚本一致
+    anchor_layout = '3d'  # 固定基站位置模式写入 anchors.json 中的哪种布局（'2d' 或 '3d'）
     try:
         
         # 连接串口
         ser = serial.Serial(serial_port, baud_rate, timeout=0.1)
         print("串口连接成功")
+        channel = CommandChannel(ser)
+        reader = open_frame_reader(ser, channel)
         # send_calibration_params(ser, 1, -1.19 ,0)
         # send_calibration_params(ser, 1.0123, -1.2021 ,1)
         # send_calibration_params(ser, 1.0225, -1.1559 ,2)
@@ -251,32 +429,46 @@ def main():
             print("\n=== 模式选择 ===")
             print("1. 校准模式")
             print("2. 固定基站位置模式")
-            print("3. 退出程序")
+            print("3. 全部基站同时校准模式")
+            print("4. 在线校准模式")
+            print("5. 读取固件中的校准参数")
+            print("6. 退出程序")
             
-            choice = input("请选择模式 (1/2/3): ")
+            choice = input("请选择模式 (1/2/3/4/5/6): ")
             
             if choice == '1':
                 # 校准模式
                 flag = input("请选择校准对象 1：Do、2：D1、3：D2、4：D3 ")
                 # print(flag)
-                k, b = calibration_mode(ser,flag)
+                k, b = calibration_mode(channel,reader,flag)
                 
                 # 校准后询问是否进入验证模式
                 verify = input("\n是否进入验证模式检验校准结果？(y/n): ")
                 if verify.lower() == 'y':
-                    verification_mode(ser, k, b)
+                    verification_mode(reader, flag, k, b)
             
             elif choice == '2':
                 # 直接进入位置设置模式，使用预设的校准参数
                 # 提示用户输入值，并用空格分隔
                 flag = input("请选择基站 1：Do、2：D1、3：D2、4：D3 ")
                 x, y = map(float, input("请输入基站"+flag+"的x和y值，用空格隔开: ").split())
-                if send_position(ser,x, y,flag) :
+                if send_position(channel,x, y,flag,anchor_layout) :
                     print("位置参数发送成功")
                 else:
                     print("校准参数发送失败")
 
             elif choice == '3':
+                # 一次采集，同时校准所有有效基站
+                calibration_all_mode(channel, reader)
+
+            elif choice == '4':
+                # 逐帧递推更新，不保存样本
+                online_calibration_mode(channel, reader)
+
+            elif choice == '5':
+                read_calibration_params(channel)
+
+            elif choice == '6':
                 print("\n程序已退出")
                 break
             
@@ -287,6 +479,8 @@ def main():
         print(f"发生错误: {e}")
     
     finally:
+        if 'reader' in locals():
+            reader.stop()
         if 'ser' in locals() and ser.is_open:
             ser.close()
             print("\n串口已关闭")
@@ -22,15 +22,33 @@ typedef struct{
 
 typedef struct{
     uint8_t  header[2]{0xFF, 0xAA};
-    uint8_t  command;           // 0x01：发送校准参数；0x02：发送anchor位置
+    uint8_t  command;           // 0x01：发送校准参数；0x02：发送anchor位置；0x03：读取校准参数
     uint8_t  anchor_num;
     float    data[3];
     uint8_t  tail[8]{0x00, 0x00, 0x80, 0x7f, 0x00, 0x00, 0x00, '\n'};
 }CommandFrame;
 
 
+// 命令应答：每条命令处理完后回复一帧，与数据帧在同一串口中交错发送
+typedef struct{
+    uint8_t  header[2]  {0xFF, 0xAA};
+    uint8_t  command[2] {0x02, 0x01};
+    uint8_t  cmd;               // 所应答的命令
+    uint8_t  anchor_num;
+    uint8_t  status;            // ACK_OK / ACK_BAD_ANCHOR / ACK_BAD_COMMAND
+    uint8_t  reserved;
+    float    data[3];           // 执行后的值：校准参数为 EEPROM 中的 k、b，位置为收到的坐标
+    uint8_t  tail[8]{0x00, 0x00, 0x80, 0x7f, 0x00, 0x00, 0x00, '\n'};
+}AckFrame;
+
+
 const uint8_t COMMAND_SET_KB       = 0x01;
 const uint8_t COMMAND_SET_POSITION = 0x02;
+const uint8_t COMMAND_GET_KB       = 0x03;
+
+const uint8_t ACK_OK          = 0x00;
+const uint8_t ACK_BAD_ANCHOR  = 0x01;
+const uint8_t ACK_BAD_COMMAND = 0x02;
 
 const uint8_t COMMAND_FRAME_SIZE = sizeof(CommandFrame);
 
@@ -33,27 +33,87 @@ void SerialInterface::data_send_task(void *pvParameters) {
 }
 
 
+// 执行一条命令，结果写入应答帧
+static void execute_command(const CommandFrame &frame, AckFrame &ack, bool &kb_changed) {
+    ack.cmd        = frame.command;
+    ack.anchor_num = frame.anchor_num;
+    ack.status     = ACK_OK;
+    memcpy(ack.data, frame.data, sizeof(ack.data));
+    if (frame.anchor_num >= MAX_ANCHOR_NUM) {
+        ack.status = ACK_BAD_ANCHOR;
+        return;
+    }
+    switch (frame.command) {
+        // 校准参数：先改内存，整批处理完后统一写一次EEPROM
+        case COMMAND_SET_KB:
+            uwb_driver.set_kb(frame.anchor_num, frame.data[0], frame.data[1]);
+            kb_changed = true;
+            ack.data[0] = uwb_driver.cal_parms.ks[frame.anchor_num];
+            ack.data[1] = uwb_driver.cal_parms.bs[frame.anchor_num];
+            ack.data[2] = 0;
+            break;
+        case COMMAND_GET_KB:
+            ack.data[0] = uwb_driver.cal_parms.ks[frame.anchor_num];
+            ack.data[1] = uwb_driver.cal_parms.bs[frame.anchor_num];
+            ack.data[2] = 0;
+            break;
+        // Anchor位置参数
+        case COMMAND_SET_POSITION:
+            // uwb_solver_2d.update_anchor_position(frame.anchor_num, frame.data[0], frame.data[1], frame.data[2]);
+            break;
+        default:
+            ack.status = ACK_BAD_COMMAND;
+            break;
+    }
+}
+
+
 void SerialInterface::cmd_parse_task(void *pvParameters) {
     SerialInterface* this_pointer = static_cast<SerialInterface*>(pvParameters);
+    static const CommandFrame reference = CommandFrame();  // 用于比较帧头帧尾
+    static const size_t MAX_BATCH = 10;
+    // 批量缓冲区放在静态存储区而不是 2048 字节的任务栈上，给 EEPROM.commit() 留出栈空间（只创建一个解析任务）
+    static uint8_t buffer[MAX_BATCH * COMMAND_FRAME_SIZE];
+    static AckFrame acks[MAX_BATCH];
+    size_t   length = 0;
     CommandFrame frame;
-    uint8_t buffer[64];
     while(1) {
-        memset(buffer, 0, sizeof(buffer));
-        int count = Serial.readBytesUntil('\n',buffer,64);
-        if (count>0) {
-            memcpy(&frame, buffer, sizeof(frame));
-            // 校准参数
-            if (frame.command == COMMAND_SET_KB){
-                uwb_driver.update_kb(frame.anchor_num, frame.data[0], frame.data[1]);
-            }
-            // Anchor位置参数
-            if (frame.command == COMMAND_SET_POSITION){
-                // uwb_solver_2d.update_anchor_position(frame.anchor_num, frame.data[0], frame.data[1], frame.data[2]);
+        // 读入已到达的字节（不等待）
+        int available = Serial.available();
+        if (available > 0 && length < sizeof(buffer)) {
+            length += Serial.readBytes(buffer + length, min((size_t)available, sizeof(buffer) - length));
+        }
+
+        // 按帧头同步、帧尾确认，依次处理缓冲区中所有完整的命令帧
+        // （不再按'\n'分行：k、b 的字节中可能含有0x0A）
+        size_t start = 0;
+        size_t ack_count = 0;
+        bool   kb_changed = false;
+        while (length - start >= COMMAND_FRAME_SIZE && ack_count < MAX_BATCH) {
+            if (memcmp(buffer + start, reference.header, sizeof(reference.header)) != 0 ||
+                memcmp(buffer + start + offsetof(CommandFrame, tail), reference.tail, sizeof(reference.tail)) != 0) {
+                start++;
+                continue;
             }
+            memcpy(&frame, buffer + start, sizeof(frame));
+            start += COMMAND_FRAME_SIZE;
+            acks[ack_count] = AckFrame();
+            execute_command(frame, acks[ack_count], kb_changed);
+            ack_count++;
+        }
+        if (start > 0) {
+            memmove(buffer, buffer + start, length - start);
+            length -= start;
+        }
 
-            LOGLN_INFO("Parameter updated!");
+        // 写入EEPROM后再应答，上位机收到应答即表示参数已保存
+        if (kb_changed) {
+            uwb_driver.save_kb();
+        }
+        if (ack_count > 0) {
+            Serial.write((char*)acks, ack_count * sizeof(AckFrame));
         }
-        vTaskDelay(pdMS_TO_TICKS(100));
+        vTaskDelay(pdMS_TO_TICKS(10));
     }
 }
 
@@ -106,8 +106,17 @@ void UwbDriver::update_rxpower(uint8_t index, float power){
 }
 
 void UwbDriver::update_kb(uint8_t index, float k, float b){
+    this->set_kb(index, k, b);
+    this->save_kb();
+}
+
+// 只修改内存中的参数，连续修改多个基站后调用一次 save_kb 写入 EEPROM
+void UwbDriver::set_kb(uint8_t index, float k, float b){
     this->cal_parms.ks[index] = k;
     this->cal_parms.bs[index] = b;
+}
+
+void UwbDriver::save_kb(void){
     EEPROM.writeBytes(EEPROM_UWB_CAL_START_ADDREDD, &this->cal_parms, sizeof(this->cal_parms));
     EEPROM.commit();
 }
@@ -38,6 +38,8 @@ public:
     void  update_distance(uint8_t index, float distance);
     void  update_rxpower (uint8_t index, float power);
     void  update_kb(uint8_t index, float k, float b);
+    void  set_kb(uint8_t index, float k, float b);
+    void  save_kb(void);
     void  update_caldistance(uint8_t index, float distance);
     void  set_state(uint8_t index, uint8_t state);
 